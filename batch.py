@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Roteamento em lote (muitos-para-muitos)
+
+As consultas (start, end) são agrupadas pela origem e cada origem
+distinta roda um único Dijkstra, que para assim que todos os seus
+destinos são fechados. Os resultados saem por geradores, uma origem por
+vez, então a memória fica limitada a uma árvore de busca por vez.
+"""
+
+import heapq
+from array import array
+
+
+class ShortestPathTree:
+    """
+    Árvore de menores caminhos (Dijkstra) a partir de uma origem. city
+    pode ser qualquer objeto com costs, width e height (por exemplo o
+    grid compartilhado dos processos de parallel.py).
+    """
+
+    def __init__(self, city, source, targets=None, keep_parents=True):
+        self.city = city
+        self.source = source
+        size = city.width * city.height
+        self.dist = array('l', [-1]) * size
+        self.parents = array('l', [-1]) * size if keep_parents else None
+        self.expanded = 0
+        self._run(targets)
+
+    def _run(self, targets):
+        """Dijkstra até fechar todos os destinos (ou o componente inteiro)"""
+        city = self.city
+        costs = city.costs
+        width = city.width
+        last_x = width - 1
+        last_y = city.height - 1
+        dist = self.dist
+        parents = self.parents
+        settled = bytearray(len(dist))
+        remaining = set(targets) if targets is not None else None
+
+        push = heapq.heappush
+        pop = heapq.heappop
+        heap = [(0, self.source)]
+        dist[self.source] = 0
+        expanded = 0
+
+        while heap:
+            d, u = pop(heap)
+            if settled[u]:
+                continue
+            settled[u] = 1
+            expanded += 1
+
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+
+            y, x = divmod(u, width)
+            neighbors = []
+            if y > 0:
+                neighbors.append(u - width)
+            if x < last_x:
+                neighbors.append(u + 1)
+            if y < last_y:
+                neighbors.append(u + width)
+            if x > 0:
+                neighbors.append(u - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or settled[n]:
+                    continue
+                nd = d + cost
+                if dist[n] == -1 or nd < dist[n]:
+                    dist[n] = nd
+                    if parents is not None:
+                        parents[n] = u
+                    push(heap, (nd, n))
+
+        self.expanded = expanded
+
+    def cost_to(self, target):
+        """Custo até o destino ou None se não foi alcançado"""
+        cost = self.dist[target]
+        return None if cost == -1 else cost
+
+    def indices_to(self, target):
+        """Caminho em índices (tupla) até o destino ou None"""
+        if self.dist[target] == -1:
+            return None
+        path = []
+        current = target
+        while current != -1:
+            path.append(current)
+            current = self.parents[current]
+        path.reverse()
+        return tuple(path)
+
+    def path_to(self, target):
+        """Caminho [[x, y], ...] até o destino ou None"""
+        indices = self.indices_to(target)
+        if indices is None:
+            return None
+        width = self.city.width
+        return [[i % width, i // width] for i in indices]
+
+
+def _index(city, pos):
+    """Índice da posição ou None se não for transitável"""
+    if not city.is_walkable(pos[0], pos[1]):
+        return None
+    return pos[1] * city.width + pos[0]
+
+
+def find_paths_batch(city, pairs, costs_only=False):
+    """
+    Gera (posição do par na entrada, resultado) para cada par (start, end).
+    O resultado é o caminho [[x, y], ...] ou, com costs_only, o custo; None
+    quando não há rota. Os resultados saem agrupados por origem (na ordem
+    em que cada origem aparece), não na ordem de entrada.
+    """
+    components = city.components
+    groups = {}
+    for i, (start, end) in enumerate(pairs):
+        source = _index(city, start)
+        target = _index(city, end)
+        if source is None or target is None or not components.connected(source, target):
+            yield i, None
+            continue
+        groups.setdefault(source, []).append((i, target))
+
+    for source, queries in groups.items():
+        targets = set(target for i, target in queries)
+        tree = ShortestPathTree(city, source, targets, keep_parents=not costs_only)
+        for i, target in queries:
+            if costs_only:
+                yield i, tree.cost_to(target)
+            else:
+                yield i, tree.path_to(target)
+
+
+def distance_matrix(city, sources, targets):
+    """
+    Gera uma linha por origem com o custo até cada destino (None quando
+    não há rota). Cada linha usa um único Dijkstra.
+    """
+    components = city.components
+    target_indices = [_index(city, end) for end in targets]
+
+    for start in sources:
+        source = _index(city, start)
+        reachable = set()
+        if source is not None:
+            for target in target_indices:
+                if target is not None and components.connected(source, target):
+                    reachable.add(target)
+
+        if not reachable:
+            yield [None] * len(target_indices)
+            continue
+
+        tree = ShortestPathTree(city, source, reachable, keep_parents=False)
+        yield [tree.cost_to(t) if t in reachable else None for t in target_indices]
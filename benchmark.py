@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""
+Script de medições de desempenho do roteamento
+
+Uso:
+    python benchmark.py replanning [--size 500] [--batches 10] [--batch-size 5]
+    python benchmark.py jps [--size 500] [--queries 5]
+    python benchmark.py parallel [--size 300] [--queries 2000] [--sources 200] [--workers N]
+    python benchmark.py hpa [--sizes 200 400 800] [--queries 5]
+    python benchmark.py ch [--size 300] [--queries 200]
+    python benchmark.py streets [--size 300] [--queries 50]
+    python benchmark.py bidirectional [--size 201] [--queries 30]
+    python benchmark.py alt [--size 201] [--queries 30] [--landmarks 8]
+    python benchmark.py render [--size 2000] [--frames 30]
+    python benchmark.py traffic [--size 1000] [--ticks 200] [--spawn 1000]
+    python benchmark.py timed [--size 1000] [--queries 10] [--spawn 1000]
+    python benchmark.py startup [--runs 5] [--budget-ms 100]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+import batch
+from city import City
+from contraction import ContractionHierarchy
+from landmarks import LandmarkTable
+from parallel import ParallelRouter
+from pathfinding import PathFinder
+from streets import StreetGraph
+from time_dependent import TrafficForecast
+from traffic_sim import TrafficSimulation
+
+
+def create_grid_city(size, spacing=4, seed=1):
+    """
+    Cria uma cidade quadrada com ruas a cada 'spacing' células (o padrão
+    de create_sample_maps.create_big_city em escala maior)
+    """
+    city = City(size, size, f"Grade {size}x{size}")
+    city.fill_region(0, 0, size, size, City.HOUSE)
+    for i in range(0, size, spacing):
+        city.fill_region(0, i, size, 1, City.STREET)
+        city.fill_region(i, 0, 1, size, City.STREET)
+    city.fill_region(0, size - 1, size, 1, City.STREET)
+    city.fill_region(size - 1, 0, 1, size, City.STREET)
+
+    # Alguns quarteirões fechados para a rota não ser trivial
+    rng = random.Random(seed)
+    for _ in range(size // 4):
+        x = rng.randrange(size)
+        y = rng.randrange(size)
+        city.fill_region(x, y, spacing * 3, spacing * 3, City.BUILDING)
+    city.fill_region(0, 0, 1, 1, City.STREET)
+    city.fill_region(size - 1, size - 1, 1, 1, City.STREET)
+    return city
+
+
+def timed(function, *args):
+    """Executa a função e retorna (resultado, segundos)"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def create_maze_city(size, seed=1, loops=0.05):
+    """
+    Labirinto (ruas entre prédios, como maps/cidade_labirinto.json) em
+    escala maior: backtracking aleatório nas células ímpares e algumas
+    paredes derrubadas para criar caminhos alternativos
+    """
+    rng = random.Random(seed)
+    city = City(size, size, f"Labirinto {size}x{size}")
+    city.fill_region(0, 0, size, size, City.BUILDING)
+    cells = (size - 1) // 2
+    visited = bytearray(cells * cells)
+    visited[0] = 1
+    city.set_cell(1, 1, City.STREET)
+    stack = [(0, 0)]
+    while stack:
+        cx, cy = stack[-1]
+        options = [(cx + dx, cy + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                   if 0 <= cx + dx < cells and 0 <= cy + dy < cells
+                   and not visited[(cy + dy) * cells + cx + dx]]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(options)
+        visited[ny * cells + nx] = 1
+        city.set_cell(cx + nx + 1, cy + ny + 1, City.STREET)
+        city.set_cell(2 * nx + 1, 2 * ny + 1, City.STREET)
+        stack.append((nx, ny))
+
+    for _ in range(int(cells * cells * loops)):
+        x = rng.randrange(1, size - 1)
+        y = rng.randrange(1, size - 1)
+        if (x + y) % 2 == 1:
+            city.set_cell(x, y, City.STREET)
+    return city
+
+
+def bench_replanning(size, batches, batch_size, seed=1):
+    """A* completo vs. replanejamento incremental após lotes de tráfego"""
+    city = create_grid_city(size, seed=seed)
+    start = [0, 0]
+    end = [size - 1, size - 1]
+
+    full = PathFinder(city, cache_size=0)
+    incremental = PathFinder(city, cache_size=0, strategy="incremental")
+
+    path, seconds = timed(incremental.find_path, start, end)
+    print(f"Mapa {size}x{size}, rota {start} -> {end}")
+    print(f"  busca inicial incremental: {seconds * 1000:.1f} ms")
+
+    rng = random.Random(seed)
+    full_total = 0.0
+    incremental_total = 0.0
+    for batch in range(batches):
+        # Metade do tráfego cai sobre a rota atual, metade em qualquer rua
+        for i in range(batch_size):
+            if path and i % 2 == 0:
+                x, y = path[rng.randrange(1, len(path) - 1)]
+            else:
+                x, y = rng.randrange(size), rng.randrange(size)
+            city.add_traffic(x, y)
+
+        path, incremental_seconds = timed(incremental.find_path, start, end)
+        expected, full_seconds = timed(full.find_path, start, end)
+        if (path is None) != (expected is None) or (path and len(path) != len(expected)):
+            raise AssertionError("Custo do replanejamento difere do A* completo")
+
+        full_total += full_seconds
+        incremental_total += incremental_seconds
+        print(f"  lote {batch + 1}: A* {full_seconds * 1000:7.1f} ms "
+              f"({full.last_expanded} nós) | incremental {incremental_seconds * 1000:7.1f} ms "
+              f"({incremental.last_expanded} nós)")
+
+    print(f"  total: A* {full_total * 1000:.1f} ms | incremental {incremental_total * 1000:.1f} ms "
+          f"| ganho {full_total / max(incremental_total, 1e-9):.1f}x")
+
+
+def create_open_city(size, seed=1):
+    """Cidade quase toda de ruas, com alguns prédios espalhados"""
+    city = City(size, size, f"Aberta {size}x{size}")
+    city.fill_region(0, 0, size, size, City.STREET)
+    rng = random.Random(seed)
+    for _ in range(size // 2):
+        city.fill_region(rng.randrange(size), rng.randrange(size),
+                         rng.randint(2, 12), rng.randint(2, 12), City.BUILDING)
+    return city
+
+
+def random_street(city, rng):
+    """Sorteia uma célula transitável"""
+    while True:
+        x = rng.randrange(city.width)
+        y = rng.randrange(city.height)
+        if city.is_walkable(x, y):
+            return [x, y]
+
+
+def bench_jps(size, queries, seed=1):
+    """Nós expandidos e tempo: A* vs. Jump Point Search"""
+    rng = random.Random(seed)
+    for city in (create_open_city(size, seed), create_grid_city(size, seed=seed)):
+        astar = PathFinder(city, cache_size=0)
+        jps = PathFinder(city, cache_size=0, strategy="jps")
+        totals = [0, 0.0, 0, 0.0]
+
+        for _ in range(queries):
+            start = random_street(city, rng)
+            end = random_street(city, rng)
+            expected, astar_seconds = timed(astar.find_path, start, end)
+            path, jps_seconds = timed(jps.find_path, start, end)
+            if (path is None) != (expected is None) or (path and len(path) != len(expected)):
+                raise AssertionError("JPS retornou rota de tamanho diferente do A*")
+            totals[0] += astar.last_expanded
+            totals[1] += astar_seconds
+            totals[2] += jps.last_expanded
+            totals[3] += jps_seconds
+
+        print(f"{city.name}, {queries} consultas")
+        print(f"  A*:  {totals[0]:9d} nós expandidos, {totals[1] * 1000:8.1f} ms")
+        print(f"  JPS: {totals[2]:9d} nós expandidos, {totals[3] * 1000:8.1f} ms "
+              f"({totals[0] / max(totals[2], 1):.1f}x menos nós)")
+
+
+def bench_parallel(size, queries, sources, workers, seed=1):
+    """Lote em um processo (batch.py) vs. vários processos (parallel.py)"""
+    city = create_grid_city(size, seed=seed)
+    rng = random.Random(seed)
+    origins = [random_street(city, rng) for _ in range(sources)]
+    pairs = [(rng.choice(origins), random_street(city, rng)) for _ in range(queries)]
+
+    serial, serial_seconds = timed(lambda: dict(batch.find_paths_batch(city, pairs, True)))
+    with ParallelRouter(city, workers) as router:
+        results, parallel_seconds = timed(lambda: list(router.find_paths(pairs, True)))
+        workers = router.workers
+
+    if [serial[i] for i in range(len(pairs))] != [cost for i, cost in results]:
+        raise AssertionError("Resultados em paralelo diferem do lote serial")
+
+    print(f"Mapa {size}x{size}, {queries} consultas de {sources} origens")
+    print(f"  serial:      {serial_seconds * 1000:8.1f} ms")
+    print(f"  {workers} processos: {parallel_seconds * 1000:8.1f} ms "
+          f"({serial_seconds / max(parallel_seconds, 1e-9):.1f}x)")
+
+
+def bench_hpa(sizes, queries, seed=1):
+    """Viagens longas: A* vs. HPA* conforme o mapa cresce"""
+    for size in sizes:
+        city = create_grid_city(size, seed=seed)
+        rng = random.Random(seed)
+        astar = PathFinder(city, cache_size=0)
+        hpa = PathFinder(city, cache_size=0, strategy="hpa")
+        engine = hpa.get_engine("hpa")
+        _, build_seconds = timed(engine.sync)
+
+        totals = [0.0, 0.0, 0, 0]
+        for _ in range(queries):
+            # Partida e destino em cantos opostos do mapa
+            start = random_street(city, rng)
+            start = [start[0] // 8, start[1] // 8]
+            while not city.is_walkable(start[0], start[1]):
+                start = [rng.randrange(size // 8), rng.randrange(size // 8)]
+            end = [size - 1 - start[0], size - 1 - start[1]]
+            while not city.is_walkable(end[0], end[1]):
+                end = [size - 1 - rng.randrange(size // 8), size - 1 - rng.randrange(size // 8)]
+
+            expected, astar_seconds = timed(astar.find_path, start, end)
+            path, hpa_seconds = timed(hpa.find_path, start, end)
+            if (path is None) != (expected is None):
+                raise AssertionError("HPA* e A* discordam sobre a existência da rota")
+            totals[0] += astar_seconds
+            totals[1] += hpa_seconds
+            if path:
+                totals[2] += astar.path_cost(expected)
+                totals[3] += hpa.path_cost(path)
+
+        # Uma alteração no mapa: só os clusters afetados são recalculados
+        x, y = random_street(city, rng)
+        city.set_cell(x, y, City.BUILDING)
+        _, update_seconds = timed(engine.sync)
+
+        print(f"Mapa {size}x{size}: abstração {engine.node_count()} nós em "
+              f"{build_seconds * 1000:.0f} ms, atualização {update_seconds * 1000:.1f} ms "
+              f"({engine.rebuilt} clusters)")
+        print(f"  A*:   {totals[0] / queries * 1000:8.1f} ms por consulta")
+        print(f"  HPA*: {totals[1] / queries * 1000:8.1f} ms por consulta "
+              f"(custo {totals[3] / max(totals[2], 1):.3f}x o ótimo)")
+
+
+def bench_ch(size, queries, seed=1):
+    """Pré-processamento e consultas da hierarquia de contração vs. A*"""
+    city = create_grid_city(size, seed=seed)
+    city.generate_random_traffic(size)
+    rng = random.Random(seed)
+
+    hierarchy = ContractionHierarchy(city)
+    _, build_seconds = timed(hierarchy.build)
+    astar = PathFinder(city, cache_size=0)
+    ch = PathFinder(city, cache_size=0, strategy="ch")
+    ch.engines["ch"] = hierarchy
+
+    totals = [0.0, 0.0]
+    for _ in range(queries):
+        start = random_street(city, rng)
+        end = random_street(city, rng)
+        expected, astar_seconds = timed(astar.find_path, start, end)
+        path, ch_seconds = timed(ch.find_path, start, end)
+        if (path is None) != (expected is None) or \
+           (path and ch.path_cost(path) != astar.path_cost(expected)):
+            raise AssertionError("Custo da hierarquia difere do A*")
+        totals[0] += astar_seconds
+        totals[1] += ch_seconds
+
+    cells = sum(1 for cost in city.costs if cost)
+    print(f"Mapa {size}x{size}: {cells} células transitáveis, "
+          f"{hierarchy.graph.node_count()} nós de rua, {hierarchy.shortcuts} atalhos")
+    print(f"  pré-processamento: {build_seconds:.1f} s")
+    print(f"  A*: {totals[0] / queries * 1000:8.2f} ms por consulta")
+    print(f"  CH: {totals[1] / queries * 1000:8.2f} ms por consulta")
+
+
+def bench_streets(size, queries, seed=1):
+    """Compressão de corredores (nós por célula) e A* no grafo de ruas"""
+    cities = []
+    for filename in sorted(os.listdir("maps")):
+        if filename.endswith(".json"):
+            cities.append((filename, City.load_from_file(os.path.join("maps", filename))))
+    for spacing in (4, 8):
+        cities.append((f"grade {size}x{size}, ruas a cada {spacing}",
+                       create_grid_city(size, spacing=spacing, seed=seed)))
+
+    for label, city in cities:
+        cells = sum(1 for cost in city.costs if cost)
+        graph = StreetGraph(city)
+        print(f"{label}: {cells} células transitáveis -> {graph.node_count()} nós "
+              f"({cells / max(graph.node_count(), 1):.1f}x menos)")
+
+    city = cities[-1][1]
+    city.generate_random_traffic(size)
+    rng = random.Random(seed)
+    astar = PathFinder(city, cache_size=0)
+    streets = PathFinder(city, cache_size=0, strategy="streets")
+    streets.get_engine("streets").find_path(0, 0)
+
+    totals = [0.0, 0.0, 0, 0]
+    for _ in range(queries):
+        start = random_street(city, rng)
+        end = random_street(city, rng)
+        expected, astar_seconds = timed(astar.find_path, start, end)
+        path, streets_seconds = timed(streets.find_path, start, end)
+        if (path is None) != (expected is None) or \
+           (path and streets.path_cost(path) != astar.path_cost(expected)):
+            raise AssertionError("Custo no grafo de ruas difere do A*")
+        totals[0] += astar_seconds
+        totals[1] += streets_seconds
+        totals[2] += astar.last_expanded
+        totals[3] += streets.last_expanded
+
+    print(f"{city.name} com tráfego, {queries} consultas")
+    print(f"  A* no grid:       {totals[2]:8d} nós expandidos, {totals[0] * 1000:8.1f} ms")
+    print(f"  A* nas ruas:      {totals[3]:8d} nós expandidos, {totals[1] * 1000:8.1f} ms")
+
+    # Edição: só os corredores em volta da célula são refeitos
+    x, y = random_street(city, rng)
+    city.set_cell(x, y, City.BUILDING)
+    graph = streets.get_engine("streets").graph
+    _, update_seconds = timed(graph.sync)
+    _, build_seconds = timed(StreetGraph, city)
+    print(f"  edição: atualização {update_seconds * 1000:.2f} ms vs. reconstrução {build_seconds * 1000:.0f} ms")
+
+
+def bench_bidirectional(size, queries, seed=1):
+    """Nós expandidos: A* vs. A* bidirecional em labirintos"""
+    cities = [City.load_from_file("maps/cidade_labirinto.json")]
+    for loops in (0.0, 0.05, 0.2):
+        city = create_maze_city(size, seed, loops)
+        city.name = f"{city.name}, {loops:.0%} de paredes derrubadas"
+        cities.append(city)
+
+    rng = random.Random(seed)
+    for city in cities:
+        astar = PathFinder(city, cache_size=0)
+        bidirectional = PathFinder(city, cache_size=0, strategy="bidirectional")
+        engine = bidirectional.get_engine("bidirectional")
+        totals = [0, 0, 0, 0.0, 0.0]
+
+        for _ in range(queries):
+            start = random_street(city, rng)
+            end = random_street(city, rng)
+            expected, astar_seconds = timed(astar.find_path, start, end)
+            path, bidirectional_seconds = timed(bidirectional.find_path, start, end)
+            if (path is None) != (expected is None) or \
+               (path and bidirectional.path_cost(path) != astar.path_cost(expected)):
+                raise AssertionError("Custo do A* bidirecional difere do A*")
+            if path is None or len(path) == 1:
+                continue
+            totals[0] += astar.last_expanded
+            totals[1] += engine.expanded_forward
+            totals[2] += engine.expanded_backward
+            totals[3] += astar_seconds
+            totals[4] += bidirectional_seconds
+
+        both = totals[1] + totals[2]
+        print(f"{city.name}, {queries} consultas")
+        print(f"  A*:           {totals[0]:8d} nós expandidos, {totals[3] * 1000:8.1f} ms")
+        print(f"  bidirecional: {both:8d} nós expandidos ({totals[1]} + {totals[2]}), "
+              f"{totals[4] * 1000:8.1f} ms ({1 - both / max(totals[0], 1):.0%} menos nós)")
+
+
+def bench_alt(size, queries, count, seed=1):
+    """Nós expandidos: A* com Manhattan vs. A* com landmarks (ALT)"""
+    cities = [City.load_from_file("maps/cidade_labirinto.json")]
+    for loops in (0.0, 0.05, 0.2):
+        city = create_maze_city(size, seed, loops)
+        city.name = f"{city.name}, {loops:.0%} de paredes derrubadas"
+        cities.append(city)
+
+    rng = random.Random(seed)
+    for city in cities:
+        astar = PathFinder(city, cache_size=0)
+        alt = PathFinder(city, cache_size=0, strategy="alt")
+        table = LandmarkTable(city, count)
+        _, build_seconds = timed(table.build)
+        alt.get_engine("alt").table = table
+        totals = [0, 0, 0.0, 0.0]
+
+        for _ in range(queries):
+            start = random_street(city, rng)
+            end = random_street(city, rng)
+            expected, astar_seconds = timed(astar.find_path, start, end)
+            path, alt_seconds = timed(alt.find_path, start, end)
+            if (path is None) != (expected is None) or \
+               (path and alt.path_cost(path) != astar.path_cost(expected)):
+                raise AssertionError("Custo do ALT difere do A*")
+            if path is None or len(path) == 1:
+                continue
+            totals[0] += astar.last_expanded
+            totals[1] += alt.last_expanded
+            totals[2] += astar_seconds
+            totals[3] += alt_seconds
+
+        size_kb = sum(len(t) * t.itemsize for t in table.tables) / 1024
+        print(f"{city.name}, {queries} consultas")
+        print(f"  tabelas: {len(table.landmarks)} landmarks, {size_kb:.0f} KB, "
+              f"{build_seconds * 1000:.0f} ms")
+        print(f"  Manhattan: {totals[0]:8d} nós expandidos, {totals[2] * 1000:8.1f} ms")
+        print(f"  ALT:       {totals[1]:8d} nós expandidos, {totals[3] * 1000:8.1f} ms "
+              f"({1 - totals[1] / max(totals[0], 1):.0%} menos nós)")
+
+
+def bench_render(size, frames):
+    """Tempo para redesenhar a vista inteira: um blit por tile, atlas com Surface.blits e o padrão por zoom"""
+    # Sem janela de verdade quando não há tela (CI)
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import main as app_module
+
+    app = app_module.WazeApp()
+    city = create_grid_city(size)
+    city.generate_random_traffic(size * 10)
+    app.city = city
+    app.render()
+
+    print(f"Vista de {app_module.VIEW_WIDTH}x{app_module.VIEW_HEIGHT} px, mapa {size}x{size}, "
+          f"{frames} quadros por medida")
+    for zoom in range(app_module.ZOOM_LEVELS):
+        app.set_zoom(zoom)
+        app.render()
+        x0, y0, x1, y1 = app.visible_cells
+        times = []
+        # Tiles, atlas e o modo que o aplicativo escolhe para o zoom
+        for use_atlas in (False, True, None):
+            app.use_atlas = use_atlas
+            start = time.perf_counter()
+            for _ in range(frames):
+                app.draw_grid()
+            times.append((time.perf_counter() - start) / frames)
+        chosen = "atlas" if app.cell_size <= app_module.ATLAS_MAX_CELL_SIZE else "tiles"
+        print(f"  zoom {zoom} ({app.cell_size} px, {(x1 - x0) * (y1 - y0)} células): "
+              f"tiles {times[0] * 1000:6.2f} ms, atlas {times[1] * 1000:6.2f} ms, "
+              f"padrão ({chosen}) {times[2] * 1000:6.2f} ms")
+
+
+def bench_traffic(size, ticks, spawn, seed=1):
+    """Tempo por tick da simulação de tráfego e células alteradas"""
+    city = create_grid_city(size, seed=seed)
+    simulation = TrafficSimulation(city, seed=seed, spawn_per_tick=spawn)
+    # Índices de ruas e engarrafamentos (uma vez por mapa)
+    _, seconds = timed(simulation.tick)
+    print(f"Mapa {size}x{size}, {len(city.cell_index(City.STREET))} ruas, "
+          f"{spawn} engarrafamentos novos por tick")
+    print(f"  primeiro tick (monta os índices): {seconds * 1000:.1f} ms")
+
+    times = []
+    changes = []
+    for _ in range(ticks):
+        version = city.version
+        (added, removed), seconds = timed(simulation.tick)
+        journal = city.changes_since(version)
+        if journal is not None and len(journal) != len(added) + len(removed):
+            raise AssertionError("Histórico da cidade difere das alterações do tick")
+        times.append(seconds)
+        changes.append(len(added) + len(removed))
+
+    times.sort()
+    print(f"  {ticks} ticks: média {sum(times) / ticks * 1000:.1f} ms, "
+          f"p95 {times[int(ticks * 0.95) - 1] * 1000:.1f} ms, máximo {times[-1] * 1000:.1f} ms")
+    print(f"  células alteradas por tick: média {sum(changes) / ticks:.0f}, "
+          f"último {changes[-1]}; engarrafamentos no fim: {len(city.cell_index(City.TRAFFIC))}")
+
+
+def bench_time_dependent(size, queries, spawn, seed=1):
+    """Rota com o tráfego da partida vs. rota com a previsão de 24 ticks"""
+    city = create_grid_city(size, seed=seed)
+    simulation = TrafficSimulation(city, seed=seed, spawn_per_tick=spawn)
+    simulation.run(40)
+
+    forecast, seconds = timed(TrafficForecast.from_simulation, simulation)
+    profiled = sum(1 for profile_id in forecast.profile_ids if profile_id)
+    print(f"Mapa {size}x{size}, previsão de {forecast.horizon} ticks de "
+          f"{forecast.tick_length}: {seconds * 1000:.0f} ms, {profiled} células com perfil, "
+          f"{len(forecast.profiles) - 1} perfis distintos")
+
+    static = PathFinder(city, cache_size=0)
+    pathfinder = PathFinder(city, cache_size=0)
+    rng = random.Random(seed)
+    totals = [0, 0, 0.0, 0.0]
+    for _ in range(queries):
+        start = random_street(city, rng)
+        end = random_street(city, rng)
+        path, static_seconds = timed(static.find_path, start, end)
+        timed_path, timed_seconds = timed(pathfinder.find_path_at, start, end, forecast)
+        if path is None or timed_path is None:
+            continue
+        static_arrival = forecast.path_arrival([y * size + x for x, y in path])
+        if pathfinder.last_arrival > static_arrival:
+            raise AssertionError("Rota dependente do tempo chega depois da rota estática")
+        totals[0] += static_arrival
+        totals[1] += pathfinder.last_arrival
+        totals[2] += static_seconds
+        totals[3] += timed_seconds
+
+    print(f"  {queries} rotas: chegada somada com tráfego da partida {totals[0]}, "
+          f"com previsão {totals[1]} ({1 - totals[1] / max(totals[0], 1):.1%} mais cedo)")
+    print(f"  tempo de busca: A* {totals[2] * 1000:.0f} ms, dependente do tempo "
+          f"{totals[3] * 1000:.0f} ms")
+
+
+# Módulos que precisam importar rápido (camada de rotas e ferramentas de
+# linha de comando) e os que só não podem carregar o pygame (o servidor
+# paga pelo asyncio)
+FAST_MODULES = ("city", "pathfinding", "map_format", "escolher_mapa",
+                "create_sample_maps", "create_sample_images", "main")
+HEADLESS_MODULES = FAST_MODULES + ("route_worker", "traffic_sim", "time_dependent", "server")
+
+
+def bench_startup(runs, budget_ms):
+    """
+    Tempo de import de cada módulo num interpretador novo (melhor de
+    runs). Encerra com erro se algum de FAST_MODULES passar de budget_ms
+    ou se algum módulo carregar o pygame, para rodar no CI.
+    """
+    script = ("import sys, time; start = time.perf_counter(); import {}; "
+              "print(time.perf_counter() - start, 'pygame.base' in sys.modules)")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    print(f"Import em interpretador novo (melhor de {runs}), limite {budget_ms} ms")
+
+    failures = []
+    for name in HEADLESS_MODULES:
+        best = None
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", script.format(name)], cwd=directory,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            seconds, loaded = float(output[-2]), output[-1] == "True"
+            best = seconds if best is None else min(best, seconds)
+        problems = []
+        if name in FAST_MODULES and best * 1000 > budget_ms:
+            problems.append("lento")
+        if loaded:
+            problems.append("carregou o pygame")
+        if problems:
+            failures.append(name)
+        print(f"  {name:22s} {best * 1000:6.1f} ms {' '.join(problems)}")
+
+    if failures:
+        raise SystemExit(f"Import lento ou com pygame: {', '.join(failures)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medições de desempenho do roteamento")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replanning = commands.add_parser("replanning", help="replanejamento incremental vs. A*")
+    replanning.add_argument("--size", type=int, default=500)
+    replanning.add_argument("--batches", type=int, default=10)
+    replanning.add_argument("--batch-size", type=int, default=5)
+
+    jps = commands.add_parser("jps", help="Jump Point Search vs. A*")
+    jps.add_argument("--size", type=int, default=500)
+    jps.add_argument("--queries", type=int, default=5)
+
+    parallel = commands.add_parser("parallel", help="lote serial vs. vários processos")
+    parallel.add_argument("--size", type=int, default=300)
+    parallel.add_argument("--queries", type=int, default=2000)
+    parallel.add_argument("--sources", type=int, default=200)
+    parallel.add_argument("--workers", type=int, default=None)
+
+    hpa = commands.add_parser("hpa", help="busca hierárquica vs. A* em viagens longas")
+    hpa.add_argument("--sizes", type=int, nargs="+", default=[200, 400, 800])
+    hpa.add_argument("--queries", type=int, default=5)
+
+    ch = commands.add_parser("ch", help="hierarquia de contração vs. A*")
+    ch.add_argument("--size", type=int, default=300)
+    ch.add_argument("--queries", type=int, default=200)
+
+    streets = commands.add_parser("streets", help="grafo de ruas comprimido vs. grid")
+    streets.add_argument("--size", type=int, default=300)
+    streets.add_argument("--queries", type=int, default=50)
+
+    bidirectional = commands.add_parser("bidirectional", help="A* bidirecional vs. A* em labirintos")
+    bidirectional.add_argument("--size", type=int, default=201)
+    bidirectional.add_argument("--queries", type=int, default=30)
+
+    alt = commands.add_parser("alt", help="heurística de landmarks (ALT) vs. Manhattan")
+    alt.add_argument("--size", type=int, default=201)
+    alt.add_argument("--queries", type=int, default=30)
+    alt.add_argument("--landmarks", type=int, default=8)
+
+    render = commands.add_parser("render", help="desenho do grid: tiles vs. atlas")
+    render.add_argument("--size", type=int, default=2000)
+    render.add_argument("--frames", type=int, default=30)
+
+    traffic = commands.add_parser("traffic", help="simulação de tráfego por ticks")
+    traffic.add_argument("--size", type=int, default=1000)
+    traffic.add_argument("--ticks", type=int, default=200)
+    traffic.add_argument("--spawn", type=int, default=1000)
+
+    timed_routes = commands.add_parser("timed", help="rotas dependentes do tempo vs. tráfego da partida")
+    timed_routes.add_argument("--size", type=int, default=1000)
+    timed_routes.add_argument("--queries", type=int, default=10)
+    timed_routes.add_argument("--spawn", type=int, default=1000)
+
+    startup = commands.add_parser("startup", help="tempo de import dos módulos sem interface")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--budget-ms", type=float, default=100)
+
+    args = parser.parse_args()
+    if args.command == "replanning":
+        bench_replanning(args.size, args.batches, args.batch_size)
+    elif args.command == "jps":
+        bench_jps(args.size, args.queries)
+    elif args.command == "parallel":
+        bench_parallel(args.size, args.queries, args.sources, args.workers)
+    elif args.command == "hpa":
+        bench_hpa(args.sizes, args.queries)
+    elif args.command == "ch":
+        bench_ch(args.size, args.queries)
+    elif args.command == "streets":
+        bench_streets(args.size, args.queries)
+    elif args.command == "bidirectional":
+        bench_bidirectional(args.size, args.queries)
+    elif args.command == "alt":
+        bench_alt(args.size, args.queries, args.landmarks)
+    elif args.command == "render":
+        bench_render(args.size, args.frames)
+    elif args.command == "traffic":
+        bench_traffic(args.size, args.ticks, args.spawn)
+    elif args.command == "timed":
+        bench_time_dependent(args.size, args.queries, args.spawn)
+    elif args.command == "startup":
+        bench_startup(args.runs, args.budget_ms)
+
+
+if __name__ == "__main__":
+    main()
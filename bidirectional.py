@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Classe BidirectionalAStar - A* bidirecional
+
+Duas buscas crescem ao mesmo tempo, uma a partir da partida e outra
+(percorrendo as arestas ao contrário) a partir do destino. Cada lado usa
+o potencial médio das duas heurísticas Manhattan:
+
+    p(v) = (h_destino(v) - h_partida(v)) / 2   (a busca reversa usa -p)
+
+que é consistente nos dois sentidos. Com ele, o critério de parada é o
+do Dijkstra bidirecional: parar quando o topo da fila de frente mais o
+topo da fila de trás alcança o melhor caminho já visto (tudo em dobro
+para ficar em inteiros). As rotas têm o mesmo custo do A* comum.
+
+Em labirintos a fronteira de uma busca só cresce muito; com duas buscas
+cada uma cobre mais ou menos metade da distância. Empates de chave vão
+para o nó mais fundo (maior custo acumulado).
+"""
+
+import heapq
+from array import array
+
+
+class BidirectionalAStar:
+
+    def __init__(self, city):
+        self.city = city
+
+        # Nós fechados na última busca (os dois lados somados)
+        self.expanded = 0
+        self.expanded_forward = 0
+        self.expanded_backward = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """Retorna a tupla de índices do caminho ou None"""
+        city = self.city
+        costs = city.costs
+        width = city.width
+        last_x = width - 1
+        last_y = city.height - 1
+        size = width * city.height
+        min_cost = city.min_cost()
+        start_y, start_x = divmod(start_idx, width)
+        goal_y, goal_x = divmod(goal_idx, width)
+
+        # Índice 0 = frente, 1 = trás
+        g_scores = (array('l', [-1]) * size, array('l', [-1]) * size)
+        parents = (array('l', [-1]) * size, array('l', [-1]) * size)
+        closed = (bytearray(size), bytearray(size))
+        heaps = ([], [])
+        expanded = [0, 0]
+
+        def potential(index, side):
+            """Dobro do potencial médio (positivo na frente, negativo atrás)"""
+            y, x = divmod(index, width)
+            h_goal = abs(x - goal_x) + abs(y - goal_y)
+            h_start = abs(x - start_x) + abs(y - start_y)
+            value = (h_goal - h_start) * min_cost
+            return value if side == 0 else -value
+
+        for side, origin in ((0, start_idx), (1, goal_idx)):
+            g_scores[side][origin] = 0
+            heaps[side].append((potential(origin, side), 0, origin))
+
+        best = -1
+        meeting = -1
+        push = heapq.heappush
+        pop = heapq.heappop
+
+        while heaps[0] and heaps[1]:
+            # Critério de parada (chaves em dobro)
+            if best != -1 and heaps[0][0][0] + heaps[1][0][0] >= 2 * best:
+                break
+
+            # Expande o lado com a fronteira menor
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            key, depth, current = pop(heaps[side])
+            if closed[side][current]:
+                continue
+            closed[side][current] = 1
+            expanded[side] += 1
+
+            g = g_scores[side]
+            other_g = g_scores[1 - side]
+            parent = parents[side]
+            current_g = g[current]
+            # Na frente o passo custa a célula de destino; atrás, a atual
+            step = costs[current]
+
+            y, x = divmod(current, width)
+            neighbors = []
+            if y > 0:
+                neighbors.append(current - width)
+            if x < last_x:
+                neighbors.append(current + 1)
+            if y < last_y:
+                neighbors.append(current + width)
+            if x > 0:
+                neighbors.append(current - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or closed[side][n]:
+                    continue
+                tentative_g = current_g + (cost if side == 0 else step)
+                if g[n] != -1 and tentative_g >= g[n]:
+                    continue
+                g[n] = tentative_g
+                parent[n] = current
+                push(heaps[side], (2 * tentative_g + potential(n, side), -tentative_g, n))
+
+                if other_g[n] != -1 and (best == -1 or tentative_g + other_g[n] < best):
+                    best = tentative_g + other_g[n]
+                    meeting = n
+
+            # A origem do outro lado também pode ser o ponto de encontro
+            if other_g[current] != -1 and (best == -1 or current_g + other_g[current] < best):
+                best = current_g + other_g[current]
+                meeting = current
+
+        self.expanded_forward, self.expanded_backward = expanded
+        self.expanded = expanded[0] + expanded[1]
+        if meeting == -1:
+            return None
+        return self._build_path(parents, meeting)
+
+    def _build_path(self, parents, meeting):
+        """Partida até o encontro pela frente, encontro até o destino por trás"""
+        path = []
+        current = meeting
+        while current != -1:
+            path.append(current)
+            current = parents[0][current]
+        path.reverse()
+        current = parents[1][meeting]
+        while current != -1:
+            path.append(current)
+            current = parents[1][current]
+        return tuple(path)
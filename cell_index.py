@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Classe CellIndex - Conjunto das células de um tipo
+
+Guarda os índices (y * width + x) das células de um tipo numa lista
+densa, com a posição de cada célula na lista num array do tamanho do
+mapa (-1 = fora do conjunto). Inserir, remover e testar são O(1), e
+sortear células é direto sobre a lista. O índice é atualizado de forma
+incremental a cada set_cell.
+"""
+
+from array import array
+
+
+class CellIndex:
+
+    def __init__(self, city, cell_type):
+        self.city = city
+        self.cell_type = cell_type
+        self.items = array('l')
+        self.positions = array('l', [-1]) * (city.width * city.height)
+        self.build()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, index):
+        return self.positions[index] != -1
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def build(self):
+        """Procura todas as células do tipo no mapa"""
+        items = array('l', self.city.find_cells(self.cell_type))
+        positions = self.positions
+        for position, index in enumerate(items):
+            positions[index] = position
+        self.items = items
+
+    def add(self, index):
+        if self.positions[index] == -1:
+            self.positions[index] = len(self.items)
+            self.items.append(index)
+
+    def discard(self, index):
+        """Remove a célula trocando-a pela última da lista"""
+        positions = self.positions
+        position = positions[index]
+        if position == -1:
+            return
+        items = self.items
+        last = items.pop()
+        if last != index:
+            items[position] = last
+            positions[last] = position
+        positions[index] = -1
+
+    def cell_changed(self, index, old_type, new_type):
+        """Atualiza o índice quando uma célula muda de tipo"""
+        if old_type == self.cell_type:
+            self.discard(index)
+        elif new_type == self.cell_type:
+            self.add(index)
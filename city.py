@@ -4,6 +4,11 @@ Classe City - Representa uma cidade com seu mapa bidimensional
 """
 
 import json
+import random
+
+import map_format
+from cell_index import CellIndex
+from components import ComponentIndex
 
 class City:
 
@@ -14,6 +19,15 @@ class City:
     PARK = 4
     TRAFFIC = 5  
     
+    # Custo padrão de entrar em cada tipo de célula (ausente = bloqueada)
+    DEFAULT_COSTS = {
+        STREET: 1,
+        TRAFFIC: 10
+    }
+    
+    # Quantas alterações de célula o histórico guarda antes de descartar
+    JOURNAL_LIMIT = 65536
+    
     CELL_NAMES = {
         0: "Vazio",
         1: "Rua",
@@ -23,46 +37,279 @@ class City:
         5: "Engarrafamento"
     }
     
-    def __init__(self, width, height, name="Cidade"):
+    def __init__(self, width, height, name="Cidade", cells=None):
         self.width = width
         self.height = height
         self.name = name
         
-        self.grid = []
-        for i in range(height):
-            row = []
-            for j in range(width):
-                row.append(self.EMPTY)
-            self.grid.append(row)
+        # Grid em ordem de linhas: um byte por célula, índice y * width + x.
+        # Pode ser um bytearray ou um mmap vindo de um arquivo .wmap
+        if cells is None:
+            cells = bytearray(width * height)
+        elif len(cells) != width * height:
+            raise ValueError("Tamanho do grid não corresponde ao mapa")
+        self.cells = cells
+        
+        # Tabela de custo por tipo de célula (0 = bloqueada) e o custo de
+        # cada célula, um byte por célula ao lado do grid. O grid de custos
+        # só é montado no primeiro uso (ver costs): abrir e desenhar um
+        # mapa .wmap grande não lê o arquivo inteiro
+        self.cost_table = bytearray(256)
+        for cell_type, cost in self.DEFAULT_COSTS.items():
+            self.cost_table[cell_type] = cost
+        self._costs = None
+        
+        # Índice de componentes conexos e conjuntos de células por tipo
+        # (criados sob demanda)
+        self._components = None
+        self._cell_indices = {}
         
-        self.traffic_positions = []
+        # Versão do mapa: aumenta a cada alteração. O histórico guarda as
+        # alterações (índice, tipo antigo, tipo novo) desde journal_base
+        self.version = 0
+        self._journal = []
+        self._journal_base = 0
+        self._uniform_costs = (None, True)
+    
+    @property
+    def grid(self):
+        """Cópia do mapa como lista de linhas (formato antigo)"""
+        return [list(self.get_row(y)) for y in range(self.height)]
+    
+    @grid.setter
+    def grid(self, rows):
+        cells = bytearray()
+        for row in rows:
+            if len(row) != self.width:
+                raise ValueError("Linha do grid com largura inválida")
+            cells += bytes(row)
+        if len(cells) != self.width * self.height:
+            raise ValueError("Grid com altura inválida")
+        self.cells = cells
+        self._bulk_changed()
+    
+    @property
+    def costs(self):
+        """Custo de entrar em cada célula (0 = bloqueada), montado sob demanda"""
+        if self._costs is None:
+            self._costs = self.translate(self.cost_table)
+        return self._costs
+    
+    @property
+    def components(self):
+        """Índice de componentes conexos das ruas, mantido a cada edição"""
+        if self._components is None:
+            self._components = ComponentIndex(self)
+        return self._components
+    
+    @property
+    def traffic_positions(self):
+        """Posições [[x, y], ...] dos engarrafamentos"""
+        width = self.width
+        return [[i % width, i // width] for i in self.cell_index(self.TRAFFIC)]
+    
+    def cell_index(self, cell_type):
+        """Conjunto das células de um tipo, mantido a cada edição"""
+        cell_index = self._cell_indices.get(cell_type)
+        if cell_index is None:
+            cell_index = CellIndex(self, cell_type)
+            self._cell_indices[cell_type] = cell_index
+        return cell_index
     
     def set_cell(self, x, y, cell_type):
         if 0 <= y < self.height and 0 <= x < self.width:
-            self.grid[y][x] = cell_type
+            index = y * self.width + x
+            old_type = self.cells[index]
+            self.cells[index] = cell_type
+            old_cost = self.cost_table[old_type]
+            new_cost = self.cost_table[cell_type]
+            if self._costs is not None:
+                self._costs[index] = new_cost
+            
+            if old_type != cell_type:
+                self.version += 1
+                self._journal.append((index, old_type, cell_type))
+                self._trim_journal()
+                
+                if self._components is not None:
+                    self._components.cell_changed(index, old_cost != 0, new_cost != 0)
+                for cell_index in self._cell_indices.values():
+                    cell_index.cell_changed(index, old_type, cell_type)
             return True
         return False
     
+    def set_cells(self, indices, cell_type):
+        """
+        Muda várias células (índices y * width + x) para cell_type de uma
+        vez. Ao contrário de set_row e fill_region, cada alteração entra no
+        histórico e nos índices, como em set_cell. Índices fora do mapa são
+        ignorados, como as posições fora do mapa em set_cell. Retorna o
+        número de células alteradas.
+        """
+        cells = self.cells
+        size = len(cells)
+        costs = self._costs
+        cost_table = self.cost_table
+        new_cost = cost_table[cell_type]
+        journal = self._journal
+        components = self._components
+        cell_indices = list(self._cell_indices.values())
+        
+        changed = 0
+        for index in indices:
+            # Índice negativo daria a volta no array (e no espelho do RouteWorker)
+            if not 0 <= index < size:
+                continue
+            old_type = cells[index]
+            if old_type == cell_type:
+                continue
+            old_cost = cost_table[old_type]
+            cells[index] = cell_type
+            if costs is not None:
+                costs[index] = new_cost
+            journal.append((index, old_type, cell_type))
+            if components is not None:
+                components.cell_changed(index, old_cost != 0, new_cost != 0)
+            for cell_index in cell_indices:
+                cell_index.cell_changed(index, old_type, cell_type)
+            changed += 1
+        
+        self.version += changed
+        self._trim_journal()
+        return changed
+    
+    def _trim_journal(self):
+        """Descarta a metade mais antiga do histórico quando ele passa do limite"""
+        if len(self._journal) > self.JOURNAL_LIMIT:
+            drop = len(self._journal) - self.JOURNAL_LIMIT // 2
+            del self._journal[:drop]
+            self._journal_base += drop
+    
+    def changes_since(self, version):
+        """
+        Lista as alterações (índice, tipo antigo, tipo novo) feitas depois
+        da versão dada. Retorna None quando não é possível saber quais
+        células mudaram (histórico descartado ou alteração em bloco).
+        """
+        if version < self._journal_base:
+            return None
+        return self._journal[version - self._journal_base:]
+    
+    def _bulk_changed(self):
+        """Registra uma alteração em bloco: descarta histórico, custos e índices"""
+        self._costs = None
+        self.version += 1
+        self._journal = []
+        self._journal_base = self.version
+        self._components = None
+        self._cell_indices = {}
+    
     def get_cell(self, x, y):
         """Obtém o tipo de uma célula"""
         if 0 <= y < self.height and 0 <= x < self.width:
-            return self.grid[y][x]
+            return self.cells[y * self.width + x]
         return None
     
     def is_walkable(self, x, y):
-        """Verifica se uma célula é transitável (rua)"""
+        """Verifica se uma célula é transitável (rua, com ou sem tráfego)"""
         if 0 <= y < self.height and 0 <= x < self.width:
-            cell_type = self.grid[y][x]
-            return cell_type == self.STREET
+            return self.cost_table[self.cells[y * self.width + x]] != 0
         return False
     
+    def walkable_mask(self):
+        """
+        Retorna um bytearray plano (índice y * width + x) com 1 nas
+        células transitáveis e 0 nas demais.
+        """
+        table = bytearray(256)
+        table[1:] = b"\x01" * 255
+        return self.costs.translate(table)
+    
+    def get_cost(self, x, y):
+        """Custo de entrar na célula (0 = bloqueada)"""
+        if 0 <= y < self.height and 0 <= x < self.width:
+            return self.cost_table[self.cells[y * self.width + x]]
+        return 0
+    
+    def cell_cost(self, cell_type):
+        """Custo de entrar numa célula do tipo dado (0 = bloqueada)"""
+        return self.cost_table[cell_type]
+    
+    def set_cell_cost(self, cell_type, cost):
+        """
+        Define o custo de um tipo de célula (1 a 255, ou 0 para bloquear).
+        Todas as células do tipo mudam, então conta como alteração em bloco.
+        """
+        if not 0 <= cost <= 255:
+            raise ValueError("Custo deve estar entre 0 e 255")
+        if self.cost_table[cell_type] != cost:
+            self.cost_table[cell_type] = cost
+            self._bulk_changed()
+    
+    def has_uniform_costs(self):
+        """Verifica se todas as células transitáveis do mapa têm o mesmo custo"""
+        version, uniform = self._uniform_costs
+        if version != self.version:
+            present = set()
+            for cell_type in range(256):
+                cost = self.cost_table[cell_type]
+                if cost and self.cells.find(bytes([cell_type])) != -1:
+                    present.add(cost)
+            uniform = len(present) <= 1
+            self._uniform_costs = (self.version, uniform)
+        return uniform
+    
+    def min_cost(self):
+        """Menor custo positivo da tabela (base da heurística admissível)"""
+        positive = [cost for cost in self.cost_table if cost > 0]
+        return min(positive) if positive else 1
+    
+    def get_row(self, y):
+        """Retorna uma cópia (bytes) da linha y"""
+        start = y * self.width
+        return bytes(self.cells[start:start + self.width])
+    
+    def set_row(self, y, values):
+        """Substitui a linha y inteira pelos valores dados"""
+        if not 0 <= y < self.height or len(values) != self.width:
+            return False
+        start = y * self.width
+        self.cells[start:start + self.width] = bytes(values)
+        self._bulk_changed()
+        return True
+    
+    def fill_region(self, x, y, width, height, cell_type):
+        """
+        Preenche o retângulo (x, y, width, height) com cell_type.
+        A região é recortada aos limites do mapa. Retorna o número de
+        células alteradas.
+        """
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return 0
+        
+        run = bytes([cell_type]) * (x1 - x0)
+        for row in range(y0, y1):
+            start = row * self.width + x0
+            self.cells[start:start + len(run)] = run
+        self._bulk_changed()
+        return (x1 - x0) * (y1 - y0)
+    
+    def find_cells(self, cell_type):
+        """Lista os índices (y * width + x) das células de um tipo"""
+        indices = []
+        value = bytes([cell_type])
+        i = self.cells.find(value)
+        while i != -1:
+            indices.append(i)
+            i = self.cells.find(value, i + 1)
+        return indices
+    
     def add_traffic(self, x, y):
         """Adiciona engarrafamento em uma posição"""
         if self.get_cell(x, y) == self.STREET:
             self.set_cell(x, y, self.TRAFFIC)
-
-            pos = [x, y]
-            self.traffic_positions.append(pos)
             return True
         return False
     
@@ -70,66 +317,74 @@ class City:
         """Remove engarrafamento de uma posição"""
         if self.get_cell(x, y) == self.TRAFFIC:
             self.set_cell(x, y, self.STREET)
-            i = 0
-            while i < len(self.traffic_positions):
-                pos = self.traffic_positions[i]
-                if pos[0] == x and pos[1] == y:
-                    new_traffic = []
-                    for j in range(len(self.traffic_positions)):
-                        if j != i:
-                            new_traffic.append(self.traffic_positions[j])
-                    self.traffic_positions = new_traffic
-                    break
-                i += 1
             return True
         return False
     
+    def add_traffic_cells(self, indices):
+        """
+        Adiciona engarrafamento em várias células (índices y * width + x);
+        as que não são rua ou estão fora do mapa são ignoradas. Retorna
+        quantas mudaram.
+        """
+        cells = self.cells
+        size = len(cells)
+        street = self.STREET
+        return self.set_cells([i for i in indices if 0 <= i < size and cells[i] == street],
+                              self.TRAFFIC)
+    
+    def remove_traffic_cells(self, indices):
+        """
+        Remove engarrafamento de várias células (índices fora do mapa são
+        ignorados). Retorna quantas mudaram.
+        """
+        cells = self.cells
+        size = len(cells)
+        traffic = self.TRAFFIC
+        return self.set_cells([i for i in indices if 0 <= i < size and cells[i] == traffic],
+                              self.STREET)
+    
     def clear_all_traffic(self):
         """Remove todos os engarrafamentos"""
-        for i in range(len(self.traffic_positions)):
-            pos = self.traffic_positions[i]
-            x, y = pos[0], pos[1]
-            if self.get_cell(x, y) == self.TRAFFIC:
-                self.set_cell(x, y, self.STREET)
-        
-        self.traffic_positions = []
+        return self.set_cells(list(self.cell_index(self.TRAFFIC)), self.STREET)
     
     def generate_random_traffic(self, num_traffic):
-        import random
-        
+        """Troca os engarrafamentos por num_traffic novos, em ruas sorteadas"""
         # Primeiro limpa tráfego existente
         self.clear_all_traffic()
         
-        # Encontra todas as posições de ruas usando arrays clássicos
-        street_positions = []
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.grid[y][x] == self.STREET:
-                    street_positions.append([x, y])
-        
-        count = 0
-        attempts = 0
-        max_attempts = num_traffic * 10
-        
-        while count < num_traffic and attempts < max_attempts:
-            if len(street_positions) > 0:
-                idx = random.randint(0, len(street_positions) - 1)
-                pos = street_positions[idx]
-                x, y = pos[0], pos[1]
-                
-                if self.add_traffic(x, y):
-                    count += 1
-            
-            attempts += 1
+        streets = self.cell_index(self.STREET).items
+        chosen = random.sample(range(len(streets)), min(num_traffic, len(streets)))
+        self.add_traffic_cells([streets[i] for i in chosen])
+    
+    def copy(self):
+        """Cópia independente do mapa (células e tabela de custos), sem histórico"""
+        city = City(self.width, self.height, self.name, cells=bytearray(self.cells))
+        city.cost_table[:] = self.cost_table
+        return city
     
     def clear(self):
         """Limpa o mapa inteiro"""
-        for y in range(self.height):
-            for x in range(self.width):
-                self.grid[y][x] = self.EMPTY
-        self.clear_all_traffic()
+        self.cells[:] = bytes(len(self.cells))
+        self._bulk_changed()
     
-    def save_to_file(self, filename):
+    def translate(self, table):
+        """Aplica uma tabela de 256 bytes a todas as células. Retorna um bytearray novo"""
+        cells = self.cells
+        if not isinstance(cells, bytearray):
+            # mmap: copia para um bytearray (cells[:] daria bytes, que não
+            # aceita as edições de set_cell em costs)
+            cells = bytearray(cells)
+        return cells.translate(table)
+    
+    def save_to_file(self, filename, compress=False):
+        """
+        Salva o mapa. Arquivos .wmap usam o formato binário (opcionalmente
+        comprimido), os demais usam JSON.
+        """
+        if map_format.is_binary_map(filename):
+            return map_format.write_map(filename, self.name, self.width,
+                                        self.height, self.cells, compress)
+        
         data = {
             'name': self.name,
             'width': self.width,
@@ -144,16 +399,17 @@ class City:
     
     @staticmethod
     def load_from_file(filename):
-        """Carrega um mapa de arquivo JSON"""
+        """Carrega um mapa de arquivo JSON ou binário (.wmap)"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if map_format.is_binary_map(filename):
+                name, width, height, cells = map_format.read_map(filename)
+                return City(width, height, name, cells)
             
-            city = City(data['width'], data['height'], data['name'])
-            city.grid = data['grid']
+            # Leitura incremental: não monta listas aninhadas
+            valid_codes = bytes(sorted(City.CELL_NAMES))
+            name, width, height, cells = map_format.read_json_map(filename, valid_codes)
             
-            return city
+            return City(width, height, name, cells)
         except Exception as e:
             print(f"Erro ao carregar arquivo: {e}")
             return None
-
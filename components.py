@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Classe ComponentIndex - Componentes conexos das células transitáveis
+
+Cada célula transitável recebe o rótulo do seu componente (0 = não
+transitável), de modo que "existe rota entre A e B?" é respondido em O(1).
+O índice é atualizado de forma incremental a cada set_cell.
+"""
+
+from array import array
+from collections import deque
+
+
+class ComponentIndex:
+
+    def __init__(self, city):
+        self.city = city
+        self.width = city.width
+        self.height = city.height
+        self.labels = array('l', [0]) * (city.width * city.height)
+        self.sizes = {}
+        self.next_label = 1
+        self.build()
+
+    def connected(self, index1, index2):
+        """Verifica se duas células (índices y * width + x) estão ligadas"""
+        label = self.labels[index1]
+        return label != 0 and label == self.labels[index2]
+
+    def label_of(self, index):
+        """Rótulo do componente de uma célula (0 = não transitável)"""
+        return self.labels[index]
+
+    def count(self):
+        """Número de componentes"""
+        return len(self.sizes)
+
+    def build(self):
+        """
+        Rotula todo o mapa. Trabalha com trechos contínuos de células
+        transitáveis em cada linha (união-busca entre trechos que se
+        sobrepõem em linhas vizinhas), não célula a célula.
+        """
+        width = self.width
+        mask = self.city.walkable_mask()
+        parent = []
+
+        def find(r):
+            while parent[r] != r:
+                parent[r] = parent[parent[r]]
+                r = parent[r]
+            return r
+
+        all_runs = []
+        previous = []
+        for y in range(self.height):
+            row_start = y * width
+            runs = []
+            x = mask.find(1, row_start, row_start + width)
+            while x != -1:
+                end = mask.find(0, x, row_start + width)
+                if end == -1:
+                    end = row_start + width
+                run_id = len(parent)
+                parent.append(run_id)
+                runs.append((x - row_start, end - row_start, run_id))
+                x = mask.find(1, end, row_start + width)
+
+            # Une trechos desta linha com os da linha de cima que se sobrepõem
+            i = j = 0
+            while i < len(runs) and j < len(previous):
+                a_start, a_end, a_id = runs[i]
+                b_start, b_end, b_id = previous[j]
+                if a_start < b_end and b_start < a_end:
+                    root_a, root_b = find(a_id), find(b_id)
+                    if root_a != root_b:
+                        parent[root_a] = root_b
+                if a_end < b_end:
+                    i += 1
+                else:
+                    j += 1
+
+            all_runs.append(runs)
+            previous = runs
+
+        labels = self.labels
+        sizes = {}
+        root_labels = {}
+        for y in range(self.height):
+            row_start = y * width
+            for start, end, run_id in all_runs[y]:
+                root = find(run_id)
+                label = root_labels.get(root)
+                if label is None:
+                    label = len(root_labels) + 1
+                    root_labels[root] = label
+                    sizes[label] = 0
+                labels[row_start + start:row_start + end] = array('l', [label]) * (end - start)
+                sizes[label] += end - start
+
+        self.sizes = sizes
+        self.next_label = len(root_labels) + 1
+
+    def cell_changed(self, index, was_walkable, is_walkable):
+        """Atualiza o índice quando uma célula muda de transitável ou não"""
+        if was_walkable == is_walkable:
+            return
+        if is_walkable:
+            self._add_cell(index)
+        else:
+            self._remove_cell(index)
+
+    def _neighbors(self, index):
+        """Índices vizinhos (4-direções) dentro do mapa"""
+        width = self.width
+        y, x = divmod(index, width)
+        neighbors = []
+        if y > 0:
+            neighbors.append(index - width)
+        if x < width - 1:
+            neighbors.append(index + 1)
+        if y < self.height - 1:
+            neighbors.append(index + width)
+        if x > 0:
+            neighbors.append(index - 1)
+        return neighbors
+
+    def _new_label(self):
+        label = self.next_label
+        self.next_label += 1
+        self.sizes[label] = 0
+        return label
+
+    def _add_cell(self, index):
+        """Nova célula transitável: junta os componentes vizinhos"""
+        labels = self.labels
+        neighbor_labels = []
+        for n in self._neighbors(index):
+            label = labels[n]
+            if label != 0 and label not in neighbor_labels:
+                neighbor_labels.append(label)
+
+        if not neighbor_labels:
+            target = self._new_label()
+        else:
+            # O maior componente fica com o rótulo; os menores são reescritos
+            target = max(neighbor_labels, key=lambda label: self.sizes[label])
+            for label in neighbor_labels:
+                if label != target:
+                    self._relabel(label, target, index)
+
+        labels[index] = target
+        self.sizes[target] += 1
+
+    def _relabel(self, old_label, new_label, near):
+        """Reescreve o componente old_label (vizinho de near) como new_label"""
+        labels = self.labels
+        seed = -1
+        for n in self._neighbors(near):
+            if labels[n] == old_label:
+                seed = n
+                break
+
+        queue = deque([seed])
+        labels[seed] = new_label
+        moved = 1
+        while queue:
+            current = queue.popleft()
+            for n in self._neighbors(current):
+                if labels[n] == old_label:
+                    labels[n] = new_label
+                    moved += 1
+                    queue.append(n)
+
+        self.sizes[new_label] += moved
+        del self.sizes[old_label]
+
+    def _remove_cell(self, index):
+        """
+        Célula deixou de ser transitável. O componente pode ter se
+        partido: busca em paralelo a partir de cada vizinho, unindo as
+        buscas que se encontram. Uma busca que se esgota sem encontrar as
+        outras é um pedaço separado e ganha rótulo novo. A maior parte
+        (a última busca ativa) mantém o rótulo antigo sem ser percorrida.
+        """
+        labels = self.labels
+        label = labels[index]
+        labels[index] = 0
+        self.sizes[label] -= 1
+        if self.sizes[label] == 0:
+            del self.sizes[label]
+            return
+
+        seeds = [n for n in self._neighbors(index) if labels[n] == label]
+        if len(seeds) < 2:
+            return
+
+        group_parent = list(range(len(seeds)))
+
+        def find(g):
+            while group_parent[g] != g:
+                g = group_parent[g]
+            return g
+
+        owner = {}
+        frontiers = []
+        members = []
+        for g in range(len(seeds)):
+            owner[seeds[g]] = g
+            frontiers.append(deque([seeds[g]]))
+            members.append([seeds[g]])
+
+        active = list(range(len(seeds)))
+        while len(active) > 1:
+            for g in list(active):
+                if g not in active:
+                    continue
+
+                frontier = frontiers[g]
+                if not frontier:
+                    # Pedaço completo e separado do resto
+                    new_label = self._new_label()
+                    for c in members[g]:
+                        labels[c] = new_label
+                    self.sizes[new_label] = len(members[g])
+                    self.sizes[label] -= len(members[g])
+                    active.remove(g)
+                    continue
+
+                current = frontier.popleft()
+                for n in self._neighbors(current):
+                    if labels[n] != label:
+                        continue
+                    other = owner.get(n)
+                    if other is None:
+                        owner[n] = g
+                        members[g].append(n)
+                        frontier.append(n)
+                        continue
+
+                    other = find(other)
+                    if other != g:
+                        # As buscas se encontraram: mesmo pedaço
+                        group_parent[other] = g
+                        frontier.extend(frontiers[other])
+                        frontiers[other] = deque()
+                        members[g].extend(members[other])
+                        members[other] = []
+                        active.remove(other)
+
+        if self.sizes.get(label) == 0:
+            del self.sizes[label]
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+Classe ContractionHierarchy - Hierarquia de contração do grafo de ruas
+
+Pré-processamento (offline): os nós do StreetGraph são contraídos um a
+um, do menos para o mais importante (diferença de arestas). Ao contrair
+v, cada par u -> v -> w sem caminho alternativo tão barato (busca de
+testemunha limitada) ganha um atalho u -> w. A ordem de contração vira o
+nível (rank) de cada nó.
+
+Consulta: duas buscas de Dijkstra que só sobem de nível, uma a partir da
+partida e outra (ao contrário) a partir do destino; o menor encontro é
+a rota ótima. Os atalhos são então expandidos até as arestas originais
+e estas até as células dos corredores.
+
+A hierarquia vale para os custos em que foi calculada. Ela é gravada ao
+lado do mapa (mesmo nome, extensão .ch) com o checksum dos custos; se o
+mapa mudar (tráfego, edição), is_current() retorna False até que os
+custos voltem a ser os mesmos.
+
+Uso:
+    python contraction.py maps/cidade_grande.json
+"""
+
+import heapq
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from streets import StreetGraph
+
+HIERARCHY_EXTENSION = ".ch"
+
+MAGIC = b"WZCH"
+VERSION = 1
+
+# magic, versão, largura, altura, checksum dos custos, nós, arestas
+HEADER = struct.Struct("<4sHIIIII")
+
+# Nós fechados por busca de testemunha (acima disso o atalho é mantido)
+WITNESS_LIMIT = 64
+
+
+def hierarchy_filename(map_filename):
+    """Arquivo da hierarquia ao lado do mapa: maps/x.json -> maps/x.ch"""
+    return os.path.splitext(map_filename)[0] + HIERARCHY_EXTENSION
+
+
+class ContractionHierarchy:
+
+    def __init__(self, city):
+        self.city = city
+        self.graph = None
+        self.checksum = None
+        self.version = None
+
+        # Nível de cada nó (ordem de contração)
+        self.rank = None
+        # nó -> [(nó de nível maior, custo)] das arestas que saem dele
+        self.up = None
+        # nó -> [(nó de nível maior, custo)] das arestas que chegam nele
+        self.down = None
+        # (u, w) -> nó do meio do atalho, ou -1 - corredor da aresta original
+        self.via = {}
+
+        self.shortcuts = 0
+        # Nós fechados na última busca (as duas direções)
+        self.expanded = 0
+
+    def is_current(self):
+        """Indica se a hierarquia corresponde aos custos atuais da cidade"""
+        city = self.city
+        if self.rank is None:
+            return False
+        if self.version == city.version:
+            return True
+        if zlib.crc32(city.costs) != self.checksum:
+            return False
+        self.version = city.version
+        return True
+
+    def build(self):
+        """Contrai todos os nós do grafo de ruas da cidade"""
+        city = self.city
+        graph = StreetGraph(city)
+        count = graph.node_count()
+
+        # Arestas de cada nó: destino/origem -> (custo, via)
+        out_edges = [{} for _ in range(count)]
+        in_edges = [{} for _ in range(count)]
+        for u, v, cost, corridor in graph.edges():
+            current = out_edges[u].get(v)
+            if current is None or cost < current[0]:
+                out_edges[u][v] = in_edges[v][u] = (cost, -1 - corridor)
+
+        rank = array('l', [-1]) * count
+        deleted_neighbors = [0] * count
+        heap = []
+        for v in range(count):
+            shortcuts = self._shortcuts(v, out_edges, in_edges, rank)
+            heap.append((self._priority(v, shortcuts, out_edges, in_edges, rank, deleted_neighbors), v))
+        heapq.heapify(heap)
+
+        level = 0
+        added = 0
+        while heap:
+            priority, v = heapq.heappop(heap)
+
+            # Atualização preguiçosa: recalcula e devolve se piorou
+            shortcuts = self._shortcuts(v, out_edges, in_edges, rank)
+            priority = self._priority(v, shortcuts, out_edges, in_edges, rank, deleted_neighbors)
+            if heap and priority > heap[0][0]:
+                heapq.heappush(heap, (priority, v))
+                continue
+
+            for u, w, cost in shortcuts:
+                current = out_edges[u].get(w)
+                if current is None or cost < current[0]:
+                    out_edges[u][w] = in_edges[w][u] = (cost, v)
+                    added += 1
+
+            rank[v] = level
+            level += 1
+            for neighbor in set(out_edges[v]) | set(in_edges[v]):
+                if rank[neighbor] == -1:
+                    deleted_neighbors[neighbor] += 1
+
+        edges = []
+        for u in range(count):
+            for w, (cost, via) in out_edges[u].items():
+                edges.append((u, w, cost, via))
+
+        self.graph = graph
+        self.shortcuts = added
+        self._set_edges(rank, edges)
+        self.checksum = zlib.crc32(city.costs)
+        self.version = city.version
+
+    def save(self, filename):
+        """Grava a hierarquia (níveis e arestas, com atalhos)"""
+        city = self.city
+        sources, targets, costs, vias = (array('i') for _ in range(4))
+        for u in range(len(self.rank)):
+            for w, cost in self.up[u]:
+                sources.append(u)
+                targets.append(w)
+                costs.append(cost)
+                vias.append(self.via[(u, w)])
+            for x, cost in self.down[u]:
+                sources.append(x)
+                targets.append(u)
+                costs.append(cost)
+                vias.append(self.via[(x, u)])
+
+        rank = array('i', self.rank)
+        header = HEADER.pack(MAGIC, VERSION, city.width, city.height,
+                             self.checksum, len(rank), len(sources))
+        with open(filename, "wb") as f:
+            f.write(header)
+            for data in (rank, sources, targets, costs, vias):
+                if sys.byteorder == "big":
+                    data.byteswap()
+                f.write(data.tobytes())
+        return True
+
+    def load(self, filename):
+        """
+        Lê a hierarquia gravada por save. Retorna False se ela foi
+        calculada para outro mapa ou outros custos.
+        """
+        city = self.city
+        with open(filename, "rb") as f:
+            raw = f.read(HEADER.size)
+            if len(raw) != HEADER.size:
+                raise ValueError("Arquivo de hierarquia truncado")
+            magic, version, width, height, checksum, nodes, edge_count = HEADER.unpack(raw)
+            if magic != MAGIC:
+                raise ValueError("Arquivo não é uma hierarquia de rotas")
+            if version != VERSION:
+                raise ValueError(f"Versão de hierarquia não suportada: {version}")
+            if (width, height) != (city.width, city.height) or checksum != zlib.crc32(city.costs):
+                return False
+
+            arrays = []
+            for length in (nodes, edge_count, edge_count, edge_count, edge_count):
+                data = array('i')
+                data.frombytes(f.read(length * data.itemsize))
+                if len(data) != length:
+                    raise ValueError("Arquivo de hierarquia truncado")
+                if sys.byteorder == "big":
+                    data.byteswap()
+                arrays.append(data)
+
+        graph = StreetGraph(city)
+        if graph.node_count() != nodes:
+            raise ValueError("Hierarquia não corresponde ao grafo de ruas do mapa")
+
+        rank, sources, targets, costs, vias = arrays
+        self.graph = graph
+        self.shortcuts = sum(1 for via in vias if via >= 0)
+        self._set_edges(array('l', rank), zip(sources, targets, costs, vias))
+        self.checksum = checksum
+        self.version = city.version
+        return True
+
+    def find_path(self, start_idx, goal_idx):
+        """Retorna a tupla de índices do caminho ou None"""
+        self.expanded = 0
+        if start_idx == goal_idx:
+            return (start_idx,)
+        graph = self.graph
+
+        start_paths = {}
+        start_costs = {}
+        for node, cost, cells in graph.exits(start_idx):
+            if node not in start_costs or cost < start_costs[node]:
+                start_costs[node] = cost
+                start_paths[node] = cells
+        goal_paths = {}
+        goal_costs = {}
+        for node, cost, cells in graph.entries(goal_idx):
+            if node not in goal_costs or cost < goal_costs[node]:
+                goal_costs[node] = cost
+                goal_paths[node] = cells
+
+        forward, forward_parents = self._upward(start_costs, self.up, self.down)
+        backward, backward_parents = self._upward(goal_costs, self.down, self.up, forward)
+
+        best = None
+        meeting = -1
+        for node, cost in backward.items():
+            if node in forward and (best is None or forward[node] + cost < best):
+                best = forward[node] + cost
+                meeting = node
+
+        # Partida e destino no mesmo corredor: a rota direta pode ser melhor
+        direct = graph.between(start_idx, goal_idx)
+        if direct is not None and (best is None or direct[1] <= best):
+            return direct[0]
+        if best is None:
+            return None
+
+        chain = []
+        node = meeting
+        while node != -1:
+            chain.append(node)
+            node = forward_parents[node]
+        chain.reverse()
+        node = backward_parents[meeting]
+        while node != -1:
+            chain.append(node)
+            node = backward_parents[node]
+
+        path = list(start_paths[chain[0]])
+        for i in range(1, len(chain)):
+            self._unpack(chain[i - 1], chain[i], path)
+        path.extend(goal_paths[chain[-1]][1:])
+        return tuple(path)
+
+    def _set_edges(self, rank, edges):
+        """Separa as arestas (u, w, custo, via) em subida e descida"""
+        count = len(rank)
+        up = [[] for _ in range(count)]
+        down = [[] for _ in range(count)]
+        via = {}
+        for u, w, cost, middle in edges:
+            via[(u, w)] = middle
+            if rank[w] > rank[u]:
+                up[u].append((w, cost))
+            else:
+                down[w].append((u, cost))
+        self.rank = rank
+        self.up = up
+        self.down = down
+        self.via = via
+
+    def _upward(self, initial, edges, stall_edges, other=None):
+        """
+        Dijkstra só subindo de nível. stall_edges são as arestas que
+        chegam ao nó vindas de cima: se alguma delas dá um custo menor, o
+        nó não está no caminho ótimo e não é expandido (stall-on-demand).
+        Com other (distâncias da outra busca), para quando nenhum encontro
+        pode melhorar o melhor atual. Retorna (distâncias, pais).
+        """
+        dist = dict(initial)
+        parents = {node: -1 for node in initial}
+        heap = [(cost, node) for node, cost in initial.items()]
+        heapq.heapify(heap)
+        settled = set()
+        best = None
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            if best is not None and d >= best:
+                break
+            settled.add(u)
+            if other is not None and u in other:
+                meeting = other[u] + d
+                if best is None or meeting < best:
+                    best = meeting
+
+            stalled = False
+            for x, cost in stall_edges[u]:
+                if x in dist and dist[x] + cost < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+
+            for w, cost in edges[u]:
+                nd = d + cost
+                if nd < dist.get(w, nd + 1):
+                    dist[w] = nd
+                    parents[w] = u
+                    heapq.heappush(heap, (nd, w))
+
+        self.expanded += len(settled)
+        return {node: dist[node] for node in settled}, parents
+
+    def _unpack(self, u, w, path):
+        """Acrescenta a path as células da aresta u -> w (sem a de u)"""
+        stack = [(u, w)]
+        while stack:
+            a, b = stack.pop()
+            middle = self.via[(a, b)]
+            if middle >= 0:
+                stack.append((middle, b))
+                stack.append((a, middle))
+            else:
+                path.extend(self.graph.oriented(-1 - middle, a)[1:])
+
+    def _shortcuts(self, v, out_edges, in_edges, rank):
+        """Atalhos necessários para contrair v: [(u, w, custo)]"""
+        ins = [(u, cost) for u, (cost, via) in in_edges[v].items() if rank[u] == -1]
+        outs = [(w, cost) for w, (cost, via) in out_edges[v].items() if rank[w] == -1]
+        shortcuts = []
+        if not ins or not outs:
+            return shortcuts
+
+        max_out = max(cost for w, cost in outs)
+        for u, cost_in in ins:
+            limit = cost_in + max_out
+            dist = self._witness(u, v, limit, out_edges, rank)
+            for w, cost_out in outs:
+                if w != u and dist.get(w, limit + 1) > cost_in + cost_out:
+                    shortcuts.append((u, w, cost_in + cost_out))
+        return shortcuts
+
+    def _witness(self, source, excluded, limit, out_edges, rank):
+        """Dijkstra limitado entre nós ainda não contraídos, sem passar por excluded"""
+        dist = {source: 0}
+        heap = [(0, source)]
+        settled = 0
+        while heap and settled < WITNESS_LIMIT:
+            d, u = heapq.heappop(heap)
+            if d > limit:
+                break
+            if d > dist[u]:
+                continue
+            settled += 1
+            for w, (cost, via) in out_edges[u].items():
+                if w == excluded or rank[w] != -1:
+                    continue
+                nd = d + cost
+                if nd < dist.get(w, nd + 1):
+                    dist[w] = nd
+                    heapq.heappush(heap, (nd, w))
+        return dist
+
+    def _priority(self, v, shortcuts, out_edges, in_edges, rank, deleted_neighbors):
+        """Diferença de arestas mais vizinhos já contraídos"""
+        degree = 0
+        for u in in_edges[v]:
+            if rank[u] == -1:
+                degree += 1
+        for w in out_edges[v]:
+            if rank[w] == -1:
+                degree += 1
+        return len(shortcuts) - degree + deleted_neighbors[v]
+
+
+def main():
+    """Pré-processa um mapa: contraction.py mapa"""
+    from city import City
+
+    if len(sys.argv) < 2:
+        print("Uso: python contraction.py <mapa>")
+        return
+
+    city = City.load_from_file(sys.argv[1])
+    if city is None:
+        return
+
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy(city)
+    hierarchy.build()
+    seconds = time.perf_counter() - start
+
+    filename = hierarchy_filename(sys.argv[1])
+    hierarchy.save(filename)
+    print(f"{city.width * city.height} células, {hierarchy.graph.node_count()} nós de rua, "
+          f"{hierarchy.shortcuts} atalhos ({seconds:.1f} s)")
+    print(f"Hierarquia salva em {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,13 @@
 Script para criar imagens de exemplo simples usando Pygame
 """
 
-import pygame
 import os
 
+from lazy_module import lazy_import
+
+# Carregado no primeiro uso: importar o módulo não carrega o SDL
+pygame = lazy_import("pygame")
+
 # Tamanho das imagens
 SIZE = 40
 
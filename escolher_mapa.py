@@ -6,6 +6,11 @@ Script para escolher qual mapa carregar
 import os
 import shutil
 
+from map_format import BINARY_EXTENSION
+
+# Extensões de mapa reconhecidas (JSON legado e binário)
+EXTENSOES_MAPA = ('.json', BINARY_EXTENSION)
+
 def listar_mapas():
     """Lista todos os mapas disponíveis"""
     mapas_dir = "maps"
@@ -14,10 +19,11 @@ def listar_mapas():
         print("Pasta 'maps' nao encontrada!")
         return []
     
-    # Lista todos os arquivos JSON na pasta maps
+    # Lista todos os arquivos de mapa (JSON ou binário) na pasta maps
     mapas = []
     for arquivo in os.listdir(mapas_dir):
-        if arquivo.endswith('.json') and arquivo != 'cidade.json':
+        nome, extensao = os.path.splitext(arquivo)
+        if extensao in EXTENSOES_MAPA and nome != 'cidade':
             mapas.append(arquivo)
     
     return sorted(mapas)
@@ -38,8 +44,10 @@ def escolher_mapa():
     
     # Exibe lista numerada
     for i, mapa in enumerate(mapas, 1):
-        # Remove a extensão .json para exibição
-        nome = mapa.replace('.json', '')
+        # Remove a extensão para exibição
+        nome, extensao = os.path.splitext(mapa)
+        if extensao == BINARY_EXTENSION:
+            nome += " (binario)"
         print(f"  {i}. {nome}")
     
     print(f"\n  0. Cancelar")
@@ -57,17 +65,16 @@ def escolher_mapa():
             print("\nOpcao invalida!")
             return
         
-        # Copia o mapa escolhido para cidade.json
+        # Copia o mapa escolhido para cidade.json ou cidade.wmap
         mapa_escolhido = mapas[escolha - 1]
+        nome_mapa, extensao = os.path.splitext(mapa_escolhido)
         origem = os.path.join("maps", mapa_escolhido)
-        destino = os.path.join("maps", "cidade.json")
+        destino = os.path.join("maps", "cidade" + extensao)
         
         shutil.copy(origem, destino)
         
-        nome_mapa = mapa_escolhido.replace('.json', '')
-        
         print("=" * 60)
-        print(f"SUCESSO! Mapa '{nome_mapa}' copiado para cidade.json")
+        print(f"SUCESSO! Mapa '{nome_mapa}' copiado para cidade{extensao}")
         print("=" * 60)
         print("\nAgora execute:")
         print("  python main.py")
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Classe HierarchicalPlanner - Busca hierárquica (HPA*)
+
+O grid é dividido em clusters quadrados de CLUSTER_SIZE células. Em cada
+fronteira entre dois clusters vizinhos, cada trecho contínuo de células
+transitáveis dos dois lados vira uma entrada (uma transição no meio do
+trecho, ou duas nas pontas se o trecho for longo). As células das
+transições são os nós do grafo abstrato, ligados por:
+
+  - arestas entre clusters: o passo de um lado da fronteira para o outro
+    (custo lido de city.costs na hora da busca);
+  - arestas internas: menor custo entre dois nós do mesmo cluster,
+    calculado com Dijkstra restrito ao cluster.
+
+A consulta liga a partida e o destino aos nós dos seus clusters, roda o
+A* no grafo abstrato (bem menor que o grid) e só então refina cada
+trecho com uma busca local dentro de um cluster. As rotas são quase
+ótimas, não necessariamente ótimas: o caminho fica preso às transições.
+
+Alterações no mapa são lidas do histórico da cidade e só os clusters
+afetados são recalculados (e as fronteiras, quando uma célula da borda
+muda de transitável para bloqueada ou vice-versa).
+"""
+
+import heapq
+
+# Lado dos clusters, em células
+CLUSTER_SIZE = 16
+
+# Trechos de fronteira a partir deste tamanho ganham duas transições
+ENTRANCE_SPLIT = 6
+
+
+class HierarchicalPlanner:
+
+    def __init__(self, city, cluster_size=CLUSTER_SIZE):
+        self.city = city
+        self.cluster_size = cluster_size
+        self.version = None
+
+        # (cluster_a, cluster_b) -> [(célula em a, célula em b), ...]
+        self.borders = {}
+        # nó -> nós do outro lado de alguma fronteira
+        self.links = {}
+        # cluster -> {nó: {outro nó do cluster: custo}}
+        self.intra = {}
+
+        # Células fechadas na última busca (grafo abstrato + buscas locais)
+        self.expanded = 0
+        # Clusters recalculados na última sincronização
+        self.rebuilt = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """Retorna a tupla de índices do caminho ou None"""
+        self.expanded = 0
+        self.sync()
+        if start_idx == goal_idx:
+            return (start_idx,)
+
+        start_cluster = self._cluster_of(start_idx)
+        goal_cluster = self._cluster_of(goal_idx)
+
+        # Liga partida e destino aos nós dos seus clusters
+        from_start = self._local_search(start_idx, self._bounds(start_cluster))[0]
+        to_goal = self._local_search(goal_idx, self._bounds(goal_cluster), reverse=True)[0]
+        start_edges = {}
+        for node in self._cluster_nodes(start_cluster):
+            if node in from_start and node != start_idx:
+                start_edges[node] = from_start[node]
+        goal_edges = {}
+        for node in self._cluster_nodes(goal_cluster):
+            if node in to_goal:
+                goal_edges[node] = to_goal[node]
+
+        found = self._abstract_search(start_idx, goal_idx, start_edges, goal_edges)
+
+        # Viagem curta (clusters iguais ou vizinhos): busca exata na caixa
+        # dos dois clusters, que evita desvios até as transições
+        short = self._short_path(start_idx, goal_idx, start_cluster, goal_cluster)
+        if short is not None and (found is None or short[1] <= found[1]):
+            return short[0]
+        if found is None:
+            return None
+        return self._refine(found[0])
+
+    def sync(self):
+        """Aplica as alterações feitas no mapa desde a última consulta"""
+        city = self.city
+        if self.version == city.version:
+            return
+
+        changes = None if self.version is None else city.changes_since(self.version)
+        self.version = city.version
+        if changes is None:
+            self.build()
+            return
+
+        clusters = set()
+        borders = set()
+        for index, old_type, new_type in changes:
+            old_cost = city.cell_cost(old_type)
+            new_cost = city.cell_cost(new_type)
+            if old_cost == new_cost:
+                continue
+            cluster = self._cluster_of(index)
+            clusters.add(cluster)
+            if (old_cost == 0) != (new_cost == 0):
+                borders.update(self._borders_at(index, cluster))
+
+        for border in borders:
+            self._build_border(*border)
+            clusters.update(border)
+        for cluster in clusters:
+            self._build_cluster(cluster)
+        self.rebuilt = len(clusters)
+
+    def build(self):
+        """Recalcula toda a abstração (fronteiras e arestas internas)"""
+        city = self.city
+        size = self.cluster_size
+        self.clusters_x = (city.width + size - 1) // size
+        self.clusters_y = (city.height + size - 1) // size
+        self.borders = {}
+        self.links = {}
+        self.intra = {}
+
+        count = self.clusters_x * self.clusters_y
+        for cluster in range(count):
+            cx = cluster % self.clusters_x
+            cy = cluster // self.clusters_x
+            if cx + 1 < self.clusters_x:
+                self._build_border(cluster, cluster + 1)
+            if cy + 1 < self.clusters_y:
+                self._build_border(cluster, cluster + self.clusters_x)
+        for cluster in range(count):
+            self._build_cluster(cluster)
+        self.rebuilt = count
+
+    def node_count(self):
+        """Número de nós do grafo abstrato"""
+        return len(self.links)
+
+    def _cluster_of(self, index):
+        y, x = divmod(index, self.city.width)
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+
+    def _bounds(self, cluster):
+        """(x0, y0, x1, y1) do cluster, com x1/y1 exclusivos"""
+        size = self.cluster_size
+        x0 = (cluster % self.clusters_x) * size
+        y0 = (cluster // self.clusters_x) * size
+        return x0, y0, min(x0 + size, self.city.width), min(y0 + size, self.city.height)
+
+    def _borders_at(self, index, cluster):
+        """Fronteiras do cluster que passam pela célula"""
+        x0, y0, x1, y1 = self._bounds(cluster)
+        y, x = divmod(index, self.city.width)
+        borders = []
+        if x == x0 and x0 > 0:
+            borders.append((cluster - 1, cluster))
+        if x == x1 - 1 and x1 < self.city.width:
+            borders.append((cluster, cluster + 1))
+        if y == y0 and y0 > 0:
+            borders.append((cluster - self.clusters_x, cluster))
+        if y == y1 - 1 and y1 < self.city.height:
+            borders.append((cluster, cluster + self.clusters_x))
+        return borders
+
+    def _build_border(self, a, b):
+        """Recalcula as transições da fronteira entre os clusters a e b"""
+        city = self.city
+        width = city.width
+        costs = city.costs
+        links = self.links
+
+        for cell_a, cell_b in self.borders.get((a, b), ()):
+            for node, other in ((cell_a, cell_b), (cell_b, cell_a)):
+                linked = links.get(node)
+                if linked is not None:
+                    linked.discard(other)
+                    if not linked:
+                        del links[node]
+
+        x0, y0, x1, y1 = self._bounds(a)
+        if b == a + 1 and self.clusters_x > 1:
+            # Fronteira vertical: coluna x1 - 1 de a, coluna x1 de b
+            first = y0 * width + x1 - 1
+            step = width
+            length = y1 - y0
+            offset = 1
+        else:
+            # Fronteira horizontal: linha y1 - 1 de a, linha y1 de b
+            first = (y1 - 1) * width + x0
+            step = 1
+            length = x1 - x0
+            offset = width
+
+        pairs = []
+        run = []
+        for i in range(length + 1):
+            cell = first + i * step
+            if i < length and costs[cell] and costs[cell + offset]:
+                run.append(cell)
+                continue
+            if run:
+                if len(run) >= ENTRANCE_SPLIT:
+                    chosen = (run[0], run[-1])
+                else:
+                    chosen = (run[len(run) // 2],)
+                for cell_a in chosen:
+                    pairs.append((cell_a, cell_a + offset))
+                run = []
+
+        self.borders[(a, b)] = pairs
+        for cell_a, cell_b in pairs:
+            links.setdefault(cell_a, set()).add(cell_b)
+            links.setdefault(cell_b, set()).add(cell_a)
+
+    def _cluster_nodes(self, cluster):
+        """Nós (células de transição) do cluster"""
+        nodes = set()
+        for border in ((cluster - 1, cluster), (cluster, cluster + 1),
+                       (cluster - self.clusters_x, cluster),
+                       (cluster, cluster + self.clusters_x)):
+            pairs = self.borders.get(border)
+            if pairs:
+                side = 0 if border[0] == cluster else 1
+                for pair in pairs:
+                    nodes.add(pair[side])
+        return nodes
+
+    def _build_cluster(self, cluster):
+        """Recalcula as distâncias entre os nós do cluster"""
+        nodes = self._cluster_nodes(cluster)
+        bounds = self._bounds(cluster)
+        edges = {}
+        for node in nodes:
+            dist = self._local_search(node, bounds)[0]
+            edges[node] = {other: dist[other] for other in nodes
+                           if other != node and other in dist}
+        self.intra[cluster] = edges
+
+    def _short_path(self, start_idx, goal_idx, start_cluster, goal_cluster):
+        """
+        Caminho ótimo dentro da caixa dos clusters da partida e do destino,
+        se forem iguais ou vizinhos (inclusive na diagonal). Retorna
+        (tupla de índices, custo) ou None.
+        """
+        sx0, sy0, sx1, sy1 = self._bounds(start_cluster)
+        gx0, gy0, gx1, gy1 = self._bounds(goal_cluster)
+        if sx0 - gx1 > 0 or gx0 - sx1 > 0 or sy0 - gy1 > 0 or gy0 - sy1 > 0:
+            return None
+
+        bounds = (min(sx0, gx0), min(sy0, gy0), max(sx1, gx1), max(sy1, gy1))
+        dist, parents = self._local_search(start_idx, bounds, goal=goal_idx)
+        if goal_idx not in dist:
+            return None
+        return self._segment(parents, start_idx, goal_idx, [start_idx]), dist[goal_idx]
+
+    def _local_search(self, source, bounds, reverse=False, goal=None):
+        """
+        Dijkstra restrito ao retângulo bounds (x0, y0, x1, y1). Com
+        reverse, as distâncias são de cada célula até source. Retorna
+        (distâncias, pais).
+        """
+        city = self.city
+        costs = city.costs
+        width = city.width
+        x0, y0, x1, y1 = bounds
+
+        push = heapq.heappush
+        pop = heapq.heappop
+        dist = {source: 0}
+        parents = {source: -1}
+        settled = set()
+        heap = [(0, source)]
+
+        while heap:
+            d, u = pop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == goal:
+                break
+
+            y, x = divmod(u, width)
+            neighbors = []
+            if y > y0:
+                neighbors.append(u - width)
+            if x < x1 - 1:
+                neighbors.append(u + 1)
+            if y < y1 - 1:
+                neighbors.append(u + width)
+            if x > x0:
+                neighbors.append(u - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or n in settled:
+                    continue
+                nd = d + (costs[u] if reverse else cost)
+                if nd < dist.get(n, nd + 1):
+                    dist[n] = nd
+                    parents[n] = u
+                    push(heap, (nd, n))
+
+        self.expanded += len(settled)
+        return dist, parents
+
+    def _abstract_search(self, start_idx, goal_idx, start_edges, goal_edges):
+        """A* no grafo abstrato. Retorna (lista de nós da rota, custo) ou None."""
+        city = self.city
+        costs = city.costs
+        width = city.width
+        min_cost = city.min_cost()
+        goal_y, goal_x = divmod(goal_idx, width)
+        intra = self.intra
+        links = self.links
+
+        g_score = {start_idx: 0}
+        parents = {start_idx: -1}
+        closed = set()
+        # Empates de f vão para o nó mais perto do destino (menor h);
+        # em grades de ruas há muitas rotas com o mesmo custo
+        heap = [(0, 0, start_idx)]
+
+        while heap:
+            f, h, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            if current == goal_idx:
+                cost = g_score[current]
+                nodes = []
+                while current != -1:
+                    nodes.append(current)
+                    current = parents[current]
+                nodes.reverse()
+                return nodes, cost
+
+            closed.add(current)
+            self.expanded += 1
+            current_g = g_score[current]
+
+            if current == start_idx:
+                edges = list(start_edges.items())
+            else:
+                edges = list(intra[self._cluster_of(current)].get(current, {}).items())
+            for other in links.get(current, ()):
+                edges.append((other, costs[other]))
+            if current in goal_edges:
+                edges.append((goal_idx, goal_edges[current]))
+
+            for node, cost in edges:
+                if node in closed:
+                    continue
+                tentative_g = current_g + cost
+                if tentative_g < g_score.get(node, tentative_g + 1):
+                    g_score[node] = tentative_g
+                    parents[node] = current
+                    y, x = divmod(node, width)
+                    h = (abs(x - goal_x) + abs(y - goal_y)) * min_cost
+                    heapq.heappush(heap, (tentative_g + h, h, node))
+
+        return None
+
+    def _refine(self, nodes):
+        """Transforma a rota abstrata em células, trecho por trecho"""
+        path = [nodes[0]]
+        for i in range(1, len(nodes)):
+            a, b = nodes[i - 1], nodes[i]
+            cluster = self._cluster_of(a)
+            if cluster != self._cluster_of(b):
+                # Aresta entre clusters: células vizinhas
+                path.append(b)
+                continue
+
+            parents = self._local_search(a, self._bounds(cluster), goal=b)[1]
+            self._segment(parents, a, b, path)
+        return tuple(path)
+
+    def _segment(self, parents, a, b, path):
+        """Acrescenta a path as células de a (exclusive) até b"""
+        segment = []
+        current = b
+        while current != a:
+            segment.append(current)
+            current = parents[current]
+        segment.reverse()
+        path.extend(segment)
+        return tuple(path)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Classe IncrementalPlanner - Replanejamento incremental (LPA*)
+
+Guarda o estado da busca (g, rhs e fila de prioridade) entre chamadas.
+Quando células mudam (tráfego aparece ou some), só os vértices afetados
+são atualizados e a busca repara a parte da árvore que mudou, em vez de
+recomeçar do zero. Os custos são os mesmos de um A* completo.
+
+Referência: Koenig e Likhachev, "Lifelong Planning A*" (2004). Como o
+ponto de partida não se move durante a busca, LPA* basta; D* Lite é a
+variante para o caso do agente em movimento.
+"""
+
+import heapq
+
+INF = float('inf')
+
+
+class IncrementalPlanner:
+
+    def __init__(self, city):
+        self.city = city
+        self.start = None
+        self.goal = None
+        self.version = None
+
+        # Custo de entrar em cada célula (0 = bloqueada)
+        self.costs = None
+        self.min_cost = 1
+        self.g = None
+        self.rhs = None
+        self.heap = []
+        self.queued = {}
+
+        # Nós expandidos na última chamada e no total
+        self.expanded = 0
+        self.total_expanded = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """
+        Retorna a tupla de índices do caminho de start_idx até goal_idx
+        ou None. Reaproveita a busca anterior quando start e goal são os
+        mesmos; senão recomeça.
+        """
+        if start_idx != self.start or goal_idx != self.goal or not self._apply_changes():
+            self._reset(start_idx, goal_idx)
+
+        self.expanded = 0
+        self._compute()
+        self.total_expanded += self.expanded
+
+        if self.g[goal_idx] == INF:
+            return None
+        return self._extract_path()
+
+    def path_cost(self):
+        """Custo da última rota calculada (INF se não há rota)"""
+        if self.g is None:
+            return INF
+        return self.g[self.goal]
+
+    def _reset(self, start_idx, goal_idx):
+        """Descarta o estado e inicia uma busca nova"""
+        city = self.city
+        size = city.width * city.height
+        self.start = start_idx
+        self.goal = goal_idx
+        self.version = city.version
+        self.costs = bytearray(city.costs)
+        self.min_cost = city.min_cost()
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.heap = []
+        self.queued = {}
+
+        self.rhs[start_idx] = 0
+        self._push(start_idx)
+
+    def _apply_changes(self):
+        """
+        Lê as células alteradas desde a última chamada e atualiza os
+        vértices afetados. Retorna False se for preciso recomeçar.
+        """
+        city = self.city
+        if city.version == self.version:
+            return True
+
+        changes = city.changes_since(self.version)
+        if changes is None or city.width * city.height != len(self.costs):
+            return False
+
+        self.version = city.version
+        costs = self.costs
+        for index, old_type, new_type in changes:
+            cost = city.cell_cost(new_type)
+            if costs[index] == cost:
+                continue
+            costs[index] = cost
+
+            # Mudam as arestas que entram e saem da célula
+            self._update(index)
+            for n in self._neighbors(index):
+                self._update(n)
+
+        return True
+
+    def _neighbors(self, index):
+        width = self.city.width
+        y, x = divmod(index, width)
+        neighbors = []
+        if y > 0:
+            neighbors.append(index - width)
+        if x < width - 1:
+            neighbors.append(index + 1)
+        if y < self.city.height - 1:
+            neighbors.append(index + width)
+        if x > 0:
+            neighbors.append(index - 1)
+        return neighbors
+
+    def _key(self, index):
+        width = self.city.width
+        y, x = divmod(index, width)
+        goal_y, goal_x = divmod(self.goal, width)
+        best = min(self.g[index], self.rhs[index])
+        return (best + (abs(x - goal_x) + abs(y - goal_y)) * self.min_cost, best)
+
+    def _push(self, index):
+        key = self._key(index)
+        self.queued[index] = key
+        heapq.heappush(self.heap, (key[0], key[1], index))
+
+    def _update(self, index):
+        """UpdateVertex: recalcula rhs e recoloca o nó na fila se inconsistente"""
+        g = self.g
+        rhs = self.rhs
+        costs = self.costs
+
+        if index != self.start:
+            best = INF
+            cost = costs[index]
+            if cost:
+                for n in self._neighbors(index):
+                    if costs[n] and g[n] + cost < best:
+                        best = g[n] + cost
+            rhs[index] = best
+
+        if g[index] != rhs[index]:
+            self._push(index)
+        else:
+            self.queued.pop(index, None)
+
+    def _compute(self):
+        """ComputeShortestPath: processa a fila até o destino ficar consistente"""
+        heap = self.heap
+        queued = self.queued
+        g = self.g
+        rhs = self.rhs
+        goal = self.goal
+
+        while heap:
+            k1, k2, u = heap[0]
+            if queued.get(u) != (k1, k2):
+                # Entrada antiga (remoção preguiçosa)
+                heapq.heappop(heap)
+                continue
+
+            if (k1, k2) >= self._key(goal) and rhs[goal] == g[goal]:
+                break
+
+            heapq.heappop(heap)
+            del queued[u]
+            self.expanded += 1
+
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for n in self._neighbors(u):
+                    self._update(n)
+            else:
+                g[u] = INF
+                self._update(u)
+                for n in self._neighbors(u):
+                    self._update(n)
+
+    def _extract_path(self):
+        """Segue, a partir do destino, o vizinho com menor g + custo"""
+        g = self.g
+        costs = self.costs
+        path = [self.goal]
+        current = self.goal
+        while current != self.start:
+            cost = costs[current]
+            best = None
+            best_g = INF
+            for n in self._neighbors(current):
+                if costs[n] and g[n] + cost < best_g:
+                    best = n
+                    best_g = g[n] + cost
+            if best is None:
+                return None
+            path.append(best)
+            current = best
+        path.reverse()
+        return tuple(path)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Classe JumpPointSearch - Jump Point Search para grids 4-conectados
+
+Em grids de custo uniforme, o A* expande muitos nós simétricos (várias
+rotas de mesmo tamanho). O JPS só coloca na fila os "pontos de salto":
+células onde a rota pode precisar virar. Regras para movimento em
+4 direções:
+
+  - andando na horizontal, para quando a célula de cima (ou de baixo) é
+    livre e a anterior a ela está bloqueada (vizinho forçado);
+  - andando na vertical, para no vizinho forçado à esquerda/direita ou
+    quando um salto horizontal a partir da célula encontra algo.
+
+As varreduras horizontais usam find/rfind no bytearray da máscara de
+células transitáveis, então cada salto roda em C. Só vale para custo
+uniforme: com tráfego ponderado o PathFinder usa o A*.
+"""
+
+import heapq
+
+# Padrões de vizinho forçado na linha de cima/baixo (bloqueada -> livre)
+OPENING_RIGHT = b"\x00\x01"
+OPENING_LEFT = b"\x01\x00"
+
+
+class JumpPointSearch:
+
+    def __init__(self, city):
+        self.city = city
+        self.mask = None
+        self.version = None
+
+        # Pontos de salto expandidos na última busca
+        self.expanded = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """
+        Retorna a tupla de índices do caminho (todas as células, não só
+        os pontos de salto) ou None.
+        """
+        city = self.city
+        if self.version != city.version or self.mask is None:
+            self.mask = city.walkable_mask()
+            self.version = city.version
+
+        self.width = city.width
+        self.height = city.height
+        self.goal = goal_idx
+        step_cost = city.min_cost()
+
+        width = self.width
+        goal_y, goal_x = divmod(goal_idx, width)
+
+        g_score = {start_idx: 0}
+        parents = {start_idx: -1}
+        closed = set()
+        heap = [(self._manhattan(start_idx, goal_x, goal_y) * step_cost, 0, start_idx)]
+        counter = 0
+        self.expanded = 0
+
+        while heap:
+            f, seq, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            if current == goal_idx:
+                return self._build_path(parents, current)
+
+            closed.add(current)
+            self.expanded += 1
+            current_g = g_score[current]
+
+            for jump_point in self._successors(current, parents[current]):
+                if jump_point in closed:
+                    continue
+                distance = self._distance(current, jump_point)
+                tentative_g = current_g + distance * step_cost
+                if tentative_g < g_score.get(jump_point, tentative_g + 1):
+                    g_score[jump_point] = tentative_g
+                    parents[jump_point] = current
+                    counter += 1
+                    h = self._manhattan(jump_point, goal_x, goal_y) * step_cost
+                    heapq.heappush(heap, (tentative_g + h, counter, jump_point))
+
+        return None
+
+    def _manhattan(self, index, goal_x, goal_y):
+        y, x = divmod(index, self.width)
+        return abs(x - goal_x) + abs(y - goal_y)
+
+    def _distance(self, index1, index2):
+        y1, x1 = divmod(index1, self.width)
+        y2, x2 = divmod(index2, self.width)
+        return abs(x1 - x2) + abs(y1 - y2)
+
+    def _walkable(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and self.mask[y * self.width + x]
+
+    def _successors(self, index, parent):
+        """Pontos de salto alcançáveis a partir do nó (com poda de vizinhos)"""
+        y, x = divmod(index, self.width)
+        if parent == -1:
+            directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+        else:
+            parent_y, parent_x = divmod(parent, self.width)
+            dx = (x > parent_x) - (x < parent_x)
+            dy = (y > parent_y) - (y < parent_y)
+            if dx != 0:
+                directions = [(0, -1), (dx, 0), (0, 1)]
+            else:
+                directions = [(-1, 0), (0, dy), (1, 0)]
+
+        successors = []
+        for dx, dy in directions:
+            if not self._walkable(x + dx, y + dy):
+                continue
+            if dx != 0:
+                found = self._jump_horizontal(x + dx, y, dx)
+            else:
+                found = self._jump_vertical(x, y + dy, dy)
+            if found is not None:
+                successors.append(found)
+        return successors
+
+    def _jump_horizontal(self, x, y, dx):
+        """
+        Salta de (x, y) na direção dx. Retorna o índice do ponto de salto
+        ou None se bater numa parede/borda sem encontrar nada.
+        """
+        width = self.width
+        mask = self.mask
+        row = y * width
+        goal = self.goal
+
+        if dx > 0:
+            # Primeira célula bloqueada (ou a borda) limita o salto
+            stop = mask.find(0, row + x, row + width)
+            limit = stop if stop != -1 else row + width
+            candidates = []
+            if row <= goal < limit and goal >= row + x:
+                candidates.append(goal)
+            for other in (row - width, row + width):
+                if 0 <= other < len(mask):
+                    # (x', y±1) livre e (x'-1, y±1) bloqueada, com x' >= x
+                    i = mask.find(OPENING_RIGHT, other + x - 1, other + (limit - row))
+                    if i != -1:
+                        candidates.append(row + (i + 1 - other))
+            return min(candidates) if candidates else None
+
+        stop = mask.rfind(0, row, row + x + 1)
+        limit = stop + 1 if stop != -1 else row
+        candidates = []
+        if limit <= goal <= row + x:
+            candidates.append(goal)
+        for other in (row - width, row + width):
+            if 0 <= other < len(mask):
+                # (x', y±1) livre e (x'+1, y±1) bloqueada, com x' <= x
+                i = mask.rfind(OPENING_LEFT, other + (limit - row), other + x + 2)
+                if i != -1:
+                    candidates.append(row + (i - other))
+        return max(candidates) if candidates else None
+
+    def _jump_vertical(self, x, y, dy):
+        """Salta de (x, y) na direção dy, procurando também saltos horizontais"""
+        width = self.width
+        mask = self.mask
+        goal = self.goal
+
+        while 0 <= y < self.height:
+            index = y * width + x
+            if not mask[index]:
+                return None
+            if index == goal:
+                return index
+
+            # Vizinho forçado à esquerda ou à direita
+            if (self._walkable(x - 1, y) and not self._walkable(x - 1, y - dy)) or \
+               (self._walkable(x + 1, y) and not self._walkable(x + 1, y - dy)):
+                return index
+
+            # Algum salto horizontal a partir daqui encontra um ponto?
+            if (self._walkable(x + 1, y) and self._jump_horizontal(x + 1, y, 1) is not None) or \
+               (self._walkable(x - 1, y) and self._jump_horizontal(x - 1, y, -1) is not None):
+                return index
+
+            y += dy
+
+        return None
+
+    def _build_path(self, parents, goal_idx):
+        """Liga os pontos de salto em linha reta, célula por célula"""
+        width = self.width
+        jump_points = []
+        current = goal_idx
+        while current != -1:
+            jump_points.append(current)
+            current = parents[current]
+        jump_points.reverse()
+
+        path = [jump_points[0]]
+        for i in range(1, len(jump_points)):
+            a, b = jump_points[i - 1], jump_points[i]
+            step = 1 if abs(b - a) < width else width
+            if b < a:
+                step = -step
+            path.extend(range(a + step, b + step, step))
+        return tuple(path)
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Heurística ALT (A*, landmarks, desigualdade triangular)
+
+Alguns pontos de referência (landmarks) são escolhidos longe uns dos
+outros e, para cada um, guarda-se a distância em passos até todas as
+células transitáveis. Pela desigualdade triangular,
+
+    passos(v, destino) >= |passos(L, destino) - passos(L, v)|
+
+e, como cada passo custa pelo menos o menor custo de célula, o maior
+desses limites vezes city.min_cost() é uma heurística admissível e
+consistente, bem mais forte que Manhattan em labirintos.
+
+As tabelas contam passos (não custos), então tráfego não as invalida;
+só quando uma célula muda de transitável para bloqueada (ou o contrário)
+elas são recalculadas, na próxima consulta. Ficam gravadas ao lado do
+mapa (mesmo nome, extensão .alt) com o checksum da máscara de células
+transitáveis.
+
+Uso:
+    python landmarks.py maps/cidade_labirinto.json [número de landmarks]
+"""
+
+import heapq
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import deque
+
+LANDMARKS_EXTENSION = ".alt"
+
+MAGIC = b"WZLM"
+VERSION = 1
+
+# magic, versão, largura, altura, checksum da máscara, landmarks, tipo
+HEADER = struct.Struct("<4sHIIIHc")
+
+LANDMARK_COUNT = 8
+# Landmarks usados em cada consulta (os de melhor limite na partida)
+ACTIVE_LANDMARKS = 4
+
+
+def landmarks_filename(map_filename):
+    """Arquivo das tabelas ao lado do mapa: maps/x.json -> maps/x.alt"""
+    return os.path.splitext(map_filename)[0] + LANDMARKS_EXTENSION
+
+
+class LandmarkTable:
+
+    def __init__(self, city, count=LANDMARK_COUNT):
+        self.city = city
+        self.count = count
+        self.version = None
+        self.checksum = None
+
+        # Células escolhidas e, para cada uma, passos até cada célula
+        # (self.unreachable quando não há caminho)
+        self.landmarks = []
+        self.tables = []
+        self.unreachable = 0
+
+    def is_current(self):
+        """
+        Indica se as tabelas valem para o mapa atual. Mudanças só de
+        custo (tráfego) não as invalidam.
+        """
+        city = self.city
+        if self.version is None:
+            return False
+        if self.version == city.version:
+            return True
+
+        changes = city.changes_since(self.version)
+        if changes is None:
+            if zlib.crc32(city.walkable_mask()) != self.checksum:
+                return False
+        else:
+            for index, old_type, new_type in changes:
+                if (city.cell_cost(old_type) == 0) != (city.cell_cost(new_type) == 0):
+                    return False
+        self.version = city.version
+        return True
+
+    def refresh(self):
+        """Recalcula as tabelas se o mapa mudou"""
+        if not self.is_current():
+            self.build()
+
+    def build(self):
+        """Escolhe os landmarks (o mais distante dos já escolhidos) e mede as distâncias"""
+        city = self.city
+        mask = city.walkable_mask()
+        size = len(mask)
+
+        landmarks = []
+        tables = []
+        start = mask.find(1)
+        if start != -1:
+            # Distância até o landmark mais próximo já escolhido
+            nearest = self._distances(mask, start)
+            far = self._unreachable_value(nearest)
+            for _ in range(self.count):
+                best = -1
+                best_distance = -1
+                for index in range(size):
+                    if mask[index]:
+                        distance = nearest[index]
+                        if distance == far:
+                            # Componente sem landmark: prioridade máxima
+                            distance = size
+                        if distance > best_distance:
+                            best = index
+                            best_distance = distance
+                if best_distance <= 0:
+                    break
+                table = self._distances(mask, best)
+                if not landmarks:
+                    # A célula inicial não é landmark
+                    nearest = array('I', table)
+                else:
+                    for index in range(size):
+                        if table[index] < nearest[index]:
+                            nearest[index] = table[index]
+                landmarks.append(best)
+                tables.append(table)
+
+        self._set_tables(landmarks, tables)
+        self.checksum = zlib.crc32(mask)
+        self.version = city.version
+
+    def save(self, filename):
+        """Grava os landmarks e as tabelas"""
+        city = self.city
+        typecode = self.tables[0].typecode if self.tables else 'I'
+        header = HEADER.pack(MAGIC, VERSION, city.width, city.height, self.checksum,
+                             len(self.landmarks), typecode.encode("ascii"))
+        with open(filename, "wb") as f:
+            f.write(header)
+            for data in [array('I', self.landmarks)] + self.tables:
+                data = array(data.typecode, data)
+                if sys.byteorder == "big":
+                    data.byteswap()
+                f.write(data.tobytes())
+        return True
+
+    def load(self, filename):
+        """
+        Lê as tabelas gravadas por save. Retorna False se elas foram
+        calculadas para outro mapa.
+        """
+        city = self.city
+        size = city.width * city.height
+        with open(filename, "rb") as f:
+            raw = f.read(HEADER.size)
+            if len(raw) != HEADER.size:
+                raise ValueError("Arquivo de landmarks truncado")
+            magic, version, width, height, checksum, count, typecode = HEADER.unpack(raw)
+            if magic != MAGIC:
+                raise ValueError("Arquivo não é uma tabela de landmarks")
+            if version != VERSION:
+                raise ValueError(f"Versão de landmarks não suportada: {version}")
+            if (width, height) != (city.width, city.height) or \
+               checksum != zlib.crc32(city.walkable_mask()):
+                return False
+
+            arrays = []
+            for typecode, length in [('I', count)] + [(typecode.decode("ascii"), size)] * count:
+                data = array(typecode)
+                data.frombytes(f.read(length * data.itemsize))
+                if len(data) != length:
+                    raise ValueError("Arquivo de landmarks truncado")
+                if sys.byteorder == "big":
+                    data.byteswap()
+                arrays.append(data)
+
+        self._set_tables(list(arrays[0]), arrays[1:])
+        self.checksum = checksum
+        self.version = city.version
+        return True
+
+    def bounds(self, goal_idx):
+        """[(tabela, passos até o destino)] dos landmarks que alcançam o destino"""
+        unreachable = self.unreachable
+        pairs = []
+        for table in self.tables:
+            distance = table[goal_idx]
+            if distance != unreachable:
+                pairs.append((table, distance))
+        return pairs
+
+    def estimate(self, index, pairs):
+        """Limite inferior em passos de index até o destino de pairs"""
+        unreachable = self.unreachable
+        best = 0
+        for table, goal_distance in pairs:
+            distance = table[index]
+            if distance != unreachable:
+                if distance > goal_distance:
+                    distance -= goal_distance
+                else:
+                    distance = goal_distance - distance
+                if distance > best:
+                    best = distance
+        return best
+
+    def _set_tables(self, landmarks, tables):
+        """Guarda as tabelas no menor tipo de array que comporta as distâncias"""
+        longest = 0
+        for table in tables:
+            unreachable = self._unreachable_value(table)
+            longest = max(longest, max((d for d in table if d != unreachable), default=0))
+        typecode = 'H' if longest < 0xFFFF else 'I'
+        self.unreachable = self._unreachable_value(array(typecode))
+
+        compact = []
+        for table in tables:
+            if table.typecode != typecode:
+                old_unreachable = self._unreachable_value(table)
+                table = array(typecode, (self.unreachable if d == old_unreachable else d
+                                         for d in table))
+            compact.append(table)
+        self.landmarks = landmarks
+        self.tables = compact
+
+    @staticmethod
+    def _unreachable_value(table):
+        return (1 << (8 * table.itemsize)) - 1
+
+    def _distances(self, mask, source):
+        """Busca em largura: passos de source até cada célula"""
+        city = self.city
+        width = city.width
+        last_x = width - 1
+        last_y = city.height - 1
+        distances = array('I', [0xFFFFFFFF]) * len(mask)
+        distances[source] = 0
+        queue = deque([source])
+        pop = queue.popleft
+        push = queue.append
+
+        while queue:
+            current = pop()
+            next_distance = distances[current] + 1
+            y, x = divmod(current, width)
+            if y > 0 and mask[current - width] and distances[current - width] == 0xFFFFFFFF:
+                distances[current - width] = next_distance
+                push(current - width)
+            if x < last_x and mask[current + 1] and distances[current + 1] == 0xFFFFFFFF:
+                distances[current + 1] = next_distance
+                push(current + 1)
+            if y < last_y and mask[current + width] and distances[current + width] == 0xFFFFFFFF:
+                distances[current + width] = next_distance
+                push(current + width)
+            if x > 0 and mask[current - 1] and distances[current - 1] == 0xFFFFFFFF:
+                distances[current - 1] = next_distance
+                push(current - 1)
+
+        return distances
+
+
+class LandmarkSearch:
+    """A* com a heurística ALT (estratégia "alt")"""
+
+    def __init__(self, city):
+        self.city = city
+        self.table = LandmarkTable(city)
+
+        # Nós fechados na última busca
+        self.expanded = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """Retorna a tupla de índices do caminho ou None"""
+        table = self.table
+        table.refresh()
+
+        city = self.city
+        costs = city.costs
+        width = city.width
+        last_x = width - 1
+        last_y = city.height - 1
+        size = width * city.height
+        min_cost = city.min_cost()
+        goal_y, goal_x = divmod(goal_idx, width)
+
+        # Só os landmarks com melhor limite na partida
+        pairs = table.bounds(goal_idx)
+        pairs.sort(key=lambda pair: table.estimate(start_idx, [pair]), reverse=True)
+        pairs = pairs[:ACTIVE_LANDMARKS]
+        unreachable = table.unreachable
+
+        def heuristic(index):
+            y, x = divmod(index, width)
+            best = abs(x - goal_x) + abs(y - goal_y)
+            for distances, goal_distance in pairs:
+                distance = distances[index]
+                if distance != unreachable:
+                    distance = distance - goal_distance if distance > goal_distance \
+                        else goal_distance - distance
+                    if distance > best:
+                        best = distance
+            return best * min_cost
+
+        g_score = array('l', [-1]) * size
+        parents = array('l', [-1]) * size
+        closed = bytearray(size)
+        push = heapq.heappush
+        pop = heapq.heappop
+
+        g_score[start_idx] = 0
+        h = heuristic(start_idx)
+        heap = [(h, h, start_idx)]
+        expanded = 0
+
+        while heap:
+            f, h, current = pop(heap)
+            if closed[current]:
+                continue
+            if current == goal_idx:
+                self.expanded = expanded
+                path = []
+                while current != -1:
+                    path.append(current)
+                    current = parents[current]
+                path.reverse()
+                return tuple(path)
+
+            closed[current] = 1
+            expanded += 1
+            y, x = divmod(current, width)
+            current_g = g_score[current]
+
+            neighbors = []
+            if y > 0:
+                neighbors.append(current - width)
+            if x < last_x:
+                neighbors.append(current + 1)
+            if y < last_y:
+                neighbors.append(current + width)
+            if x > 0:
+                neighbors.append(current - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or closed[n]:
+                    continue
+                tentative_g = current_g + cost
+                if g_score[n] != -1 and tentative_g >= g_score[n]:
+                    continue
+                g_score[n] = tentative_g
+                parents[n] = current
+                h = heuristic(n)
+                push(heap, (tentative_g + h, h, n))
+
+        self.expanded = expanded
+        return None
+
+
+def main():
+    """Calcula as tabelas de um mapa: landmarks.py mapa [número]"""
+    from city import City
+
+    if len(sys.argv) < 2:
+        print("Uso: python landmarks.py <mapa> [número de landmarks]")
+        return
+
+    city = City.load_from_file(sys.argv[1])
+    if city is None:
+        return
+
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else LANDMARK_COUNT
+    start = time.perf_counter()
+    table = LandmarkTable(city, count)
+    table.build()
+    seconds = time.perf_counter() - start
+
+    filename = landmarks_filename(sys.argv[1])
+    table.save(filename)
+    print(f"{len(table.landmarks)} landmarks ({seconds:.1f} s), tabelas salvas em {filename}")
+
+
+if __name__ == "__main__":
+    main()
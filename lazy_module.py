@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Importação preguiçosa de módulos pesados
+
+lazy_import("pygame") devolve o módulo sem executá-lo: o import de
+verdade (e o carregamento do SDL) só acontece no primeiro acesso a um
+atributo. Assim, ferramentas que só reutilizam constantes ou funções de
+main.py e create_sample_images.py não pagam pelo pygame.
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Módulo name, carregado só quando um atributo dele for usado"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"Módulo não encontrado: {name}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
@@ -1,19 +1,41 @@
-import pygame
 import sys
 import os
+import re
 from city import City
-from pathfinding import PathFinder
+from lazy_module import lazy_import
+from map_format import BINARY_EXTENSION
+from route_worker import RouteWorker
 
-# Inicializa Pygame
-pygame.init()
+# O pygame (e o SDL) só é carregado quando a janela é criada; importar
+# este módulo para reutilizar constantes não inicializa nada
+pygame = lazy_import("pygame")
 
 # Constantes
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
 CELL_SIZE = 40
+# Tamanho de um mapa novo
 GRID_WIDTH = 20
 GRID_HEIGHT = 15
 
+# Área da janela onde o mapa aparece; só as células dentro dela são
+# desenhadas, então o custo de um quadro não depende do tamanho do mapa
+VIEW_X = 50
+VIEW_Y = 100
+VIEW_WIDTH = WINDOW_WIDTH - 2 * VIEW_X
+VIEW_HEIGHT = 600
+# Níveis de zoom: cada um reduz as células à metade (40, 20, 10, 5 px)
+ZOOM_LEVELS = 4
+# Sequência de células iguais numa linha do grid (um recorte do atlas)
+CELL_RUN = re.compile(rb"(.)\1*", re.DOTALL)
+# Menor célula que ainda recebe a borda do grid
+MIN_BORDER_SIZE = 10
+# Maior célula desenhada pelo atlas: com células grandes há poucos tiles
+# na vista e um blit por tile sai mais barato (ver benchmark.py render)
+ATLAS_MAX_CELL_SIZE = 10
+# Deslocamento da vista por tecla de seta, em pixels
+PAN_STEP = 120
+
 # Cores (fallback caso imagens não carreguem)
 COLOR_EMPTY = (200, 200, 200)
 COLOR_STREET = (80, 80, 80)
@@ -31,6 +53,9 @@ COLOR_BUTTON = (70, 130, 180)
 COLOR_BUTTON_HOVER = (100, 160, 210)
 COLOR_YELLOW = (255, 255, 0)
 
+# Cor que não é desenhada (colorkey das linhas do grid)
+COLOR_TRANSPARENT = (255, 0, 255)
+
 class Message:
     
     def __init__(self, text, duration=3000, msg_type="info"):
@@ -61,9 +86,9 @@ class Message:
         return self.active
     
     def draw(self, screen, font, y_position):
-        """Desenha a mensagem na tela"""
+        """Desenha a mensagem na tela e retorna o retângulo ocupado"""
         if not self.active:
-            return
+            return pygame.Rect(0, y_position, 0, 0)
         
         # Calcula tempo restante para fade out
         current_time = pygame.time.get_ticks()
@@ -110,13 +135,26 @@ class Message:
         text_with_alpha = pygame.Surface(text_rect.size, pygame.SRCALPHA)
         text_surface.set_alpha(alpha)
         screen.blit(text_surface, (popup_x + padding, popup_y + padding // 2))
+        
+        # Área ocupada, com a sombra
+        return pygame.Rect(popup_x, popup_y, popup_width + 6, popup_height + 6)
 
 class ImageLoader:
     
-    def __init__(self, cell_size):
-        """Inicializa o carregador de imagens"""
+    def __init__(self, cell_size, levels=1):
+        """
+        Inicializa o carregador de imagens. Cada nível de zoom tem células
+        com a metade do tamanho do nível anterior (mipmaps).
+        """
         self.cell_size = cell_size
+        self.levels = levels
         self.images = {}
+        # tiles[nível][tipo]: imagem ou cor já no tamanho do nível
+        self.tiles = []
+        # Um atlas por nível (ver build_atlases) e, por tipo de célula
+        # (0 a 255), a linha (em pixels) do tile dentro dele
+        self.atlases = []
+        self.atlas_rows = []
         self.assets_dir = "assets"
         
         # Cria diretório de assets se não existir
@@ -134,6 +172,7 @@ class ImageLoader:
         
         # Carrega todas as imagens
         self.load_images()
+        self.build_mipmaps()
     
     def load_images(self):
         """Carrega todas as imagens disponíveis"""
@@ -153,6 +192,94 @@ class ImageLoader:
             else:
                 self.images[cell_type] = None
     
+    def build_mipmaps(self):
+        """
+        Gera os tiles de cada nível de zoom: cada imagem é reduzida à
+        metade a partir do nível anterior; tipos sem imagem viram tiles
+        de cor.
+        """
+        self.tiles = []
+        previous = {}
+        for level in range(self.levels):
+            size = self.get_cell_size(level)
+            tiles = {}
+            for cell_type in City.CELL_NAMES:
+                image = previous.get(cell_type) if level else self.images.get(cell_type)
+                if image is None:
+                    tiles[cell_type] = self.create_color_tile(cell_type, size)
+                    continue
+                if image.get_width() != size:
+                    try:
+                        image = pygame.transform.smoothscale(image, (size, size))
+                    except ValueError:
+                        # smoothscale só aceita superfícies de 24 ou 32 bits
+                        image = pygame.transform.scale(image, (size, size))
+                tiles[cell_type] = image
+                previous[cell_type] = image
+            self.tiles.append(tiles)
+    
+    def build_atlases(self, width):
+        """
+        Junta os tiles de cada nível numa única superfície, já convertida
+        para o formato da tela: uma linha por tipo de célula, com o tile
+        repetido até a largura dada (pixels). Uma sequência de células
+        iguais numa linha do grid vira um único recorte do atlas.
+        """
+        self.atlases = []
+        self.atlas_rows = []
+        types = sorted(City.CELL_NAMES)
+        for level in range(self.levels):
+            size = self.get_cell_size(level)
+            count = width // size + 2
+            atlas = pygame.Surface((count * size, len(types) * size))
+            # Tipos desconhecidos usam a linha do tile vazio
+            rows = [types.index(City.EMPTY) * size] * 256
+            for i in range(len(types)):
+                tile = self.tiles[level][types[i]]
+                for j in range(count):
+                    atlas.blit(tile, (j * size, i * size))
+                rows[types[i]] = i * size
+            if pygame.display.get_surface() is not None:
+                atlas = atlas.convert()
+            self.atlases.append(atlas)
+            self.atlas_rows.append(rows)
+    
+    def create_color_tile(self, cell_type, size):
+        """Tile de cor (fallback) para tipos sem imagem"""
+        color = COLOR_EMPTY
+        if cell_type == City.STREET:
+            color = COLOR_STREET
+        elif cell_type == City.HOUSE:
+            color = COLOR_HOUSE
+        elif cell_type == City.BUILDING:
+            color = COLOR_BUILDING
+        elif cell_type == City.PARK:
+            color = COLOR_PARK
+        elif cell_type == City.TRAFFIC:
+            color = COLOR_TRAFFIC
+        
+        tile = pygame.Surface((size, size))
+        tile.fill(color)
+        
+        # Adiciona textura de rua (some nos níveis pequenos)
+        if cell_type == City.STREET and size >= 20:
+            scale = size / self.cell_size
+            center = size // 2
+            for i in range(3):
+                dash_x = center + int((i * 10 - 10) * scale)
+                pygame.draw.line(tile, COLOR_YELLOW,
+                               (dash_x, center), (dash_x + int(5 * scale), center), 1)
+        return tile
+    
+    def get_cell_size(self, level):
+        """Tamanho da célula em pixels num nível de zoom"""
+        return max(self.cell_size >> level, 1)
+    
+    def get_tile(self, cell_type, level=0):
+        """Tile de um tipo de célula no nível de zoom dado"""
+        tiles = self.tiles[level]
+        return tiles.get(cell_type) or tiles[City.EMPTY]
+    
     def get_image(self, cell_type):
         """Retorna a imagem para um tipo de célula"""
         return self.images.get(cell_type, None)
@@ -193,6 +320,10 @@ class WazeApp:
     
     def __init__(self):
         """Inicializa a aplicação"""
+        pygame.init()
+        # Evento com a rota calculada pelo processo de rotas (atributos job,
+        # path, cost, strategy, expanded, seconds)
+        self.route_ready = pygame.event.custom_type()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Sistema de Navegação - Waze com Imagens")
         self.clock = pygame.time.Clock()
@@ -200,11 +331,14 @@ class WazeApp:
         self.small_font = pygame.font.Font(None, 20)
         
         # Carregador de imagens
-        self.image_loader = ImageLoader(CELL_SIZE)
+        self.image_loader = ImageLoader(CELL_SIZE, ZOOM_LEVELS)
         
         # Estado da aplicação
         self.city = City(GRID_WIDTH, GRID_HEIGHT, "Minha Cidade")
-        self.pathfinder = PathFinder(self.city)
+        # Rotas são calculadas em outro processo (a janela não trava)
+        self.router = RouteWorker(self.city, default="incremental")
+        # Motivo do pedido em andamento (escolhe as mensagens da resposta)
+        self.route_reason = None
         self.current_tool = City.STREET
         self.mode = "EDIT" 
         
@@ -212,10 +346,21 @@ class WazeApp:
         self.start_pos = None
         self.end_pos = None
         self.path = None
+        # Custo da rota, calculado pelo processo de rotas
+        self.path_cost = None
         
-        # Offset para centralizar o grid
-        self.grid_offset_x = 50
-        self.grid_offset_y = 100
+        # Vista: nível de zoom e deslocamento (em pixels do nível atual)
+        # do canto superior esquerdo da vista dentro do mapa
+        self.zoom = 0
+        self.cell_size = CELL_SIZE
+        self.view_x = 0
+        self.view_y = 0
+        # Arrastando a vista com o botão direito
+        self.dragging = False
+        # Desenho do grid pelo atlas com Surface.blits ou um blit por tile.
+        # None escolhe pelo zoom (atlas até ATLAS_MAX_CELL_SIZE); True ou
+        # False forçam um dos modos, para comparação
+        self.use_atlas = None
         
         # Criar botões
         self.create_buttons()
@@ -226,6 +371,26 @@ class WazeApp:
         
         # Sistema de mensagens
         self.messages = []
+        self.message_rects = []
+        
+        # Renderização retida: a cena (janela sem as mensagens) e o fundo
+        # do grid ficam guardados e só as partes alteradas são redesenhadas
+        self.scene = None
+        self.grid_surface = None
+        self.rendered_city = None
+        self.rendered_version = None
+        self.rendered_view = None
+        self.rendered_grid_rect = None
+        # Faixa de células visíveis (x0, y0, x1, y1)
+        self.visible_cells = (0, 0, 0, 0)
+        self.rendered_path = None
+        self.rendered_start = None
+        self.rendered_end = None
+        # Célula (x, y) -> posição na rota (None para A/B fora da rota)
+        self.route_cells = {}
+        self.ui_state = None
+        self.create_tiles()
+        self.create_overlays()
         
         # Mostra status das imagens
         self.print_image_status()
@@ -292,194 +457,456 @@ class WazeApp:
             self.btn_find_path, self.btn_clear_route
         ]
     
+    def get_map_filename(self):
+        """Escolhe o arquivo cidade.* (JSON ou binário) mais recente"""
+        candidates = ["maps/cidade.json", "maps/cidade" + BINARY_EXTENSION]
+        existing = [f for f in candidates if os.path.exists(f)]
+        if not existing:
+            return candidates[0]
+        return max(existing, key=os.path.getmtime)
+    
     def get_cell_from_mouse(self, mouse_pos):
         """Converte posição do mouse para célula do grid"""
         mx, my = mouse_pos
-        x = (mx - self.grid_offset_x) // CELL_SIZE
-        y = (my - self.grid_offset_y) // CELL_SIZE
+        if not self.get_grid_rect().collidepoint(mx, my):
+            return None
+        x = (mx - VIEW_X + self.view_x) // self.cell_size
+        y = (my - VIEW_Y + self.view_y) // self.cell_size
         
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+        if 0 <= x < self.city.width and 0 <= y < self.city.height:
             return [x, y]
         return None
     
-    def draw_cell_with_color(self, rect, cell_type):
-        """Desenha célula com cor (fallback)"""
-        color = COLOR_EMPTY
-        if cell_type == City.STREET:
-            color = COLOR_STREET
-        elif cell_type == City.HOUSE:
-            color = COLOR_HOUSE
-        elif cell_type == City.BUILDING:
-            color = COLOR_BUILDING
-        elif cell_type == City.PARK:
-            color = COLOR_PARK
-        elif cell_type == City.TRAFFIC:
-            color = COLOR_TRAFFIC
+    def get_grid_rect(self):
+        """Retângulo do grid na tela (a vista, ou menos se o mapa for pequeno)"""
+        return pygame.Rect(VIEW_X, VIEW_Y,
+                           min(self.city.width * self.cell_size, VIEW_WIDTH),
+                           min(self.city.height * self.cell_size, VIEW_HEIGHT))
+    
+    def get_cell_rect(self, x, y):
+        """Retângulo de uma célula na tela (pode sair da vista)"""
+        return pygame.Rect(
+            VIEW_X + x * self.cell_size - self.view_x,
+            VIEW_Y + y * self.cell_size - self.view_y,
+            self.cell_size,
+            self.cell_size
+        )
+    
+    def get_visible_cells(self, rect=None):
+        """
+        Faixa de células (x0, y0, x1, y1), com fim exclusivo, que aparece
+        na vista ou no retângulo rect dado em coordenadas do grid_surface.
+        """
+        if rect is None:
+            rect = self.grid_surface.get_rect()
+        size = self.cell_size
+        x0 = (self.view_x + rect.left) // size
+        y0 = (self.view_y + rect.top) // size
+        x1 = min((self.view_x + rect.right + size - 1) // size, self.city.width)
+        y1 = min((self.view_y + rect.bottom + size - 1) // size, self.city.height)
+        return x0, y0, x1, y1
+    
+    def is_visible(self, x, y):
+        """Verifica se a célula aparece (mesmo que em parte) na vista"""
+        x0, y0, x1, y1 = self.visible_cells
+        return x0 <= x < x1 and y0 <= y < y1
+    
+    def create_tiles(self):
+        """
+        Prepara o desenho do grid em cada nível de zoom: as linhas do grid
+        numa superfície transparente do tamanho da vista (mais uma célula),
+        sobreposta aos tiles do atlas, e os tiles com a borda já desenhada
+        para o modo sem atlas (um blit por célula).
+        """
+        self.tiles = []
+        self.grid_lines = []
+        for level in range(ZOOM_LEVELS):
+            size = self.image_loader.get_cell_size(level)
+            tiles = {}
+            for cell_type in City.CELL_NAMES:
+                tile = self.image_loader.get_tile(cell_type, level).copy()
+                if size >= MIN_BORDER_SIZE:
+                    pygame.draw.rect(tile, COLOR_GRID, tile.get_rect(), 1)
+                tiles[cell_type] = tile
+            self.tiles.append(tiles)
+            
+            if size < MIN_BORDER_SIZE:
+                self.grid_lines.append(None)
+                continue
+            # Cada célula tem borda nos quatro lados: entre duas células a
+            # linha tem 2 pixels (k * size - 1 e k * size)
+            width = VIEW_WIDTH + size
+            height = VIEW_HEIGHT + size
+            lines = pygame.Surface((width, height))
+            lines.fill(COLOR_TRANSPARENT)
+            lines.set_colorkey(COLOR_TRANSPARENT)
+            for k in range(0, width + 1, size):
+                pygame.draw.line(lines, COLOR_GRID, (k - 1, 0), (k - 1, height))
+                pygame.draw.line(lines, COLOR_GRID, (k, 0), (k, height))
+            for k in range(0, height + 1, size):
+                pygame.draw.line(lines, COLOR_GRID, (0, k - 1), (width, k - 1))
+                pygame.draw.line(lines, COLOR_GRID, (0, k), (width, k))
+            if pygame.display.get_surface() is not None:
+                lines = lines.convert()
+            self.grid_lines.append(lines)
         
-        pygame.draw.rect(self.screen, color, rect)
+        self.image_loader.build_atlases(VIEW_WIDTH)
+    
+    def draw_tile(self, x, y):
+        """Desenha uma célula no fundo do grid"""
+        self.draw_grid(self.get_cell_rect(x, y).move(-VIEW_X, -VIEW_Y))
+    
+    def draw_grid(self, rect=None):
+        """
+        Redesenha as células visíveis do fundo do grid (ou só as que tocam
+        rect, em coordenadas do fundo). Com o atlas, todas as células vão
+        num único Surface.blits e as linhas do grid num blit só por cima;
+        sem ele, cada célula é um blit de um tile com borda. Células iguais
+        seguidas numa linha são um só recorte do atlas. O atlas só compensa
+        com células pequenas (muitas na vista), ver use_atlas.
+        """
+        x0, y0, x1, y1 = self.get_visible_cells(rect)
+        if x0 >= x1 or y0 >= y1:
+            return
+        surface = self.grid_surface
+        size = self.cell_size
+        cells = self.city.cells
+        width = self.city.width
+        left = x0 * size - self.view_x
+        top = y0 * size - self.view_y
         
-        # Adiciona textura de rua
-        if cell_type == City.STREET:
-            center_x = rect.centerx
-            center_y = rect.centery
-            for i in range(3):
-                dash_x = center_x - 10 + i * 10
-                pygame.draw.line(self.screen, COLOR_YELLOW,
-                               (dash_x, center_y), (dash_x + 5, center_y), 1)
-    
-    def draw_grid(self):
-        """Desenha o grid da cidade"""
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                cell_type = self.city.get_cell(x, y)
-                
-                # Cria retângulo da célula
-                rect = pygame.Rect(
-                    self.grid_offset_x + x * CELL_SIZE,
-                    self.grid_offset_y + y * CELL_SIZE,
-                    CELL_SIZE,
-                    CELL_SIZE
-                )
-                
-                # Tenta desenhar com imagem, senão usa cor
-                image = self.image_loader.get_image(cell_type)
-                if image:
-                    self.screen.blit(image, rect)
-                else:
-                    self.draw_cell_with_color(rect, cell_type)
-                
-                # Desenha borda do grid
-                pygame.draw.rect(self.screen, COLOR_GRID, rect, 1)
+        use_atlas = self.use_atlas
+        if use_atlas is None:
+            use_atlas = size <= ATLAS_MAX_CELL_SIZE
+        if not use_atlas:
+            tiles = self.tiles[self.zoom]
+            empty = tiles[City.EMPTY]
+            for y in range(y0, y1):
+                py = top + (y - y0) * size
+                row = cells[y * width + x0:y * width + x1]
+                for i in range(len(row)):
+                    surface.blit(tiles.get(row[i]) or empty, (left + i * size, py))
+            return
+        
+        atlas = self.image_loader.atlases[self.zoom]
+        rows = self.image_loader.atlas_rows[self.zoom]
+        sequence = []
+        for y in range(y0, y1):
+            py = top + (y - y0) * size
+            row = cells[y * width + x0:y * width + x1]
+            for run in CELL_RUN.finditer(row):
+                start = run.start()
+                sequence.append((atlas, (left + start * size, py),
+                                 (0, rows[row[start]], (run.end() - start) * size, size)))
+        surface.blits(sequence, doreturn=False)
         
-        # Desenha caminho se existe
+        lines = self.grid_lines[self.zoom]
+        if lines is not None:
+            # Só sobre as células redesenhadas
+            surface.set_clip(pygame.Rect(left, top, (x1 - x0) * size, (y1 - y0) * size))
+            surface.blit(lines, (-(self.view_x % size), -(self.view_y % size)))
+            surface.set_clip(None)
+    
+    def set_zoom(self, zoom, anchor=None):
+        """
+        Muda o nível de zoom (0 = células maiores) mantendo fixo o ponto
+        do mapa sob anchor (posição na tela, por padrão o centro da vista).
+        """
+        zoom = max(0, min(zoom, ZOOM_LEVELS - 1))
+        if zoom == self.zoom:
+            return
+        grid_rect = self.get_grid_rect()
+        if anchor is None or not grid_rect.collidepoint(anchor):
+            anchor = grid_rect.center
+        local_x = anchor[0] - VIEW_X
+        local_y = anchor[1] - VIEW_Y
+        old_size = self.cell_size
+        
+        self.zoom = zoom
+        self.cell_size = self.image_loader.get_cell_size(zoom)
+        self.create_overlays()
+        self.view_x = (self.view_x + local_x) * self.cell_size // old_size - local_x
+        self.view_y = (self.view_y + local_y) * self.cell_size // old_size - local_y
+        self.clamp_view()
+    
+    def pan(self, dx, dy):
+        """Desloca a vista dx, dy pixels (limitado às bordas do mapa)"""
+        self.view_x += dx
+        self.view_y += dy
+        self.clamp_view()
+    
+    def clamp_view(self):
+        """Mantém a vista dentro do mapa"""
+        max_x = max(self.city.width * self.cell_size - VIEW_WIDTH, 0)
+        max_y = max(self.city.height * self.cell_size - VIEW_HEIGHT, 0)
+        self.view_x = max(0, min(self.view_x, max_x))
+        self.view_y = max(0, min(self.view_y, max_y))
+    
+    def scroll_grid(self, dx, dy):
+        """
+        Desloca o fundo do grid já desenhado e desenha só as faixas que
+        entraram na vista.
+        """
+        surface = self.grid_surface
+        width, height = surface.get_size()
+        if abs(dx) >= width or abs(dy) >= height:
+            self.draw_grid()
+            return
+        surface.scroll(-dx, -dy)
+        if dx > 0:
+            self.draw_grid(pygame.Rect(width - dx, 0, dx, height))
+        elif dx < 0:
+            self.draw_grid(pygame.Rect(0, 0, -dx, height))
+        if dy > 0:
+            self.draw_grid(pygame.Rect(0, height - dy, width, dy))
+        elif dy < 0:
+            self.draw_grid(pygame.Rect(0, 0, width, -dy))
+    
+    def sync_grid(self):
+        """
+        Atualiza o fundo do grid com as alterações do mapa e da vista desde
+        o último quadro. Retorna o conjunto de células (x, y) redesenhadas,
+        ou None se a vista inteira mudou.
+        """
+        city = self.city
+        view = (self.zoom, self.view_x, self.view_y)
+        changes = None
+        if city is self.rendered_city and \
+           self.grid_surface.get_size() == self.get_grid_rect().size and \
+           view[0] == self.rendered_view[0]:
+            if city.version == self.rendered_version:
+                changes = []
+            else:
+                changes = city.changes_since(self.rendered_version)
+        
+        moved = view != self.rendered_view
+        self.rendered_city = city
+        self.rendered_version = city.version
+        old_view = self.rendered_view
+        self.rendered_view = view
+        
+        if changes is None:
+            self.grid_surface = pygame.Surface(self.get_grid_rect().size)
+            self.visible_cells = self.get_visible_cells()
+            self.draw_grid()
+            return None
+        
+        if moved:
+            self.scroll_grid(view[1] - old_view[1], view[2] - old_view[2])
+            self.visible_cells = self.get_visible_cells()
+        
+        dirty = set()
+        for index, old_type, new_type in changes:
+            y, x = divmod(index, city.width)
+            if self.is_visible(x, y) and (x, y) not in dirty:
+                self.draw_tile(x, y)
+                dirty.add((x, y))
+        return None if moved else dirty
+    
+    def sync_route(self):
+        """
+        Atualiza as células cobertas pela rota e pelos pontos A e B.
+        Retorna as células que mudaram (as da rota antiga e as da nova).
+        """
+        if self.path is self.rendered_path and \
+           self.start_pos == self.rendered_start and self.end_pos == self.rendered_end:
+            return set()
+        
+        dirty = set(self.route_cells)
+        self.route_cells = {}
         if self.path is not None:
             for i in range(len(self.path)):
-                pos = self.path[i]
-                x, y = pos[0], pos[1]
-                
-                # Não desenha sobre start e end
-                is_start = self.start_pos and x == self.start_pos[0] and y == self.start_pos[1]
-                is_end = self.end_pos and x == self.end_pos[0] and y == self.end_pos[1]
-                
-                if not is_start and not is_end:
-                    center_x = self.grid_offset_x + x * CELL_SIZE + CELL_SIZE // 2
-                    center_y = self.grid_offset_y + y * CELL_SIZE + CELL_SIZE // 2
-                    
-                    # Desenha círculo no caminho
-                    pygame.draw.circle(self.screen, COLOR_PATH, (center_x, center_y), 8)
-                    pygame.draw.circle(self.screen, COLOR_BLACK, (center_x, center_y), 8, 2)
-                    
-                    # Desenha seta indicando direção se não for o último
-                    if i < len(self.path) - 1:
-                        next_pos = self.path[i + 1]
-                        next_x, next_y = next_pos[0], next_pos[1]
-                        
-                        # Calcula direção
-                        dx = next_x - x
-                        dy = next_y - y
-                        
-                        # Desenha seta pequena
-                        arrow_size = 5
-                        if dx > 0:  # Direita
-                            pygame.draw.polygon(self.screen, COLOR_BLACK, [
-                                (center_x + arrow_size, center_y),
-                                (center_x, center_y - 3),
-                                (center_x, center_y + 3)
-                            ])
-                        elif dx < 0:  # Esquerda
-                            pygame.draw.polygon(self.screen, COLOR_BLACK, [
-                                (center_x - arrow_size, center_y),
-                                (center_x, center_y - 3),
-                                (center_x, center_y + 3)
-                            ])
-                        elif dy > 0:  # Baixo
-                            pygame.draw.polygon(self.screen, COLOR_BLACK, [
-                                (center_x, center_y + arrow_size),
-                                (center_x - 3, center_y),
-                                (center_x + 3, center_y)
-                            ])
-                        elif dy < 0:  # Cima
-                            pygame.draw.polygon(self.screen, COLOR_BLACK, [
-                                (center_x, center_y - arrow_size),
-                                (center_x - 3, center_y),
-                                (center_x + 3, center_y)
-                            ])
-        
-        # Desenha ponto de partida
-        if self.start_pos is not None:
-            x, y = self.start_pos[0], self.start_pos[1]
-            rect = pygame.Rect(
-                self.grid_offset_x + x * CELL_SIZE,
-                self.grid_offset_y + y * CELL_SIZE,
-                CELL_SIZE,
-                CELL_SIZE
-            )
-            
-            # Overlay semi-transparente verde
-            s = pygame.Surface((CELL_SIZE, CELL_SIZE))
-            s.set_alpha(180)
-            s.fill(COLOR_START)
-            self.screen.blit(s, rect)
-            
-            pygame.draw.rect(self.screen, COLOR_BLACK, rect, 3)
-            
-            # Desenha "A"
-            text = self.font.render("A", True, COLOR_BLACK)
-            text_rect = text.get_rect(center=rect.center)
-            self.screen.blit(text, text_rect)
-        
-        # Desenha ponto de chegada
-        if self.end_pos is not None:
-            x, y = self.end_pos[0], self.end_pos[1]
-            rect = pygame.Rect(
-                self.grid_offset_x + x * CELL_SIZE,
-                self.grid_offset_y + y * CELL_SIZE,
-                CELL_SIZE,
-                CELL_SIZE
-            )
-            
-            # Overlay semi-transparente azul
-            s = pygame.Surface((CELL_SIZE, CELL_SIZE))
-            s.set_alpha(180)
-            s.fill(COLOR_END)
-            self.screen.blit(s, rect)
+                self.route_cells[tuple(self.path[i])] = i
+        for pos in (self.start_pos, self.end_pos):
+            if pos is not None:
+                self.route_cells.setdefault(tuple(pos), None)
+        dirty.update(self.route_cells)
+        
+        self.rendered_path = self.path
+        self.rendered_start = self.start_pos
+        self.rendered_end = self.end_pos
+        return dirty
+    
+    def draw_route_cell(self, x, y):
+        """Desenha na cena a parte da rota (ou o ponto A/B) que cai na célula"""
+        rect = self.get_cell_rect(x, y)
+        size = self.cell_size
+        is_start = self.start_pos and x == self.start_pos[0] and y == self.start_pos[1]
+        is_end = self.end_pos and x == self.end_pos[0] and y == self.end_pos[1]
+        i = self.route_cells.get((x, y))
+        
+        # Desenha caminho (não desenha sobre start e end)
+        if i is not None and not is_start and not is_end:
+            center_x = rect.centerx
+            center_y = rect.centery
             
-            pygame.draw.rect(self.screen, COLOR_BLACK, rect, 3)
+            # Desenha círculo no caminho (menor nos níveis de zoom menores)
+            radius = max(size // 5, 1)
+            pygame.draw.circle(self.scene, COLOR_PATH, (center_x, center_y), radius)
+            if size < 20:
+                return
+            pygame.draw.circle(self.scene, COLOR_BLACK, (center_x, center_y), radius, 2)
             
-            # Desenha "B"
-            text = self.font.render("B", True, COLOR_WHITE)
-            text_rect = text.get_rect(center=rect.center)
-            self.screen.blit(text, text_rect)
+            # Desenha seta indicando direção se não for o último
+            if i < len(self.path) - 1:
+                next_pos = self.path[i + 1]
+                next_x, next_y = next_pos[0], next_pos[1]
+                
+                # Calcula direção
+                dx = next_x - x
+                dy = next_y - y
+                
+                # Desenha seta pequena
+                arrow_size = size // 8
+                half = size * 3 // 40
+                if dx > 0:  # Direita
+                    pygame.draw.polygon(self.scene, COLOR_BLACK, [
+                        (center_x + arrow_size, center_y),
+                        (center_x, center_y - half),
+                        (center_x, center_y + half)
+                    ])
+                elif dx < 0:  # Esquerda
+                    pygame.draw.polygon(self.scene, COLOR_BLACK, [
+                        (center_x - arrow_size, center_y),
+                        (center_x, center_y - half),
+                        (center_x, center_y + half)
+                    ])
+                elif dy > 0:  # Baixo
+                    pygame.draw.polygon(self.scene, COLOR_BLACK, [
+                        (center_x, center_y + arrow_size),
+                        (center_x - half, center_y),
+                        (center_x + half, center_y)
+                    ])
+                elif dy < 0:  # Cima
+                    pygame.draw.polygon(self.scene, COLOR_BLACK, [
+                        (center_x, center_y - arrow_size),
+                        (center_x - half, center_y),
+                        (center_x + half, center_y)
+                    ])
+        
+        # Desenha ponto de partida (overlay verde com "A") ou de chegada
+        # (overlay azul com "B")
+        if is_start or is_end:
+            self.scene.blit(self.start_overlay if is_start else self.end_overlay, rect)
+            if size >= MIN_BORDER_SIZE:
+                pygame.draw.rect(self.scene, COLOR_BLACK, rect, 3 if size >= 20 else 1)
+            if size >= 20:
+                label = self.start_label if is_start else self.end_label
+                self.scene.blit(label, label.get_rect(center=rect.center))
+    
+    def create_overlays(self):
+        """Cria as superfícies dos pontos A e B no tamanho de célula atual"""
+        size = self.cell_size
+        self.start_overlay = pygame.Surface((size, size))
+        self.start_overlay.set_alpha(180)
+        self.start_overlay.fill(COLOR_START)
+        self.end_overlay = pygame.Surface((size, size))
+        self.end_overlay.set_alpha(180)
+        self.end_overlay.fill(COLOR_END)
+        self.start_label = self.font.render("A", True, COLOR_BLACK)
+        self.end_label = self.font.render("B", True, COLOR_WHITE)
+    
+    def render(self):
+        """
+        Atualiza na cena só o que mudou desde o último quadro: células
+        visíveis alteradas no mapa, células da rota antiga e da nova, a
+        vista inteira quando ela se desloca, e a interface quando algum
+        botão ou texto muda. Retorna os retângulos da tela que precisam
+        ser atualizados.
+        """
+        rects = []
+        if self.scene is None:
+            self.scene = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+            self.scene.fill(COLOR_WHITE)
+            self.rendered_city = None
+            self.ui_state = None
+            rects.append(self.scene.get_rect())
+        
+        dirty = self.sync_grid()
+        route_dirty = self.sync_route()
+        grid_rect = self.get_grid_rect()
+        # Células da borda da vista aparecem só em parte
+        self.scene.set_clip(grid_rect)
+        
+        if dirty is None:
+            # Vista inteira; limpa a área do grid anterior se ele encolheu
+            if self.rendered_grid_rect is not None and \
+               not grid_rect.contains(self.rendered_grid_rect):
+                self.scene.set_clip(None)
+                self.scene.fill(COLOR_WHITE, self.rendered_grid_rect)
+                rects.append(self.rendered_grid_rect)
+                self.scene.set_clip(grid_rect)
+            self.scene.blit(self.grid_surface, grid_rect)
+            for x, y in self.route_cells:
+                if self.is_visible(x, y):
+                    self.draw_route_cell(x, y)
+            rects.append(grid_rect)
+        else:
+            dirty.update(route_dirty)
+            for x, y in dirty:
+                if self.is_visible(x, y):
+                    rect = self.get_cell_rect(x, y).clip(grid_rect)
+                    area = rect.move(-VIEW_X, -VIEW_Y)
+                    self.scene.blit(self.grid_surface, rect, area)
+                    if (x, y) in self.route_cells:
+                        self.draw_route_cell(x, y)
+                    rects.append(rect)
+        
+        self.scene.set_clip(None)
+        self.rendered_grid_rect = grid_rect
+        rects.extend(self.draw_ui())
+        return rects
     
     def draw_ui(self):
-        """Desenha interface do usuário"""
+        """
+        Desenha a interface do usuário na cena (faixas acima e abaixo do
+        grid) quando algo nela mudou. Retorna os retângulos redesenhados.
+        """
+        # Informações da rota
+        info_text = None
+        if self.router.busy:
+            info_text = "Calculando rota..."
+        elif self.path is not None and self.start_pos and self.end_pos:
+            path_length = len(self.path)
+            info_text = f"Rota: {path_length} metros (custo {self.path_cost}) | A({self.start_pos[0]},{self.start_pos[1]}) -> B({self.end_pos[0]},{self.end_pos[1]})"
+        
+        state = (self.mode, self.current_tool, info_text,
+                 tuple((button.text, button.is_hovered) for button in self.buttons))
+        if state == self.ui_state:
+            return []
+        self.ui_state = state
+        
+        bands = [
+            pygame.Rect(0, 0, WINDOW_WIDTH, VIEW_Y),
+            pygame.Rect(0, VIEW_Y + VIEW_HEIGHT, WINDOW_WIDTH, WINDOW_HEIGHT - VIEW_Y - VIEW_HEIGHT)
+        ]
+        for band in bands:
+            self.scene.fill(COLOR_WHITE, band)
+        
         # Desenha botões
         for button in self.buttons:
-            button.draw(self.screen, self.small_font)
+            button.draw(self.scene, self.small_font)
         
         # Destaca ferramenta atual no modo edição
         if self.mode == "EDIT":
             if self.current_tool == City.STREET:
-                pygame.draw.rect(self.screen, COLOR_WHITE, self.btn_street.rect, 3)
+                pygame.draw.rect(self.scene, COLOR_WHITE, self.btn_street.rect, 3)
             elif self.current_tool == City.HOUSE:
-                pygame.draw.rect(self.screen, COLOR_WHITE, self.btn_house.rect, 3)
+                pygame.draw.rect(self.scene, COLOR_WHITE, self.btn_house.rect, 3)
             elif self.current_tool == City.BUILDING:
-                pygame.draw.rect(self.screen, COLOR_WHITE, self.btn_building.rect, 3)
+                pygame.draw.rect(self.scene, COLOR_WHITE, self.btn_building.rect, 3)
             elif self.current_tool == City.PARK:
-                pygame.draw.rect(self.screen, COLOR_WHITE, self.btn_park.rect, 3)
+                pygame.draw.rect(self.scene, COLOR_WHITE, self.btn_park.rect, 3)
             elif self.current_tool == City.EMPTY:
-                pygame.draw.rect(self.screen, COLOR_WHITE, self.btn_erase.rect, 3)
+                pygame.draw.rect(self.scene, COLOR_WHITE, self.btn_erase.rect, 3)
         
-        # Informações da rota
-        if self.path is not None and self.start_pos and self.end_pos:
+        if info_text is not None:
             info_y = 50
-            path_length = len(self.path)
-            info_text = f"Rota: {path_length} metros | A({self.start_pos[0]},{self.start_pos[1]}) -> B({self.end_pos[0]},{self.end_pos[1]})"
             text = self.small_font.render(info_text, True, COLOR_BLACK)
-            self.screen.blit(text, (530, info_y))
+            self.scene.blit(text, (530, info_y))
         
         # Instruções
-        y_pos = WINDOW_HEIGHT - 80
+        y_pos = WINDOW_HEIGHT - 85
         
         if self.mode == "EDIT":
             instructions = [
@@ -491,16 +918,19 @@ class WazeApp:
                 "MODO NAVEGACAO - Clique em uma RUA para definir:",
                 "Primeiro clique = Ponto A (partida) | Segundo clique = Ponto B (chegada)"
             ]
+        instructions.append("Roda do mouse ou +/- = zoom | Botao direito ou setas = mover o mapa")
         
         for i in range(len(instructions)):
             text = self.small_font.render(instructions[i], True, COLOR_BLACK)
-            self.screen.blit(text, (10, y_pos + i * 25))
+            self.scene.blit(text, (10, y_pos + i * 25))
         
-        # Desenha mensagens (pop-ups)
-        self.draw_messages()
+        return bands
     
     def draw_messages(self):
-        """Desenha todas as mensagens ativas"""
+        """
+        Desenha todas as mensagens ativas direto na tela, por cima da
+        cena. Retorna os retângulos ocupados.
+        """
         # Remove mensagens inativas
         self.messages = [msg for msg in self.messages if msg.update()]
         
@@ -508,10 +938,12 @@ class WazeApp:
         y_start = 150
         spacing = 10
         
+        rects = []
         for i in range(len(self.messages)):
             msg = self.messages[i]
             y_pos = y_start + i * (50 + spacing)
-            msg.draw(self.screen, self.font, y_pos)
+            rects.append(msg.draw(self.screen, self.font, y_pos))
+        return rects
     
     def handle_events(self):
         """Trata eventos"""
@@ -519,6 +951,10 @@ class WazeApp:
             if event.type == pygame.QUIT:
                 return False
             
+            if event.type == self.route_ready:
+                self.on_route_ready(event)
+                continue
+            
             # Eventos de botões
             for button in self.buttons:
                 button.handle_event(event)
@@ -545,6 +981,7 @@ class WazeApp:
                 # Botões de ação
                 elif self.btn_clear.handle_event(event):
                     self.city.clear()
+                    self.cancel_route()
                     self.start_pos = None
                     self.end_pos = None
                     self.path = None
@@ -557,11 +994,17 @@ class WazeApp:
                     self.add_message("Mapa salvo com sucesso!", "success")
                 
                 elif self.btn_load.handle_event(event):
-                    filename = "maps/cidade.json"
+                    filename = self.get_map_filename()
                     loaded_city = City.load_from_file(filename)
                     if loaded_city:
                         self.city = loaded_city
-                        self.pathfinder = PathFinder(self.city)
+                        self.view_x = 0
+                        self.view_y = 0
+                        # O processo de rotas carrega a hierarquia ou os
+                        # landmarks gravados ao lado do mapa
+                        self.router.close()
+                        self.router = RouteWorker(self.city, map_filename=filename, default="incremental")
+                        self.route_reason = None
                         self.start_pos = None
                         self.end_pos = None
                         self.path = None
@@ -585,43 +1028,34 @@ class WazeApp:
                     self.add_message("Engarrafamentos gerados!", "warning")
                     # Recalcula rota se já existe
                     if self.start_pos and self.end_pos:
-                        old_path_length = len(self.path) if self.path else 0
-                        self.path = self.pathfinder.find_path(self.start_pos, self.end_pos)
-                        if self.path:
-                            new_path_length = len(self.path)
-                            if new_path_length != old_path_length:
-                                self.add_message("Rota alternativa calculada!", "info", 2000)
-                        else:
-                            self.add_message("Nenhum caminho disponivel!", "error")
+                        self.request_route("traffic")
                 
                 elif self.btn_clear_traffic.handle_event(event):
                     self.city.clear_all_traffic()
                     self.add_message("Trafego limpo!", "success")
                     # Recalcula rota se já existe
                     if self.start_pos and self.end_pos:
-                        self.path = self.pathfinder.find_path(self.start_pos, self.end_pos)
-                        if self.path:
-                            self.add_message("Rota recalculada!", "info", 2000)
+                        self.request_route("clear_traffic")
                 
                 elif self.btn_find_path.handle_event(event):
                     if self.start_pos and self.end_pos:
-                        self.path = self.pathfinder.find_path(self.start_pos, self.end_pos)
-                        if self.path is None:
-                            print("Nenhum caminho encontrado!")
-                            self.add_message("Nenhum caminho encontrado!", "error", 4000)
-                        else:
-                            self.add_message(f"Rota encontrada: {len(self.path)} metros", "success")
+                        self.request_route("button")
                     else:
                         self.add_message("Defina os pontos A e B primeiro!", "warning")
                 
                 elif self.btn_clear_route.handle_event(event):
+                    self.cancel_route()
                     self.start_pos = None
                     self.end_pos = None
                     self.path = None
                     self.add_message("Rota limpa!", "info")
                 
-                # Clique no grid
-                else:
+                # Botão direito arrasta a vista
+                elif event.button == 3:
+                    self.dragging = True
+                
+                # Clique no grid (a roda do mouse também gera cliques, 4 e 5)
+                elif event.button == 1:
                     cell = self.get_cell_from_mouse(event.pos)
                     if cell is not None:
                         x, y = cell[0], cell[1]
@@ -640,14 +1074,10 @@ class WazeApp:
                                 elif self.end_pos is None:
                                     self.end_pos = cell
                                     # Calcula caminho automaticamente
-                                    self.path = self.pathfinder.find_path(self.start_pos, self.end_pos)
-                                    if self.path is None:
-                                        print("Nenhum caminho encontrado!")
-                                        self.add_message("Nenhum caminho encontrado!", "error", 4000)
-                                    else:
-                                        self.add_message(f"Rota calculada: {len(self.path)} metros", "success", 3000)
+                                    self.request_route("click")
                                 else:
-                                    # Reinicia
+                                    # Reinicia (descarta a busca em andamento)
+                                    self.cancel_route()
                                     self.start_pos = cell
                                     self.end_pos = None
                                     self.path = None
@@ -662,23 +1092,104 @@ class WazeApp:
                     if cell is not None:
                         x, y = cell[0], cell[1]
                         self.city.set_cell(x, y, self.current_tool)
+            
+            # Vista: arrastar com o botão direito, zoom na roda do mouse
+            # (em torno do cursor), setas e +/- no teclado
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                self.dragging = False
+            elif event.type == pygame.MOUSEMOTION and self.dragging:
+                self.pan(-event.rel[0], -event.rel[1])
+            elif event.type == pygame.MOUSEWHEEL:
+                self.set_zoom(self.zoom - event.y, pygame.mouse.get_pos())
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    self.pan(-PAN_STEP, 0)
+                elif event.key == pygame.K_RIGHT:
+                    self.pan(PAN_STEP, 0)
+                elif event.key == pygame.K_UP:
+                    self.pan(0, -PAN_STEP)
+                elif event.key == pygame.K_DOWN:
+                    self.pan(0, PAN_STEP)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    self.set_zoom(self.zoom - 1)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.set_zoom(self.zoom + 1)
         
         return True
     
+    def request_route(self, reason):
+        """
+        Pede a rota de A até B ao processo de rotas, cancelando o pedido
+        anterior. A rota atual continua na tela até a nova chegar.
+        """
+        self.router.submit(self.start_pos, self.end_pos)
+        self.route_reason = reason
+    
+    def cancel_route(self):
+        """Descarta o pedido de rota em andamento"""
+        self.router.cancel()
+        self.route_reason = None
+    
+    def poll_route(self):
+        """Transforma a resposta do processo de rotas num evento route_ready"""
+        result = self.router.poll()
+        if result is not None:
+            job, path, cost, strategy, expanded, seconds = result
+            pygame.event.post(pygame.event.Event(
+                self.route_ready, job=job, path=path, cost=cost, strategy=strategy,
+                expanded=expanded, seconds=seconds))
+    
+    def on_route_ready(self, event):
+        """Mostra a rota calculada com as mensagens do motivo do pedido"""
+        if event.job != self.router.job or self.route_reason is None:
+            # Pedido substituído ou cancelado depois da resposta
+            return
+        old_path = self.path
+        self.path = event.path
+        self.path_cost = event.cost
+        reason = self.route_reason
+        self.route_reason = None
+        
+        if reason == "traffic":
+            if self.path:
+                old_path_length = len(old_path) if old_path else 0
+                if len(self.path) != old_path_length:
+                    self.add_message("Rota alternativa calculada!", "info", 2000)
+            else:
+                self.add_message("Nenhum caminho disponivel!", "error")
+        elif reason == "clear_traffic":
+            if self.path:
+                self.add_message("Rota recalculada!", "info", 2000)
+        elif self.path is None:
+            print("Nenhum caminho encontrado!")
+            self.add_message("Nenhum caminho encontrado!", "error", 4000)
+        elif reason == "button":
+            self.add_message(f"Rota encontrada: {len(self.path)} metros", "success")
+        else:
+            self.add_message(f"Rota calculada: {len(self.path)} metros", "success", 3000)
+    
     def run(self):
         """Loop principal"""
         running = True
         while running:
+            self.poll_route()
             running = self.handle_events()
             
-            # Desenha
-            self.screen.fill(COLOR_WHITE)
-            self.draw_grid()
-            self.draw_ui()
+            # Redesenha só o que mudou: a tela é a cena mais as mensagens,
+            # então as mensagens do quadro anterior são apagadas copiando
+            # a cena por cima antes de desenhar as atuais
+            rects = self.render()
+            if rects or self.messages or self.message_rects:
+                rects.extend(self.message_rects)
+                for rect in rects:
+                    self.screen.blit(self.scene, rect, rect)
+                self.message_rects = self.draw_messages()
+                rects.extend(self.message_rects)
+                pygame.display.update(rects)
             
-            pygame.display.flip()
             self.clock.tick(60)
         
+        self.router.close()
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Formatos de arquivo de mapas: binário (.wmap) e leitor JSON incremental
+
+Formato binário (.wmap)
+
+Layout (little-endian):
+    cabeçalho fixo  -> magic, versão, flags, largura, altura,
+                       offset dos dados, tamanho dos dados, tamanho do nome
+    nome            -> UTF-8
+    preenchimento   -> zeros até o offset dos dados
+    dados           -> um byte por célula em ordem de linhas
+                       (ou o mesmo bloco comprimido com zlib)
+
+Arquivos grandes sem compressão têm os dados alinhados em 64 KiB para
+que possam ser abertos com mmap, lendo do disco só as páginas usadas.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+BINARY_EXTENSION = ".wmap"
+
+MAGIC = b"WZMP"
+VERSION = 1
+FLAG_ZLIB = 1
+
+HEADER = struct.Struct("<4sHHIIIIH")
+
+# Alinhamento dos dados (cobre a granularidade do mmap no Linux e Windows)
+DATA_ALIGNMENT = 65536
+# Abaixo deste tamanho não vale a pena alinhar/mapear
+MMAP_MIN_SIZE = 1024 * 1024
+
+# Tamanho do bloco lido por vez pelo leitor JSON incremental
+JSON_CHUNK_SIZE = 1024 * 1024
+JSON_WHITESPACE = b" \t\r\n"
+
+
+def is_binary_map(filename):
+    """Verifica pela extensão se o arquivo está no formato binário"""
+    return filename.lower().endswith(BINARY_EXTENSION)
+
+
+def write_map(filename, name, width, height, cells, compress=False):
+    """Grava um mapa no formato binário"""
+    name_bytes = name.encode("utf-8")
+    flags = 0
+    data = cells
+    if compress:
+        data = zlib.compress(bytes(cells), 6)
+        flags |= FLAG_ZLIB
+
+    data_offset = HEADER.size + len(name_bytes)
+    if not compress and len(data) >= MMAP_MIN_SIZE:
+        data_offset = -(-data_offset // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+    header = HEADER.pack(MAGIC, VERSION, flags, width, height,
+                         data_offset, len(data), len(name_bytes))
+
+    with open(filename, "wb") as f:
+        f.write(header)
+        f.write(name_bytes)
+        f.write(bytes(data_offset - HEADER.size - len(name_bytes)))
+        f.write(data)
+
+    return True
+
+
+def read_header(f):
+    """Lê e valida o cabeçalho. Retorna um dicionário com os campos"""
+    raw = f.read(HEADER.size)
+    if len(raw) != HEADER.size:
+        raise ValueError("Arquivo de mapa truncado")
+
+    magic, version, flags, width, height, data_offset, data_length, name_length = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError("Arquivo não é um mapa binário")
+    if version > VERSION:
+        raise ValueError(f"Versão de mapa não suportada: {version}")
+
+    name = f.read(name_length).decode("utf-8")
+    return {
+        "name": name,
+        "width": width,
+        "height": height,
+        "flags": flags,
+        "data_offset": data_offset,
+        "data_length": data_length,
+    }
+
+
+def read_map(filename):
+    """
+    Lê um mapa binário. Retorna (name, width, height, cells).
+
+    Quando os dados não são comprimidos e estão alinhados, cells é um
+    mmap em modo cópia: as páginas só são lidas quando acessadas e as
+    alterações ficam apenas na memória. Nos demais casos cells é um
+    bytearray.
+    """
+    with open(filename, "rb") as f:
+        header = read_header(f)
+        width, height = header["width"], header["height"]
+        size = width * height
+        offset = header["data_offset"]
+        length = header["data_length"]
+
+        if header["flags"] & FLAG_ZLIB:
+            f.seek(offset)
+            cells = bytearray(zlib.decompress(f.read(length)))
+        elif size > 0 and offset % mmap.ALLOCATIONGRANULARITY == 0:
+            if length != size or os.fstat(f.fileno()).st_size < offset + size:
+                raise ValueError("Dados do mapa truncados")
+            cells = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY, offset=offset)
+        else:
+            f.seek(offset)
+            cells = bytearray(f.read(length))
+
+    if len(cells) != size:
+        raise ValueError("Tamanho dos dados não corresponde ao mapa")
+
+    return header["name"], width, height, cells
+
+
+class JsonStream:
+    """
+    Leitor incremental de bytes JSON. Mantém apenas um bloco do arquivo
+    em memória e descarta o que já foi consumido.
+    """
+
+    def __init__(self, f, chunk_size=JSON_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+
+    def fill(self):
+        """Lê mais um bloco do arquivo. Retorna False no fim do arquivo"""
+        data = self.f.read(self.chunk_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Retorna o próximo caractere não branco sem consumi-lo (b"" no fim)"""
+        while True:
+            buf = self.buf
+            pos = self.pos
+            while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos:pos + 1]
+            if not self.fill():
+                return b""
+
+    def expect(self, token):
+        """Consome o token esperado ou lança ValueError"""
+        found = self.peek()
+        if found != token:
+            raise ValueError(f"JSON inválido: esperado {token.decode()!r}, encontrado {found.decode()!r}")
+        self.pos += 1
+
+    def find(self, token):
+        """Índice (no buffer atual) da próxima ocorrência de token"""
+        searched = self.pos
+        while True:
+            i = self.buf.find(token, searched)
+            if i != -1:
+                return i
+            offset = len(self.buf) - self.pos
+            if not self.fill():
+                raise ValueError("JSON truncado")
+            searched = self.pos + offset
+
+    def read_value(self):
+        """Lê um valor JSON completo (pequeno) e retorna o objeto Python"""
+        first = self.peek()
+        if not first:
+            raise ValueError("JSON truncado")
+
+        depth = 0
+        in_string = False
+        escaped = False
+        i = self.pos
+        while True:
+            if i >= len(self.buf):
+                offset = i - self.pos
+                if not self.fill():
+                    break
+                i = self.pos + offset
+                continue
+
+            c = self.buf[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == 0x5C:  # \
+                    escaped = True
+                elif c == 0x22:  # "
+                    in_string = False
+                    if depth == 0:
+                        i += 1
+                        break
+            elif c == 0x22:
+                in_string = True
+            elif c in b"[{":
+                depth += 1
+            elif c in b"]}":
+                if depth == 0:
+                    break
+                depth -= 1
+                if depth == 0:
+                    i += 1
+                    break
+            elif depth == 0 and (c == 0x2C or c in JSON_WHITESPACE):  # ,
+                break
+            i += 1
+
+        raw = self.buf[self.pos:i]
+        self.pos = i
+        return json.loads(raw)
+
+
+def read_json_grid(stream, width, height, valid_codes=None):
+    """
+    Lê o array "grid" linha por linha, convertendo cada linha direto para
+    bytes. Valida a largura de cada linha, a altura e os códigos de
+    célula. Retorna (cells, width, height).
+    """
+    stream.expect(b"[")
+
+    preallocated = width is not None and height is not None
+    cells = bytearray(width * height) if preallocated else bytearray()
+    rows = 0
+
+    if stream.peek() == b"]":
+        stream.pos += 1
+        return cells, width, rows
+
+    while True:
+        stream.expect(b"[")
+        end = stream.find(b"]")
+        text = stream.buf[stream.pos:end]
+        stream.pos = end + 1
+
+        try:
+            row = bytes(map(int, text.split(b","))) if text.strip() else b""
+        except ValueError:
+            raise ValueError(f"Linha {rows} do grid contém valores inválidos")
+
+        if valid_codes is not None and row.translate(None, valid_codes):
+            raise ValueError(f"Código de célula inválido na linha {rows}")
+        if width is None:
+            width = len(row)
+        elif len(row) != width:
+            raise ValueError(f"Linha {rows} do grid com largura inválida")
+        if height is not None and rows >= height:
+            raise ValueError("Grid com mais linhas que a altura do mapa")
+
+        if preallocated:
+            cells[rows * width:(rows + 1) * width] = row
+        else:
+            cells += row
+        rows += 1
+
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == b"]":
+            break
+        if separator != b",":
+            raise ValueError("JSON inválido no grid")
+
+    return cells, width, rows
+
+
+def read_json_map(filename, valid_codes=None):
+    """
+    Lê um mapa JSON sem montar listas aninhadas: o grid é lido de forma
+    incremental e gravado direto num bytearray. O pico de memória fica
+    próximo do tamanho final do grid. Retorna (name, width, height, cells).
+    """
+    with open(filename, "rb") as f:
+        stream = JsonStream(f)
+        stream.expect(b"{")
+
+        fields = {}
+        grid = None
+        while stream.peek() != b"}":
+            key = stream.read_value()
+            stream.expect(b":")
+            if key == "grid":
+                grid = read_json_grid(stream, fields.get("width"),
+                                      fields.get("height"), valid_codes)
+            else:
+                fields[key] = stream.read_value()
+
+            if stream.peek() == b",":
+                stream.pos += 1
+        stream.expect(b"}")
+
+    width = fields.get("width")
+    height = fields.get("height")
+    if not isinstance(width, int) or not isinstance(height, int):
+        raise ValueError("Mapa sem largura/altura")
+    if grid is None:
+        raise ValueError("Mapa sem grid")
+
+    cells, grid_width, grid_height = grid
+    if grid_height != height or (height > 0 and grid_width != width):
+        raise ValueError("Dimensões do grid não correspondem ao mapa")
+
+    return fields.get("name", "Cidade"), width, height, cells
+
+
+def main():
+    """Converte mapas entre JSON e binário: map_format.py origem destino"""
+    from city import City
+
+    if len(sys.argv) < 3:
+        print("Uso: python map_format.py <origem> <destino> [--zlib]")
+        return
+
+    city = City.load_from_file(sys.argv[1])
+    if city is None:
+        return
+
+    city.save_to_file(sys.argv[2], compress="--zlib" in sys.argv[3:])
+    print(f"Convertido: {sys.argv[1]} -> {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
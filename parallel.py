@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Classe ParallelRouter - Roteamento em lote com vários processos
+
+O custo de cada célula (city.costs) é copiado para um bloco de
+multiprocessing.shared_memory; os processos do pool se ligam a esse
+bloco pelo nome em vez de receber a cidade serializada. As consultas são
+agrupadas pela origem e divididas em blocos com origens inteiras, então
+cada origem roda um único Dijkstra (batch.ShortestPathTree) em algum
+processo. Os resultados saem na ordem de entrada e não dependem de
+quantos processos foram usados.
+"""
+
+import os
+from multiprocessing import Pool, shared_memory
+
+from batch import ShortestPathTree
+
+
+class SharedGrid:
+    """Visão do grid de custos num bloco de memória compartilhada"""
+
+    def __init__(self, name, width, height):
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.width = width
+        self.height = height
+        self.costs = self.shm.buf[:width * height]
+
+
+# Grid do processo trabalhador (um por processo, criado em _init_worker)
+_grid = None
+
+
+def _init_worker(name, width, height):
+    global _grid
+    _grid = SharedGrid(name, width, height)
+
+
+def _solve_chunk(task):
+    """
+    Resolve um bloco (consultas [(source, target), ...], costs_only) já
+    validado. Retorna custos ou tuplas de índices, na ordem do bloco.
+    """
+    queries, costs_only = task
+    groups = {}
+    for position, (source, target) in enumerate(queries):
+        groups.setdefault(source, []).append((position, target))
+
+    results = [None] * len(queries)
+    for source, items in groups.items():
+        targets = set(target for position, target in items)
+        tree = ShortestPathTree(_grid, source, targets, keep_parents=not costs_only)
+        for position, target in items:
+            if costs_only:
+                results[position] = tree.cost_to(target)
+            else:
+                results[position] = tree.indices_to(target)
+    return results
+
+
+class ParallelRouter:
+
+    def __init__(self, city, workers=None, chunk_size=256):
+        self.city = city
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        size = city.width * city.height
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.version = None
+        self._publish()
+
+        self.pool = Pool(self.workers, initializer=_init_worker,
+                         initargs=(self.shm.name, city.width, city.height))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Encerra os processos e libera a memória compartilhada"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _publish(self):
+        """Copia os custos atuais da cidade para a memória compartilhada"""
+        if self.version != self.city.version:
+            costs = self.city.costs
+            self.shm.buf[:len(costs)] = costs
+            self.version = self.city.version
+
+    def find_paths(self, pairs, costs_only=False):
+        """
+        Gera (posição do par, resultado) na ordem de entrada. O resultado
+        é o caminho [[x, y], ...] ou, com costs_only, o custo; None quando
+        não há rota. O mapa é lido no início da chamada: não altere a
+        cidade enquanto o gerador estiver em uso.
+        """
+        self._publish()
+        chunks, positions, count = self._split(pairs)
+        width = self.city.width
+
+        # Rotas impossíveis já estão prontas (None); as demais esperam o pool
+        results = [None] * count
+        done = bytearray(b"\x01") * count
+        for chunk_positions in positions:
+            for i in chunk_positions:
+                done[i] = 0
+
+        ready = 0
+        tasks = ((chunk, costs_only) for chunk in chunks)
+        for chunk_positions, solved in zip(positions, self.pool.imap(_solve_chunk, tasks)):
+            for i, value in zip(chunk_positions, solved):
+                if value is not None and not costs_only:
+                    value = [[index % width, index // width] for index in value]
+                results[i] = value
+                done[i] = 1
+
+            # Entrega o prefixo que já está completo
+            while ready < count and done[ready]:
+                yield ready, results[ready]
+                results[ready] = None
+                ready += 1
+
+        while ready < count:
+            yield ready, results[ready]
+            ready += 1
+
+    def _split(self, pairs):
+        """
+        Valida os pares com o índice de componentes (rotas impossíveis não
+        vão para os processos) e monta blocos de origens inteiras. Retorna
+        (blocos, posições na entrada de cada bloco, número de pares).
+        """
+        city = self.city
+        width = city.width
+        components = city.components
+
+        count = 0
+        groups = {}
+        for i, (start, end) in enumerate(pairs):
+            count += 1
+            if not city.is_walkable(start[0], start[1]) or not city.is_walkable(end[0], end[1]):
+                continue
+            source = start[1] * width + start[0]
+            target = end[1] * width + end[0]
+            if components.connected(source, target):
+                groups.setdefault(source, []).append((i, target))
+
+        chunks = []
+        positions = []
+        chunk = []
+        chunk_positions = []
+        for source, queries in groups.items():
+            for i, target in queries:
+                chunk.append((source, target))
+                chunk_positions.append(i)
+            if len(chunk) >= self.chunk_size:
+                chunks.append(chunk)
+                positions.append(chunk_positions)
+                chunk = []
+                chunk_positions = []
+        if chunk:
+            chunks.append(chunk)
+            positions.append(chunk_positions)
+
+        return chunks, positions, count
@@ -1,170 +1,352 @@
+"""
+Classe PathFinder - Busca de rotas A* sobre o mapa da cidade
+"""
+
+import heapq
+import os
+from array import array
+
+import batch
+from bidirectional import BidirectionalAStar
+from contraction import ContractionHierarchy, hierarchy_filename
+from hierarchical import HierarchicalPlanner
+from incremental import IncrementalPlanner
+from jump_point import JumpPointSearch
+from landmarks import LandmarkSearch, landmarks_filename
+from route_cache import RouteCache
+from streets import StreetSearch
+from time_dependent import TimeDependentSearch
+
+
+# Direções: cima, direita, baixo, esquerda (mesma ordem de get_neighbors)
+DIRECTIONS = [[0, -1], [1, 0], [0, 1], [-1, 0]]
+
+# Estratégias de busca além do A* padrão ("astar"). Cada motor guarda
+# estado próprio entre as consultas e tem find_path(start_idx, goal_idx)
+ENGINES = {
+    "incremental": IncrementalPlanner,
+    "jps": JumpPointSearch,
+    "hpa": HierarchicalPlanner,
+    "ch": ContractionHierarchy,
+    "streets": StreetSearch,
+    "bidirectional": BidirectionalAStar,
+    "alt": LandmarkSearch
+}
+
+# Estratégias que só valem com custo uniforme (caem para o A* se houver
+# células com custos diferentes, como tráfego ponderado)
+UNIFORM_COST_ONLY = ("jps",)
+
+# Estratégias de rotas quase ótimas: não entram no cache, que é
+# compartilhado com as estratégias exatas
+APPROXIMATE = ("hpa",)
+
+# Estratégias que dependem de pré-processamento (caem para o A* se ele
+# não foi carregado ou não corresponde mais aos custos do mapa)
+PREPROCESSED = ("ch",)
+
+
 class PathFinder:
-    def __init__(self, city):
+    def __init__(self, city, cache_size=256, strategy="astar"):
         self.city = city
-    
+        # Rotas já calculadas, invalidadas conforme o mapa muda
+        self.cache = RouteCache(city, cache_size)
+        # Estratégia padrão ("astar" ou uma das chaves de ENGINES)
+        self.strategy = self._check_strategy(strategy)
+        self.engines = {}
+        # Nós expandidos na última busca e estratégia usada de fato
+        self.last_expanded = 0
+        self.last_strategy = None
+        # Horário de chegada da última busca com previsão (find_path_at)
+        self.last_arrival = -1
+
     def heuristic(self, pos1, pos2):
+        """Manhattan vezes o menor custo de célula (admissível)"""
         x1, y1 = pos1[0], pos1[1]
         x2, y2 = pos2[0], pos2[1]
-        return abs(x1 - x2) + abs(y1 - y2)
-    
+        return (abs(x1 - x2) + abs(y1 - y2)) * self.city.min_cost()
+
     def get_neighbors(self, pos):
         """Retorna vizinhos válidos de uma posição (4-direções)"""
         x, y = pos[0], pos[1]
         neighbors = []
-        
-        # Direções: cima, direita, baixo, esquerda
-        directions = [[0, -1], [1, 0], [0, 1], [-1, 0]]
-        
-        for i in range(len(directions)):
-            direction = directions[i]
+
+        for i in range(len(DIRECTIONS)):
+            direction = DIRECTIONS[i]
             dx, dy = direction[0], direction[1]
             new_x = x + dx
             new_y = y + dy
-            
-            # Verifica se é transitável (rua)
+
+            # Verifica se é transitável (rua ou tráfego)
             if self.city.is_walkable(new_x, new_y):
                 neighbors.append([new_x, new_y])
-        
+
         return neighbors
-    
-    def find_path(self, start, end):
-        
+
+    def find_path(self, start, end, strategy=None):
+        """
+        Calcula a rota de menor custo de start até end com A*.
+
+        strategy escolhe outro motor só para esta consulta: "incremental"
+        (LPA*, reaproveita a busca anterior), "jps" (Jump Point Search,
+        só com custo uniforme), "hpa" (busca hierárquica por clusters,
+        para viagens longas em mapas grandes), "ch" (hierarquia de
+        contração pré-processada, ver load_hierarchy), "streets" (A*
+        sobre o grafo de cruzamentos, com os corredores comprimidos) ou
+        "bidirectional" (A* a partir dos dois lados, bom em labirintos)
+        ou "alt" (A* com limites por landmarks, ver load_landmarks).
+        Todas retornam rotas de custo ótimo, menos "hpa", que retorna
+        rotas quase ótimas.
+
+        Usa um heap binário com remoção preguiçosa e arrays planos
+        indexados por y * width + x. O custo de cada passo é o custo da
+        célula de destino (city.costs: rua 1, tráfego 10 por padrão) e a
+        heurística é Manhattan vezes o menor custo, que nunca superestima.
+        Empates de f são desfeitos pela ordem em que os nós entraram na
+        lista aberta, então sem tráfego as rotas são as mesmas da
+        implementação original com listas.
+
+        Retorna a lista de posições [[x, y], ...] ou None.
+        """
         # Verifica se start e end são válidos
         if not self.city.is_walkable(start[0], start[1]):
             return None
         if not self.city.is_walkable(end[0], end[1]):
             return None
-        
-        # Arrays para A* 
-        open_list = [] 
-        closed_list = [] 
-        
-        # Dicionários implementados como arrays de pares [key, value]
-        g_score = []  # Custo do início até o nó
-        f_score = []  # g_score + heurística
-        came_from = []  # Para reconstruir o caminho
-        
-        # Funções auxiliares para trabalhar com "dicionários" como arrays
-        def set_score(score_array, pos, value):
-            """Define valor no array de scores"""
-            key = str(pos[0]) + "," + str(pos[1])
-            # Procura se já existe
-            for i in range(len(score_array)):
-                if score_array[i][0] == key:
-                    score_array[i][1] = value
-                    return
-            # Se não existe, adiciona
-            score_array.append([key, value])
-        
-        def get_score(score_array, pos, default=999999):
-            """Obtém valor do array de scores"""
-            key = str(pos[0]) + "," + str(pos[1])
-            for i in range(len(score_array)):
-                if score_array[i][0] == key:
-                    return score_array[i][1]
-            return default
-        
-        def set_came_from(pos, from_pos):
-            """Define de onde veio"""
-            key = str(pos[0]) + "," + str(pos[1])
-            # Procura se já existe
-            for i in range(len(came_from)):
-                if came_from[i][0] == key:
-                    came_from[i][1] = from_pos
-                    return
-            came_from.append([key, from_pos])
-        
-        def get_came_from(pos):
-            """Obtém de onde veio"""
-            key = str(pos[0]) + "," + str(pos[1])
-            for i in range(len(came_from)):
-                if came_from[i][0] == key:
-                    return came_from[i][1]
+
+        width = self.city.width
+        height = self.city.height
+        start_idx = start[1] * width + start[0]
+        goal_idx = end[1] * width + end[0]
+
+        # Componentes diferentes: não há rota, sem precisar buscar
+        if not self.city.components.connected(start_idx, goal_idx):
             return None
-        
-        def pos_in_list(pos, pos_list):
-            """Verifica se posição está na lista"""
-            for i in range(len(pos_list)):
-                p = pos_list[i]
-                if p[0] == pos[0] and p[1] == pos[1]:
-                    return True
+
+        strategy = self._check_strategy(strategy or self.strategy)
+
+        cached = self.cache.get(start_idx, goal_idx)
+        if cached is not None:
+            self.last_expanded = 0
+            self.last_strategy = "cache"
+            return self._indices_to_path(cached)
+
+        if strategy in UNIFORM_COST_ONLY and not self.city.has_uniform_costs():
+            strategy = "astar"
+        if strategy in PREPROCESSED and not self.get_engine(strategy).is_current():
+            strategy = "astar"
+        self.last_strategy = strategy
+
+        if strategy == "astar":
+            parents = self._search(self.city.costs, width, height, start_idx, goal_idx)
+            if parents is None:
+                return None
+            indices = self._build_path(parents, start_idx, goal_idx)
+        else:
+            engine = self.get_engine(strategy)
+            indices = engine.find_path(start_idx, goal_idx)
+            self.last_expanded = engine.expanded
+            if indices is None:
+                return None
+
+        if strategy not in APPROXIMATE:
+            self.cache.put(start_idx, goal_idx, indices, self._indices_cost(indices))
+        return self._indices_to_path(indices)
+
+    def find_path_at(self, start, end, forecast, departure=0):
+        """
+        Rota de chegada mais cedo de start até end saindo no horário
+        departure, com os custos da previsão forecast (TrafficForecast,
+        ver time_dependent.py) no horário em que cada célula é alcançada.
+        O horário de chegada fica em self.last_arrival.
+
+        Retorna a lista de posições [[x, y], ...] ou None.
+        """
+        self.last_arrival = -1
+        if not self.city.is_walkable(start[0], start[1]):
+            return None
+        if not self.city.is_walkable(end[0], end[1]):
+            return None
+
+        width = self.city.width
+        start_idx = start[1] * width + start[0]
+        goal_idx = end[1] * width + end[0]
+        # Perfis só mudam custos de células transitáveis: os componentes valem
+        if not self.city.components.connected(start_idx, goal_idx):
+            return None
+
+        engine = self.engines.get("time_dependent")
+        if engine is None:
+            engine = TimeDependentSearch(self.city)
+            self.engines["time_dependent"] = engine
+        self.last_strategy = "time_dependent"
+        indices = engine.find_path(start_idx, goal_idx, forecast, departure)
+        self.last_expanded = engine.expanded
+        if indices is None:
+            return None
+        self.last_arrival = engine.arrival
+        return self._indices_to_path(indices)
+
+    def find_paths_batch(self, pairs, costs_only=False):
+        """
+        Calcula muitas rotas de uma vez: um Dijkstra por origem distinta
+        cobre todos os destinos dela. Gera (posição do par, caminho ou
+        custo) agrupado por origem; ver batch.find_paths_batch.
+        """
+        return batch.find_paths_batch(self.city, pairs, costs_only)
+
+    def distance_matrix(self, sources, targets):
+        """Gera, para cada origem, a lista de custos até os destinos"""
+        return batch.distance_matrix(self.city, sources, targets)
+
+    def load_hierarchy(self, map_filename):
+        """
+        Carrega a hierarquia de contração gravada ao lado do mapa (ver
+        contraction.py). Retorna True se ela corresponde ao mapa atual.
+        """
+        filename = hierarchy_filename(map_filename)
+        if not os.path.exists(filename):
             return False
-        
-        def remove_from_list(pos, pos_list):
-            """Remove posição da lista"""
-            new_list = []
-            for i in range(len(pos_list)):
-                p = pos_list[i]
-                if not (p[0] == pos[0] and p[1] == pos[1]):
-                    new_list.append(p)
-            return new_list
-        
-        # Inicialização
-        open_list.append(start)
-        set_score(g_score, start, 0)
-        set_score(f_score, start, self.heuristic(start, end))
-        
-        # Loop principal do A*
-        while len(open_list) > 0:
-            # Encontra nó com menor f_score na open_list
-            current = open_list[0]
-            current_f = get_score(f_score, current)
-            
-            for i in range(1, len(open_list)):
-                pos = open_list[i]
-                f = get_score(f_score, pos)
-                if f < current_f:
-                    current = pos
-                    current_f = f
-            
-            # Se chegou ao destino, reconstrói o caminho
-            if current[0] == end[0] and current[1] == end[1]:
-                path = []
-                temp = current
-                while temp is not None:
-                    path.append(temp)
-                    temp = get_came_from(temp)
-                
-                # Inverte o caminho (estava de trás para frente)
-                reversed_path = []
-                for i in range(len(path) - 1, -1, -1):
-                    reversed_path.append(path[i])
-                
-                return reversed_path
-            
-            # Move current de open para closed
-            open_list = remove_from_list(current, open_list)
-            closed_list.append(current)
-            
-            # Explora vizinhos
-            neighbors = self.get_neighbors(current)
-            for i in range(len(neighbors)):
-                neighbor = neighbors[i]
-                
-                # Ignora se já foi explorado
-                if pos_in_list(neighbor, closed_list):
+        try:
+            return self.get_engine("ch").load(filename)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar hierarquia: {e}")
+            return False
+
+    def load_landmarks(self, map_filename):
+        """
+        Carrega as tabelas de landmarks gravadas ao lado do mapa (ver
+        landmarks.py). Retorna True se elas correspondem ao mapa atual;
+        sem elas, a estratégia "alt" calcula as tabelas na primeira busca.
+        """
+        filename = landmarks_filename(map_filename)
+        if not os.path.exists(filename):
+            return False
+        try:
+            return self.get_engine("alt").table.load(filename)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar landmarks: {e}")
+            return False
+
+    def get_engine(self, strategy):
+        """Motor de busca da estratégia (criado na primeira vez)"""
+        engine = self.engines.get(strategy)
+        if engine is None:
+            engine = ENGINES[strategy](self.city)
+            self.engines[strategy] = engine
+        return engine
+
+    def _check_strategy(self, strategy):
+        if strategy != "astar" and strategy not in ENGINES:
+            raise ValueError(f"Estratégia de busca desconhecida: {strategy}")
+        return strategy
+
+    def path_cost(self, path):
+        """Custo total de um caminho [[x, y], ...] (sem contar a partida)"""
+        cost = 0
+        for i in range(1, len(path)):
+            cost += self.city.get_cost(path[i][0], path[i][1])
+        return cost
+
+    def _search(self, costs, width, height, start_idx, goal_idx):
+        """
+        Núcleo do A*. costs é o custo de entrar em cada célula (0 =
+        bloqueada). Retorna o array de pais se o destino foi alcançado,
+        senão None.
+        """
+        size = width * height
+        min_cost = self.city.min_cost()
+        goal_x = goal_idx % width
+        goal_y = goal_idx // width
+        last_x = width - 1
+        last_y = height - 1
+
+        g_score = array('l', [-1]) * size
+        parents = array('l', [-1]) * size
+        # Ordem de entrada na lista aberta (0 = nunca entrou)
+        order = array('l', [0]) * size
+        closed = bytearray(size)
+
+        heap = []
+        push = heapq.heappush
+        pop = heapq.heappop
+        expanded = 0
+
+        sx = start_idx % width
+        sy = start_idx // width
+        counter = 1
+        order[start_idx] = counter
+        g_score[start_idx] = 0
+        heap.append(((abs(sx - goal_x) + abs(sy - goal_y)) * min_cost, counter, start_idx))
+
+        while heap:
+            f, seq, current = pop(heap)
+
+            # Remoção preguiçosa: entradas antigas de nós já fechados
+            if closed[current]:
+                continue
+
+            if current == goal_idx:
+                self.last_expanded = expanded
+                return parents
+
+            closed[current] = 1
+            expanded += 1
+            y, x = divmod(current, width)
+            current_g = g_score[current]
+
+            # Vizinhos na ordem cima, direita, baixo, esquerda
+            neighbors = []
+            if y > 0:
+                neighbors.append(current - width)
+            if x < last_x:
+                neighbors.append(current + 1)
+            if y < last_y:
+                neighbors.append(current + width)
+            if x > 0:
+                neighbors.append(current - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or closed[n]:
                     continue
-                
-                # Calcula custo tentativo
-                # Adiciona penalidade para engarrafamentos
-                cost = 1
-                if self.city.get_cell(neighbor[0], neighbor[1]) == self.city.TRAFFIC:
-                    cost = 10  # Penalidade alta para tráfego
-                
-                tentative_g = get_score(g_score, current) + cost
-                
-                # Se não está na open_list, adiciona
-                if not pos_in_list(neighbor, open_list):
-                    open_list.append(neighbor)
-                elif tentative_g >= get_score(g_score, neighbor):
-                    # Se o caminho não é melhor, ignora
+
+                tentative_g = current_g + cost
+                if order[n] == 0:
+                    counter += 1
+                    order[n] = counter
+                elif tentative_g >= g_score[n]:
+                    # Já está na lista aberta com custo melhor ou igual
                     continue
-                
-                # Este é o melhor caminho até agora
-                set_came_from(neighbor, current)
-                set_score(g_score, neighbor, tentative_g)
-                set_score(f_score, neighbor, tentative_g + self.heuristic(neighbor, end))
-        
+
+                parents[n] = current
+                g_score[n] = tentative_g
+                ny, nx = divmod(n, width)
+                h = (abs(nx - goal_x) + abs(ny - goal_y)) * min_cost
+                push(heap, (tentative_g + h, order[n], n))
+
         # Não encontrou caminho
+        self.last_expanded = expanded
         return None
 
+    def _build_path(self, parents, start_idx, goal_idx):
+        """Reconstrói o caminho (tupla de índices) a partir do array de pais"""
+        path = []
+        current = goal_idx
+        while current != -1:
+            path.append(current)
+            if current == start_idx:
+                break
+            current = parents[current]
+        path.reverse()
+        return tuple(path)
+
+    def _indices_cost(self, indices):
+        """Custo total de um caminho em índices"""
+        costs = self.city.costs
+        return sum(costs[i] for i in indices[1:])
+
+    def _indices_to_path(self, indices):
+        """Converte índices y * width + x para o formato [[x, y], ...]"""
+        width = self.city.width
+        return [[i % width, i // width] for i in indices]
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Classe RouteCache - Cache LRU de rotas com invalidação seletiva
+
+Cada rota guardada lembra a versão do mapa em que foi calculada e as
+células por onde passa. Antes de responder, o cache lê no histórico da
+cidade as células alteradas desde então e descarta só as rotas afetadas:
+
+  - célula que ficou mais cara ou bloqueada: afeta as rotas que passam nela;
+  - célula que ficou mais barata ou transitável: afeta as rotas que ela
+    poderia encurtar, ou seja, quando (|A-c| + |c-B|) * menor custo
+    (Manhattan) <= custo da rota.
+"""
+
+from collections import OrderedDict
+
+
+class RouteCache:
+
+    def __init__(self, city, capacity=256):
+        self.city = city
+        self.capacity = capacity
+        self.version = city.version
+
+        # (start_index, end_index) -> (índices do caminho, custo)
+        self.routes = OrderedDict()
+        # índice de célula -> chaves das rotas que passam por ela
+        self.routes_by_cell = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def stats(self):
+        """Contadores do cache"""
+        return {
+            "size": len(self.routes),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def get(self, start_index, end_index):
+        """Retorna os índices do caminho guardado ou None"""
+        self.sync()
+        key = (start_index, end_index)
+        entry = self.routes.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.routes.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, start_index, end_index, path_indices, cost):
+        """Guarda uma rota (tupla de índices) e seu custo"""
+        if self.capacity <= 0:
+            return
+
+        self.sync()
+        key = (start_index, end_index)
+        if key in self.routes:
+            self._remove(key)
+
+        self.routes[key] = (path_indices, cost)
+        for cell in path_indices:
+            keys = self.routes_by_cell.get(cell)
+            if keys is None:
+                self.routes_by_cell[cell] = {key}
+            else:
+                keys.add(key)
+
+        while len(self.routes) > self.capacity:
+            oldest = next(iter(self.routes))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        """Descarta todas as rotas"""
+        self.invalidations += len(self.routes)
+        self.routes.clear()
+        self.routes_by_cell.clear()
+
+    def sync(self):
+        """Aplica as alterações feitas no mapa desde a última consulta"""
+        city = self.city
+        if city.version == self.version:
+            return
+
+        changes = city.changes_since(self.version)
+        self.version = city.version
+        if changes is None:
+            self.clear()
+            return
+
+        min_cost = city.min_cost()
+        for index, old_type, new_type in changes:
+            if not self.routes:
+                break
+            old_cost = city.cell_cost(old_type)
+            new_cost = city.cell_cost(new_type)
+            if new_cost == old_cost:
+                continue
+            # Custo 0 = bloqueada, ou seja, mais cara que qualquer custo
+            if new_cost != 0 and (old_cost == 0 or new_cost < old_cost):
+                self._cell_cheaper(index, min_cost)
+            else:
+                self._cell_costlier(index)
+
+    def _cell_costlier(self, index):
+        """Descarta as rotas que passam pela célula"""
+        keys = self.routes_by_cell.get(index)
+        if keys:
+            for key in list(keys):
+                self._remove(key)
+                self.invalidations += 1
+
+    def _cell_cheaper(self, index, min_cost):
+        """Descarta as rotas que a célula poderia encurtar"""
+        width = self.city.width
+        cy, cx = divmod(index, width)
+        stale = []
+        for key, entry in self.routes.items():
+            sy, sx = divmod(key[0], width)
+            ey, ex = divmod(key[1], width)
+            bound = abs(sx - cx) + abs(sy - cy) + abs(ex - cx) + abs(ey - cy)
+            if bound * min_cost <= entry[1]:
+                stale.append(key)
+
+        for key in stale:
+            self._remove(key)
+            self.invalidations += 1
+
+    def _remove(self, key):
+        path_indices, cost = self.routes.pop(key)
+        for cell in path_indices:
+            keys = self.routes_by_cell.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.routes_by_cell[cell]
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Classe RouteWorker - Cálculo de rotas num processo separado
+
+Uma busca longa não pode travar a janela, então as rotas são calculadas
+num processo trabalhador que guarda a sua própria cópia da cidade. A
+cópia é mantida em dia pelo histórico de alterações (city.changes_since):
+cada pedido leva as células alteradas desde o pedido anterior, ou o mapa
+inteiro depois de uma alteração em bloco, e os motores de busca do
+processo continuam aproveitando o estado entre as consultas.
+
+Só um pedido fica em andamento. Um pedido novo cancela o anterior: se o
+processo ainda está calculando, ele é encerrado e outro é iniciado com
+o mapa atual. Quem usa a classe consulta poll() a cada quadro.
+"""
+
+import multiprocessing
+import signal
+import time
+
+from city import City
+from pathfinding import PathFinder
+
+# Espera máxima (segundos) para o processo sair ao ser fechado
+STOP_TIMEOUT = 1.0
+
+
+def create_pathfinder(city, strategy=None, map_filename=None, default="astar"):
+    """
+    PathFinder da cidade. A hierarquia de contração e os landmarks
+    gravados ao lado do mapa são carregados quando existem; sem
+    estratégia explícita (strategy=None), a padrão passa a ser "ch" ou
+    "alt" conforme o que foi carregado, e default se não há nenhum.
+    Uma estratégia explícita sempre vale.
+    """
+    pathfinder = PathFinder(city, strategy=strategy or default)
+    if map_filename:
+        # Hierarquia pré-processada (python contraction.py mapa)
+        if pathfinder.load_hierarchy(map_filename):
+            if strategy is None:
+                pathfinder.strategy = "ch"
+        # Landmarks pré-calculados (python landmarks.py mapa)
+        elif pathfinder.load_landmarks(map_filename):
+            if strategy is None:
+                pathfinder.strategy = "alt"
+    return pathfinder
+
+
+def city_snapshot(city):
+    """Mapa inteiro para outro processo: (largura, altura, nome, células, tabela de custos)"""
+    return (city.width, city.height, city.name, bytes(city.cells), bytes(city.cost_table))
+
+
+def load_city_snapshot(width, height, name, cells, cost_table):
+    """Reconstrói a cidade a partir de city_snapshot"""
+    city = City(width, height, name, cells=bytearray(cells))
+    for cell_type in range(256):
+        if city.cell_cost(cell_type) != cost_table[cell_type]:
+            city.set_cell_cost(cell_type, cost_table[cell_type])
+    return city
+
+
+def _serve(conn, snapshot, strategy, default, map_filename):
+    """
+    Laço do processo trabalhador. Cada pedido é (número, partida,
+    chegada, atualização); a resposta é (número, caminho, custo,
+    estratégia usada, nós expandidos, segundos). None encerra o processo.
+    """
+    # Com fork, o processo herda o tratador de SIGTERM do SDL, que só gera
+    # um evento de saída; terminate() precisa encerrar o processo de fato
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    city = load_city_snapshot(*snapshot)
+    pathfinder = create_pathfinder(city, strategy, map_filename, default)
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        job, start, end, update = request
+        if update is not None:
+            kind, data = update
+            if kind == "snapshot":
+                city = load_city_snapshot(*data)
+                pathfinder = create_pathfinder(city, strategy, map_filename, default)
+            else:
+                for index, cell_type in data:
+                    y, x = divmod(index, city.width)
+                    city.set_cell(x, y, cell_type)
+
+        started = time.perf_counter()
+        path = pathfinder.find_path(start, end)
+        seconds = time.perf_counter() - started
+        cost = pathfinder.path_cost(path) if path else None
+        conn.send((job, path, cost, pathfinder.last_strategy, pathfinder.last_expanded, seconds))
+
+    conn.close()
+
+
+class RouteWorker:
+
+    def __init__(self, city, strategy=None, map_filename=None, default="astar"):
+        self.city = city
+        # Estratégia explícita, ou None para escolher pelos arquivos do
+        # mapa (ver create_pathfinder)
+        self.strategy = strategy
+        self.default = default
+        # Arquivo do mapa, para o processo carregar a hierarquia ou os
+        # landmarks gravados ao lado dele
+        self.map_filename = map_filename
+
+        self.process = None
+        self.conn = None
+        # Versão da cidade que a cópia do processo já tem
+        self.version = None
+        # Número do último pedido e do pedido em andamento (None = nenhum)
+        self.job = 0
+        self.pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def busy(self):
+        """Indica se há um pedido em andamento"""
+        return self.pending is not None
+
+    def submit(self, start, end):
+        """
+        Pede a rota de start até end ([x, y]), cancelando o pedido
+        anterior. Retorna o número do pedido.
+        """
+        self.cancel()
+        if self.process is None:
+            self._start()
+
+        self.job += 1
+        self.conn.send((self.job, list(start), list(end), self._update()))
+        self.pending = self.job
+        return self.job
+
+    def cancel(self):
+        """Descarta o pedido em andamento, encerrando o processo se ele ainda calcula"""
+        if self.pending is None:
+            return
+        self.pending = None
+        if self.conn.poll():
+            # Já terminou: só descarta a resposta
+            self.conn.recv()
+        else:
+            self._stop(terminate=True)
+
+    def poll(self):
+        """
+        Resposta do pedido em andamento, se já chegou: (número, caminho,
+        custo, estratégia usada, nós expandidos, segundos). Senão None.
+        """
+        if self.pending is None or not self.conn.poll():
+            return None
+        try:
+            result = self.conn.recv()
+        except EOFError:
+            # Processo morreu: o próximo pedido inicia outro
+            print("Erro ao calcular rota: processo de rotas encerrado")
+            result = (self.pending, None, None, None, 0, 0.0)
+            self._stop(terminate=True)
+        self.pending = None
+        return result
+
+    def close(self):
+        """Encerra o processo trabalhador"""
+        self.pending = None
+        self._stop()
+
+    def _start(self):
+        parent, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(child, city_snapshot(self.city), self.strategy, self.default, self.map_filename),
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.conn = parent
+        self.version = self.city.version
+
+    def _stop(self, terminate=False):
+        if self.process is None:
+            return
+        if terminate:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def _update(self):
+        """
+        Alterações desde o último pedido: None, ("changes", [(índice,
+        tipo), ...]) ou ("snapshot", mapa inteiro) após alteração em bloco.
+        """
+        city = self.city
+        if self.version == city.version:
+            return None
+        changes = city.changes_since(self.version)
+        self.version = city.version
+        if changes is None:
+            return ("snapshot", city_snapshot(city))
+
+        # Só o tipo final de cada célula
+        latest = {}
+        for index, old_type, new_type in changes:
+            latest[index] = new_type
+        return ("changes", list(latest.items()))
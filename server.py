@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor de rotas sem interface (HTTP/JSON)
+
+Carrega o mapa uma vez e responde pedidos de rota por HTTP/1.1 numa
+porta local ou num socket Unix, com conexões persistentes (keep-alive).
+As buscas rodam num pool de processos: cada processo guarda a sua cópia
+da cidade e um PathFinder já preparado (hierarquia ou landmarks gravados
+ao lado do mapa, cache de rotas), e o laço asyncio só lê os pedidos,
+descarta as rotas impossíveis pelo índice de componentes e escreve as
+respostas. Não usa pygame.
+
+Rotas:
+    GET  /health   {"status": "ok", "map": nome}
+    GET  /stats    pedidos e percentis de latência (ms) por rota
+    POST /route    {"start": [x, y], "end": [x, y], "strategy": "astar"}
+    POST /routes   {"pairs": [[[x, y], [x, y]], ...], "costs_only": false}
+
+Uso:
+    python server.py maps/cidade_grande.json [--port 8080] [--unix caminho] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from city import City
+from pathfinding import ENGINES
+from route_worker import city_snapshot, create_pathfinder, load_city_snapshot
+
+HOST = "127.0.0.1"
+PORT = 8080
+
+# Segundos que uma conexão parada fica aberta esperando outro pedido
+KEEP_ALIVE_TIMEOUT = 15
+# Maior corpo de pedido aceito (bytes) e maior número de cabeçalhos
+MAX_BODY = 16 * 1024 * 1024
+MAX_HEADERS = 100
+# Pares de /routes por tarefa do pool (origens inteiras)
+CHUNK_SIZE = 256
+# Latências guardadas por rota para os percentis
+LATENCY_WINDOW = 10000
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error"
+}
+
+
+class HTTPError(Exception):
+    """Pedido que não pode ser atendido: responde com o status e fecha a conexão"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# PathFinder do processo do pool (um por processo, criado em _init_worker)
+_pathfinder = None
+
+
+def _init_worker(snapshot, strategy, map_filename):
+    global _pathfinder
+    _pathfinder = create_pathfinder(load_city_snapshot(*snapshot), strategy, map_filename)
+
+
+def check_strategy(strategy):
+    """Recusa estratégias que o PathFinder não conhece (None = padrão do servidor)"""
+    if strategy is None:
+        return None
+    if not isinstance(strategy, str):
+        raise ValueError("Estratégia deve ser um texto")
+    if strategy != "astar" and strategy not in ENGINES:
+        raise ValueError(f"Estratégia de busca desconhecida: {strategy}")
+    return strategy
+
+
+def _ready():
+    """Tarefa vazia: faz o pool iniciar os processos antes do primeiro pedido"""
+    return os.getpid()
+
+
+def _find_route(start, end, strategy):
+    """Retorna (caminho, custo, estratégia usada, nós expandidos)"""
+    path = _pathfinder.find_path(start, end, strategy)
+    cost = _pathfinder.path_cost(path) if path else None
+    return path, cost, _pathfinder.last_strategy, _pathfinder.last_expanded
+
+
+def _find_routes(pairs, costs_only):
+    """Caminhos (ou custos) dos pares, na ordem de entrada"""
+    results = [None] * len(pairs)
+    for position, value in _pathfinder.find_paths_batch(pairs, costs_only):
+        results[position] = value
+    return results
+
+
+def percentile(ordered, fraction):
+    """Percentil (posto mais próximo) de uma lista ordenada"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class LatencyStats:
+    """Latências recentes de cada rota do servidor"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def add(self, route, seconds):
+        samples = self.samples.get(route)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self.samples[route] = samples
+        samples.append(seconds)
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    def summary(self):
+        """{rota: {requests, p50_ms, p90_ms, p99_ms, max_ms}} das últimas latências"""
+        result = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[route] = {
+                "requests": self.counts[route],
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+                "p90_ms": round(percentile(ordered, 0.90) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3)
+            }
+        return result
+
+
+def parse_position(value, name):
+    """Valida uma posição [x, y] do corpo JSON"""
+    if not isinstance(value, (list, tuple)) or len(value) != 2 or \
+       not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+        raise ValueError(f"Posição inválida em '{name}': esperado [x, y]")
+    return [value[0], value[1]]
+
+
+async def read_request(reader):
+    """
+    Lê um pedido HTTP/1.x. Retorna (método, caminho, versão, cabeçalhos,
+    corpo) ou None quando o cliente fechou a conexão.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise HTTPError(400, "Linha de pedido inválida")
+    method, target, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "Cabeçalhos demais")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HTTPError(400, "Transfer-Encoding não suportado, use Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Content-Length inválido")
+    if length < 0:
+        raise HTTPError(400, "Content-Length inválido")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Corpo do pedido grande demais")
+    body = await reader.readexactly(length) if length else b""
+    return method, target.split("?", 1)[0], version, headers, body
+
+
+def wants_keep_alive(version, headers):
+    """HTTP/1.1 mantém a conexão salvo Connection: close; HTTP/1.0 só com keep-alive"""
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def format_response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+    if keep_alive:
+        head += f"Keep-Alive: timeout={KEEP_ALIVE_TIMEOUT}\r\n"
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+class RouteServer:
+
+    def __init__(self, city, map_filename=None, workers=None, strategy=None):
+        # Sem estratégia, vale a dos arquivos do mapa ou "astar" (ver create_pathfinder)
+        check_strategy(strategy)
+        self.city = city
+        self.map_filename = map_filename
+        self.workers = workers or os.cpu_count() or 1
+        # Índice de componentes pronto antes do primeiro pedido
+        city.components
+
+        self.pool = ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(city_snapshot(city), strategy, map_filename)
+        )
+        self.stats = LatencyStats()
+        self.started = time.time()
+        self.server = None
+        self.handlers = {
+            ("GET", "/health"): self.health,
+            ("GET", "/stats"): self.get_stats,
+            ("POST", "/route"): self.route,
+            ("POST", "/routes"): self.routes
+        }
+
+    async def start(self, host=HOST, port=PORT, unix_path=None):
+        """Inicia os processos do pool e abre a porta (ou o socket Unix)"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ready)
+                               for _ in range(self.workers)))
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def serve(self, host=HOST, port=PORT, unix_path=None):
+        """Atende pedidos até ser interrompido"""
+        server = await self.start(host, port, unix_path)
+        address = unix_path or "http://%s:%d" % server.sockets[0].getsockname()[:2]
+        print(f"Servidor de rotas em {address} ({self.city.name}, {self.workers} processos)")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Encerra os processos do pool"""
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        """Atende os pedidos de uma conexão até o cliente fechar ou pedir close"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HTTPError as e:
+                    writer.write(format_response(e.status, {"error": str(e)}, False))
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    # ValueError: linha maior que o limite do StreamReader
+                    break
+                if request is None:
+                    break
+
+                method, path, version, headers, body = request
+                started = time.perf_counter()
+                status, payload = await self.dispatch(method, path, body)
+                keep_alive = wants_keep_alive(version, headers)
+                writer.write(format_response(status, payload, keep_alive))
+                await writer.drain()
+                route = path if (method, path) in self.handlers else "outras"
+                self.stats.add(route, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # Cliente caiu, ou o servidor está encerrando com a conexão parada
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        """Chama o tratador da rota. Retorna (status, objeto JSON)"""
+        handler = self.handlers.get((method, path))
+        if handler is None:
+            if any(path == known for _, known in self.handlers):
+                return 405, {"error": f"Método {method} não permitido em {path}"}
+            return 404, {"error": f"Rota não encontrada: {path}"}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError("Corpo do pedido deve ser um objeto JSON")
+            return 200, await handler(data)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"Erro interno: {e}"}
+
+    async def health(self, data):
+        return {"status": "ok", "map": self.city.name}
+
+    async def get_stats(self, data):
+        return {
+            "map": self.city.name,
+            "workers": self.workers,
+            "uptime_s": round(time.time() - self.started, 1),
+            "routes": self.stats.summary()
+        }
+
+    async def route(self, data):
+        start = parse_position(data.get("start"), "start")
+        end = parse_position(data.get("end"), "end")
+        # Antes de is_routable: estratégia inválida é sempre 400
+        strategy = check_strategy(data.get("strategy"))
+
+        if not self.is_routable(start, end):
+            return {"path": None, "cost": None, "strategy": None, "expanded": 0}
+        loop = asyncio.get_running_loop()
+        path, cost, used, expanded = await loop.run_in_executor(
+            self.pool, _find_route, start, end, strategy)
+        return {"path": path, "cost": cost, "strategy": used, "expanded": expanded}
+
+    async def routes(self, data):
+        pairs = data.get("pairs")
+        if not isinstance(pairs, list):
+            raise ValueError("'pairs' deve ser uma lista de [[x, y], [x, y]]")
+        parsed = []
+        for pair in pairs:
+            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                raise ValueError("Cada par deve ser [[x, y], [x, y]]")
+            parsed.append((parse_position(pair[0], "pairs"), parse_position(pair[1], "pairs")))
+        costs_only = bool(data.get("costs_only", False))
+
+        # Rotas impossíveis ficam None; as demais vão em blocos de origens
+        # inteiras, um Dijkstra por origem (como em ParallelRouter)
+        groups = {}
+        for position, (start, end) in enumerate(parsed):
+            if self.is_routable(start, end):
+                groups.setdefault(tuple(start), []).append(position)
+        chunks = []
+        chunk = []
+        for positions in groups.values():
+            chunk.extend(positions)
+            if len(chunk) >= CHUNK_SIZE:
+                chunks.append(chunk)
+                chunk = []
+        if chunk:
+            chunks.append(chunk)
+
+        loop = asyncio.get_running_loop()
+        solved = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, _find_routes, [parsed[i] for i in chunk], costs_only)
+            for chunk in chunks))
+        results = [None] * len(parsed)
+        for chunk, values in zip(chunks, solved):
+            for position, value in zip(chunk, values):
+                results[position] = value
+        return {"results": results}
+
+    def is_routable(self, start, end):
+        """Partida e chegada transitáveis e no mesmo componente"""
+        city = self.city
+        if not city.is_walkable(start[0], start[1]) or not city.is_walkable(end[0], end[1]):
+            return False
+        return city.components.connected(start[1] * city.width + start[0],
+                                         end[1] * city.width + end[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de rotas HTTP/JSON sem interface")
+    parser.add_argument("map", help="arquivo do mapa (.json ou .wmap)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", default=None, help="socket Unix no lugar da porta TCP")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--strategy", default=None,
+                        help="estratégia de busca padrão (sem ela: ch ou alt se o mapa tiver os arquivos, senão astar)")
+    args = parser.parse_args()
+    try:
+        check_strategy(args.strategy)
+    except ValueError as e:
+        parser.error(str(e))
+
+    city = City.load_from_file(args.map)
+    if city is None:
+        return
+
+    server = RouteServer(city, args.map, args.workers, args.strategy)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        for route, summary in server.stats.summary().items():
+            print(f"{route}: {summary['requests']} pedidos, p50 {summary['p50_ms']} ms, "
+                  f"p90 {summary['p90_ms']} ms, p99 {summary['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
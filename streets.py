@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+Classe StreetGraph - Grafo de ruas com corredores comprimidos
+
+Ruas de uma célula de largura formam longos corredores em que cada
+célula só tem dois vizinhos transitáveis. O grafo guarda como nós apenas
+as células com outro número de vizinhos (cruzamentos, becos sem saída e
+células isoladas); cada corredor entre dois nós vira uma aresta com a
+lista de células e o custo em cada sentido (o custo de um passo é o da
+célula de destino, então ida e volta podem custar diferente).
+
+Uma célula qualquer é ligada ao grafo pelas pontas do seu corredor
+(exits/entries), o que permite partir e chegar no meio de uma rua.
+
+O grafo acompanha as edições da cidade pelo histórico de alterações:
+mudança só de custo (tráfego) recalcula o custo dos corredores que
+passam pela célula; mudança de transitável para bloqueada (ou o
+contrário) refaz só os corredores em volta da célula.
+
+Classe StreetSearch - A* sobre o grafo de ruas (estratégia "streets")
+"""
+
+import heapq
+from array import array
+
+
+class StreetGraph:
+
+    def __init__(self, city):
+        self.city = city
+        self.build()
+
+    def build(self):
+        """Monta nós e corredores a partir dos custos atuais da cidade"""
+        city = self.city
+        costs = city.costs
+        size = city.width * city.height
+        self.version = city.version
+
+        # célula -> id do nó, e id -> célula (None = id livre)
+        self.node_id = {}
+        self.node_cells = []
+        # Corredores: tuplas de células de um nó até outro (inclusive),
+        # com o custo de percorrê-los nos dois sentidos (None = id livre)
+        self.corridors = []
+        self.forward_costs = []
+        self.backward_costs = []
+        # Corredores que tocam cada nó
+        self.incident = []
+        # Corredor e posição de cada célula interna de corredor (-1 = nenhum)
+        self.corridor_of = array('l', [-1]) * size
+        self.position_of = array('l', [0]) * size
+        self._free_nodes = []
+        self._free_corridors = []
+
+        for index in range(size):
+            if costs[index] and len(self._neighbors(index)) != 2:
+                self._add_node(index)
+
+        for cell in list(self.node_cells):
+            self._trace_from(cell)
+        self._cover_rings(range(size))
+
+    def node_count(self):
+        """Número de nós (células que não são internas de corredor)"""
+        return len(self.node_id)
+
+    def sync(self):
+        """Aplica as alterações feitas no mapa desde a última consulta"""
+        city = self.city
+        if self.version == city.version:
+            return
+
+        changes = city.changes_since(self.version)
+        self.version = city.version
+        if changes is None:
+            self.build()
+            return
+
+        flipped = set()
+        repriced = set()
+        for index, old_type, new_type in changes:
+            old_cost = city.cell_cost(old_type)
+            new_cost = city.cell_cost(new_type)
+            if (old_cost == 0) != (new_cost == 0):
+                flipped.add(index)
+            elif old_cost != new_cost:
+                repriced.add(index)
+
+        if flipped:
+            self._rebuild_around(flipped)
+
+        corridors = set()
+        for index in repriced:
+            corridor = self.corridor_of[index]
+            if corridor != -1:
+                corridors.add(corridor)
+            elif index in self.node_id:
+                corridors.update(self.incident[self.node_id[index]])
+        for corridor in corridors:
+            if self.corridors[corridor] is not None:
+                self._set_costs(corridor)
+
+    def edges(self):
+        """
+        Gera (nó de origem, nó de destino, custo, corredor) para cada
+        sentido de cada corredor, sem laços
+        """
+        node_id = self.node_id
+        for corridor, cells in enumerate(self.corridors):
+            if cells is None:
+                continue
+            u = node_id[cells[0]]
+            v = node_id[cells[-1]]
+            if u == v:
+                continue
+            yield u, v, self.forward_costs[corridor], corridor
+            yield v, u, self.backward_costs[corridor], corridor
+
+    def exits(self, index):
+        """
+        Nós alcançáveis a partir da célula sem sair do corredor:
+        [(nó, custo, células da célula até o nó)]
+        """
+        node = self.node_id.get(index)
+        if node is not None:
+            return [(node, 0, (index,))]
+
+        costs = self.city.costs
+        cells = self.corridors[self.corridor_of[index]]
+        position = self.position_of[index]
+        backward = cells[position::-1]
+        forward = cells[position:]
+        return [
+            (self.node_id[cells[0]], sum(costs[c] for c in backward[1:]), backward),
+            (self.node_id[cells[-1]], sum(costs[c] for c in forward[1:]), forward),
+        ]
+
+    def entries(self, index):
+        """
+        Nós de onde se chega à célula sem sair do corredor:
+        [(nó, custo, células do nó até a célula)]
+        """
+        node = self.node_id.get(index)
+        if node is not None:
+            return [(node, 0, (index,))]
+
+        costs = self.city.costs
+        cells = self.corridors[self.corridor_of[index]]
+        position = self.position_of[index]
+        forward = cells[:position + 1]
+        backward = cells[:position - 1:-1]
+        return [
+            (self.node_id[cells[0]], sum(costs[c] for c in forward[1:]), forward),
+            (self.node_id[cells[-1]], sum(costs[c] for c in backward[1:]), backward),
+        ]
+
+    def between(self, index1, index2):
+        """
+        Caminho direto entre duas células internas do mesmo corredor:
+        (células, custo) ou None se não estiverem no mesmo corredor
+        """
+        corridor = self.corridor_of[index1]
+        if corridor == -1 or corridor != self.corridor_of[index2]:
+            return None
+        cells = self.corridors[corridor]
+        a = self.position_of[index1]
+        b = self.position_of[index2]
+        path = cells[a:b + 1] if a <= b else cells[b:a + 1][::-1]
+        costs = self.city.costs
+        return path, sum(costs[c] for c in path[1:])
+
+    def oriented(self, corridor, from_node):
+        """Células do corredor começando pelo nó from_node"""
+        cells = self.corridors[corridor]
+        if self.node_id[cells[0]] == from_node:
+            return cells
+        return cells[::-1]
+
+    def _rebuild_around(self, flipped):
+        """Refaz nós e corredores em volta das células que mudaram"""
+        costs = self.city.costs
+        node_id = self.node_id
+        corridor_of = self.corridor_of
+
+        # As células alteradas e suas vizinhas mudam de grau
+        dirty = set(flipped)
+        for index in flipped:
+            dirty.update(self._neighbors(index, walkable_only=False))
+
+        removed = set()
+        for index in dirty:
+            if corridor_of[index] != -1:
+                removed.add(corridor_of[index])
+            if index in node_id:
+                removed.update(self.incident[node_id[index]])
+
+        ends = set()
+        loose = set(dirty)
+        for corridor in removed:
+            cells = self.corridors[corridor]
+            for cell in cells[1:-1]:
+                corridor_of[cell] = -1
+                loose.add(cell)
+            for cell in (cells[0], cells[-1]):
+                self.incident[node_id[cell]].discard(corridor)
+                ends.add(cell)
+            self.corridors[corridor] = None
+            self.forward_costs[corridor] = None
+            self.backward_costs[corridor] = None
+            self._free_corridors.append(corridor)
+
+        for index in dirty:
+            is_node = costs[index] and len(self._neighbors(index)) != 2
+            if index in node_id and not is_node:
+                self._remove_node(index)
+            elif is_node and index not in node_id:
+                self._add_node(index)
+
+        for cell in ends | dirty:
+            if cell in node_id:
+                self._trace_from(cell)
+        self._cover_rings(loose)
+
+    def _cover_rings(self, cells):
+        """Anéis sem cruzamento: uma célula qualquer do anel vira nó"""
+        costs = self.city.costs
+        corridor_of = self.corridor_of
+        node_id = self.node_id
+        for index in cells:
+            if costs[index] and corridor_of[index] == -1 and index not in node_id:
+                self._add_node(index)
+                self._trace_from(index)
+
+    def _add_node(self, index):
+        if self._free_nodes:
+            node = self._free_nodes.pop()
+            self.node_cells[node] = index
+            self.incident[node] = set()
+        else:
+            node = len(self.node_cells)
+            self.node_cells.append(index)
+            self.incident.append(set())
+        self.node_id[index] = node
+
+    def _remove_node(self, index):
+        node = self.node_id.pop(index)
+        self.node_cells[node] = None
+        self.incident[node] = None
+        self._free_nodes.append(node)
+
+    def _add_corridor(self, cells):
+        if self._free_corridors:
+            corridor = self._free_corridors.pop()
+            self.corridors[corridor] = cells
+        else:
+            corridor = len(self.corridors)
+            self.corridors.append(cells)
+            self.forward_costs.append(None)
+            self.backward_costs.append(None)
+        self._set_costs(corridor)
+        self.incident[self.node_id[cells[0]]].add(corridor)
+        self.incident[self.node_id[cells[-1]]].add(corridor)
+        return corridor
+
+    def _set_costs(self, corridor):
+        costs = self.city.costs
+        cells = self.corridors[corridor]
+        self.forward_costs[corridor] = sum(costs[c] for c in cells[1:])
+        self.backward_costs[corridor] = sum(costs[c] for c in cells[:-1])
+
+    def _neighbors(self, index, walkable_only=True):
+        """Vizinhos (transitáveis) na ordem cima, direita, baixo, esquerda"""
+        city = self.city
+        costs = city.costs
+        width = city.width
+        y, x = divmod(index, width)
+        neighbors = []
+        for n, inside in ((index - width, y > 0), (index + 1, x < width - 1),
+                          (index + width, y < city.height - 1), (index - 1, x > 0)):
+            if inside and (costs[n] or not walkable_only):
+                neighbors.append(n)
+        return neighbors
+
+    def _trace_from(self, start):
+        """Percorre os corredores ainda não mapeados que saem do nó start"""
+        node_id = self.node_id
+        corridor_of = self.corridor_of
+        position_of = self.position_of
+
+        for first in self._neighbors(start):
+            if first in node_id:
+                # Dois nós vizinhos: corredor sem células internas
+                if not self._adjacent_corridor(start, first):
+                    self._add_corridor((start, first))
+                continue
+            if corridor_of[first] != -1:
+                continue
+
+            cells = [start]
+            previous = start
+            current = first
+            while current not in node_id:
+                cells.append(current)
+                a, b = self._neighbors(current)
+                previous, current = current, (b if a == previous else a)
+            cells.append(current)
+
+            corridor = self._add_corridor(tuple(cells))
+            for position in range(1, len(cells) - 1):
+                corridor_of[cells[position]] = corridor
+                position_of[cells[position]] = position
+
+    def _adjacent_corridor(self, cell1, cell2):
+        """Verifica se já existe o corredor direto entre dois nós vizinhos"""
+        for corridor in self.incident[self.node_id[cell1]]:
+            cells = self.corridors[corridor]
+            if len(cells) == 2 and cell2 in cells:
+                return True
+        return False
+
+
+class StreetSearch:
+    """
+    A* sobre o grafo de ruas: os nós são os cruzamentos e cada corredor é
+    percorrido de uma vez. A partida e o destino são ligados às pontas
+    dos seus corredores. Retorna rotas de custo ótimo.
+    """
+
+    def __init__(self, city):
+        self.city = city
+        self.graph = None
+
+        # Nós do grafo fechados na última busca
+        self.expanded = 0
+
+    def find_path(self, start_idx, goal_idx):
+        """Retorna a tupla de índices do caminho ou None"""
+        if self.graph is None:
+            self.graph = StreetGraph(self.city)
+        else:
+            self.graph.sync()
+        self.expanded = 0
+        if start_idx == goal_idx:
+            return (start_idx,)
+
+        graph = self.graph
+        width = self.city.width
+        min_cost = self.city.min_cost()
+        goal_y, goal_x = divmod(goal_idx, width)
+
+        # O nó -1 representa o destino
+        goal_edges = {}
+        goal_paths = {}
+        for node, cost, cells in graph.entries(goal_idx):
+            if node not in goal_edges or cost < goal_edges[node]:
+                goal_edges[node] = cost
+                goal_paths[node] = cells
+
+        # parents: nó -> (nó anterior, corredor), ou (None, células) no
+        # trecho inicial; para o destino, o trecho final vem de goal_paths
+        g_score = {}
+        parents = {}
+        for node, cost, cells in graph.exits(start_idx):
+            if node not in g_score or cost < g_score[node]:
+                g_score[node] = cost
+                parents[node] = (None, cells)
+        direct = graph.between(start_idx, goal_idx)
+        if direct is not None:
+            g_score[-1] = direct[1]
+            parents[-1] = (None, direct[0])
+        node_id = graph.node_id
+        node_cells = graph.node_cells
+
+        # Sementes com f = g + h, como no laço principal: sem h, um nó da
+        # partida sairia do heap pelo corredor direto antes de um caminho
+        # mais barato por outros cruzamentos
+        heap = []
+        for node, cost in g_score.items():
+            if node == -1:
+                h = 0
+            else:
+                y, x = divmod(node_cells[node], width)
+                h = (abs(x - goal_x) + abs(y - goal_y)) * min_cost
+            heap.append((cost + h, h, node))
+        heapq.heapify(heap)
+        closed = set()
+        while heap:
+            f, h, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            if node == -1:
+                return self._build_path(parents, goal_paths)
+            closed.add(node)
+            self.expanded += 1
+            current_g = g_score[node]
+
+            edges = []
+            for corridor in graph.incident[node]:
+                cells = graph.corridors[corridor]
+                if node_cells[node] == cells[0]:
+                    other = node_id[cells[-1]]
+                    cost = graph.forward_costs[corridor]
+                else:
+                    other = node_id[cells[0]]
+                    cost = graph.backward_costs[corridor]
+                if other != node:
+                    edges.append((other, cost, corridor))
+            if node in goal_edges:
+                edges.append((-1, goal_edges[node], None))
+
+            for other, cost, corridor in edges:
+                if other in closed:
+                    continue
+                tentative_g = current_g + cost
+                if tentative_g < g_score.get(other, tentative_g + 1):
+                    g_score[other] = tentative_g
+                    parents[other] = (node, corridor)
+                    if other == -1:
+                        h = 0
+                    else:
+                        y, x = divmod(node_cells[other], width)
+                        h = (abs(x - goal_x) + abs(y - goal_y)) * min_cost
+                    heapq.heappush(heap, (tentative_g + h, h, other))
+
+        return None
+
+    def _build_path(self, parents, goal_paths):
+        """Junta as células da partida, dos corredores e da chegada"""
+        graph = self.graph
+        pieces = []
+        node = -1
+        while True:
+            previous, via = parents[node]
+            if previous is None:
+                # Trecho da partida (ou rota direta no mesmo corredor)
+                pieces.append(via)
+                break
+            if node == -1:
+                pieces.append(goal_paths[previous])
+            else:
+                pieces.append(graph.oriented(via, previous))
+            node = previous
+        pieces.reverse()
+
+        path = list(pieces[0])
+        for piece in pieces[1:]:
+            path.extend(piece[1:])
+        return tuple(path)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Testes da classe City"""
+
+import mmap
+
+from city import City
+from map_format import MMAP_MIN_SIZE
+from pathfinding import PathFinder
+
+
+def test_edit_mmap_map_after_route(tmp_path):
+    # Mapa .wmap sem compressão e grande o bastante para ser aberto com mmap
+    size = 1024
+    assert size * size >= MMAP_MIN_SIZE
+    city = City(size, size, "Grande")
+    city.set_row(0, [City.STREET] * size)
+    filename = str(tmp_path / "grande.wmap")
+    city.save_to_file(filename)
+
+    city = City.load_from_file(filename)
+    assert isinstance(city.cells, mmap.mmap)
+    pathfinder = PathFinder(city)
+    assert pathfinder.find_path([0, 0], [10, 0]) is not None
+    city.components
+
+    # Com costs e componentes já montados, as edições continuam valendo
+    assert city.add_traffic(5, 0)
+    assert city.set_cells([1, 2], City.TRAFFIC) == 2
+    assert city.get_cost(5, 0) == city.cell_cost(City.TRAFFIC)
+    assert city.costs[1] == city.cell_cost(City.TRAFFIC)
+    assert city.remove_traffic_cells([1, 2, 5]) == 3
+    assert city.costs[5] == city.cell_cost(City.STREET)
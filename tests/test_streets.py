@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Testes da busca sobre o grafo de ruas (estratégia "streets")"""
+
+import random
+
+from city import City
+from pathfinding import PathFinder
+
+
+def block_city(width, height, rng, traffic=0.2):
+    """Quarteirões 2x2 separados por ruas, com engarrafamentos sorteados"""
+    city = City(width, height)
+    for y in range(height):
+        for x in range(width):
+            if x % 3 == 0 or y % 3 == 0:
+                city.set_cell(x, y, City.STREET)
+    streets = city.find_cells(City.STREET)
+    city.add_traffic_cells(rng.sample(streets, int(len(streets) * traffic)))
+    return city
+
+
+def test_streets_route_around_traffic():
+    # Passar pelo engarrafamento em [3, 17] custa 12; contornar por
+    # [3, 15] e [6, 18] custa 11. O nó da partida não pode ser fechado
+    # pelo corredor direto antes do caminho pelos outros cruzamentos
+    city = block_city(16, 21, random.Random(28))
+    assert city.get_cell(3, 17) == City.TRAFFIC
+    pathfinder = PathFinder(city, cache_size=0)
+
+    path = pathfinder.find_path([3, 16], [2, 18], "streets")
+    assert pathfinder.path_cost(path) == 11
+    assert [3, 17] not in path
+
+
+def test_streets_costs_match_astar_with_traffic():
+    for seed in range(100):
+        rng = random.Random(seed)
+        city = block_city(rng.randint(8, 24), rng.randint(8, 24), rng)
+        walkable = [i for i in range(city.width * city.height)
+                    if city.is_walkable(i % city.width, i // city.width)]
+        pathfinder = PathFinder(city, cache_size=0)
+        for _ in range(10):
+            start, end = ([i % city.width, i // city.width] for i in rng.sample(walkable, 2))
+            astar = pathfinder.find_path(start, end, "astar")
+            streets = pathfinder.find_path(start, end, "streets")
+            assert (streets is None) == (astar is None), (seed, start, end)
+            if astar is not None:
+                assert pathfinder.path_cost(streets) == pathfinder.path_cost(astar), (seed, start, end)
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas dependentes do tempo sobre uma previsão de tráfego
+
+O custo de entrar numa célula pode mudar com o horário de chegada. A
+previsão divide o tempo em ticks de tick_length unidades de custo (uma
+rua livre = 1) e, para as células que mudam, guarda um perfil constante
+por partes: um byte de custo por tick do horizonte (0 = fechada naquele
+tick). Depois do último tick vale o último custo. Os perfis são
+guardados uma vez só e as células apontam para eles (um array de ids
+do tamanho do mapa, 0 = custo atual do mapa), então um corredor inteiro
+com o mesmo padrão ocupa um perfil.
+
+Com custo constante por partes, sair mais tarde pode fazer chegar mais
+cedo (o engarrafamento acaba no meio do caminho). Para manter a
+propriedade FIFO, a chegada numa célula é a melhor entre entrar agora e
+esperar o começo de um tick seguinte:
+
+    chegada(t) = min(t' + custo(t') para t' >= t)
+
+que nunca diminui com t. Com FIFO, o A* por horário de chegada (cada
+nó fechado uma vez, como no A* comum) encontra a chegada mais cedo.
+Células bloqueadas no mapa continuam bloqueadas: os perfis só mudam o
+custo das transitáveis.
+"""
+
+import heapq
+from array import array
+
+from city import City
+
+# Ticks cobertos pela previsão
+HORIZON = 24
+# Duração de um tick, em unidades de custo
+TICK_LENGTH = 100
+
+
+class TrafficForecast:
+
+    def __init__(self, city, horizon=HORIZON, tick_length=TICK_LENGTH):
+        if horizon < 1 or tick_length < 1:
+            raise ValueError("Horizonte e duração do tick devem ser positivos")
+        self.city = city
+        self.horizon = horizon
+        self.tick_length = tick_length
+
+        # Perfil de cada célula (0 = custo atual do mapa) e os perfis
+        # distintos, com o id de cada um
+        self.profile_ids = array('H', [0]) * (city.width * city.height)
+        self.profiles = [None]
+        self._profile_lookup = {}
+        self._min_cost = 0
+
+    @classmethod
+    def from_simulation(cls, simulation, horizon=HORIZON, tick_length=TICK_LENGTH):
+        """
+        Previsão rodando uma cópia da simulação de tráfego (o mapa
+        original não muda): o tick k do perfil é o estado depois de k
+        passos. Só as células que mudam no horizonte ganham perfil.
+        """
+        city = simulation.city
+        future = simulation.copy(city.copy())
+        cost_table = city.cost_table
+        costs = city.costs
+
+        changed = {}
+        for tick in range(1, horizon):
+            added, removed = future.tick()
+            for cell_type, indices in ((City.TRAFFIC, added), (City.STREET, removed)):
+                tail = bytes([cost_table[cell_type]]) * (horizon - tick)
+                for index in indices:
+                    profile = changed.get(index)
+                    if profile is None:
+                        profile = bytearray([costs[index]]) * horizon
+                        changed[index] = profile
+                    profile[tick:] = tail
+
+        forecast = cls(city, horizon, tick_length)
+        groups = {}
+        for index, profile in changed.items():
+            groups.setdefault(bytes(profile), []).append(index)
+        for profile, indices in groups.items():
+            forecast.set_profile(indices, profile)
+        return forecast
+
+    def set_profile(self, indices, costs):
+        """
+        Define o custo por tick (sequência de horizon valores de 0 a 255)
+        das células dadas (índices y * width + x)
+        """
+        if len(costs) != self.horizon:
+            raise ValueError(f"Perfil deve ter {self.horizon} custos")
+        profile = bytes(costs)
+        profile_id = self._profile_lookup.get(profile)
+        if profile_id is None:
+            profile_id = len(self.profiles)
+            if profile_id > 0xFFFF:
+                raise ValueError("Perfis distintos demais na previsão")
+            self.profiles.append(profile)
+            self._profile_lookup[profile] = profile_id
+            positive = [cost for cost in profile if cost]
+            if positive and (not self._min_cost or min(positive) < self._min_cost):
+                self._min_cost = min(positive)
+
+        profile_ids = self.profile_ids
+        for index in indices:
+            profile_ids[index] = profile_id
+
+    def clear_profile(self, indices):
+        """Volta as células para o custo atual do mapa"""
+        profile_ids = self.profile_ids
+        for index in indices:
+            profile_ids[index] = 0
+
+    def min_cost(self):
+        """Menor custo positivo do mapa e dos perfis (base da heurística)"""
+        city_min = self.city.min_cost()
+        return min(city_min, self._min_cost) if self._min_cost else city_min
+
+    def profile_arrival(self, profile, time):
+        """Chegada mais cedo numa célula com o perfil dado, saindo em time (-1 = nunca)"""
+        tick_length = self.tick_length
+        last = self.horizon - 1
+        tick = time // tick_length
+        if tick >= last:
+            cost = profile[last]
+            return time + cost if cost else -1
+
+        cost = profile[tick]
+        best = time + cost if cost else -1
+        # Esperar o começo de um tick seguinte pode chegar antes
+        for tick in range(tick + 1, last + 1):
+            start = tick * tick_length
+            if best != -1 and start >= best:
+                break
+            cost = profile[tick]
+            if cost and (best == -1 or start + cost < best):
+                best = start + cost
+        return best
+
+    def arrival(self, index, time):
+        """Chegada mais cedo na célula index saindo da vizinha em time (-1 = nunca)"""
+        cost = self.city.costs[index]
+        if not cost:
+            return -1
+        profile_id = self.profile_ids[index]
+        if profile_id:
+            return self.profile_arrival(self.profiles[profile_id], time)
+        return time + cost
+
+    def path_arrival(self, indices, departure=0):
+        """Horário de chegada ao fim de um caminho (índices), ou -1 se ele fecha"""
+        time = departure
+        for index in indices[1:]:
+            time = self.arrival(index, time)
+            if time == -1:
+                return -1
+        return time
+
+
+class TimeDependentSearch:
+    """A* pelo horário de chegada sobre uma TrafficForecast"""
+
+    def __init__(self, city):
+        self.city = city
+
+        # Nós fechados e horário de chegada da última busca
+        self.expanded = 0
+        self.arrival = -1
+
+    def find_path(self, start_idx, goal_idx, forecast, departure=0):
+        """Retorna a tupla de índices do caminho ou None"""
+        city = self.city
+        costs = city.costs
+        width = city.width
+        last_x = width - 1
+        last_y = city.height - 1
+        size = width * city.height
+        min_cost = forecast.min_cost()
+        goal_y, goal_x = divmod(goal_idx, width)
+        profile_ids = forecast.profile_ids
+        profiles = forecast.profiles
+        profile_arrival = forecast.profile_arrival
+
+        times = array('l', [-1]) * size
+        parents = array('l', [-1]) * size
+        closed = bytearray(size)
+        push = heapq.heappush
+        pop = heapq.heappop
+
+        times[start_idx] = departure
+        start_y, start_x = divmod(start_idx, width)
+        h = (abs(start_x - goal_x) + abs(start_y - goal_y)) * min_cost
+        heap = [(departure + h, h, start_idx)]
+        expanded = 0
+        self.arrival = -1
+
+        while heap:
+            f, h, current = pop(heap)
+            if closed[current]:
+                continue
+            if current == goal_idx:
+                self.expanded = expanded
+                self.arrival = times[current]
+                path = []
+                while current != -1:
+                    path.append(current)
+                    current = parents[current]
+                path.reverse()
+                return tuple(path)
+
+            closed[current] = 1
+            expanded += 1
+            y, x = divmod(current, width)
+            current_time = times[current]
+
+            neighbors = []
+            if y > 0:
+                neighbors.append(current - width)
+            if x < last_x:
+                neighbors.append(current + 1)
+            if y < last_y:
+                neighbors.append(current + width)
+            if x > 0:
+                neighbors.append(current - 1)
+
+            for n in neighbors:
+                cost = costs[n]
+                if not cost or closed[n]:
+                    continue
+                profile_id = profile_ids[n]
+                if profile_id:
+                    arrival = profile_arrival(profiles[profile_id], current_time)
+                    if arrival == -1:
+                        continue
+                else:
+                    arrival = current_time + cost
+                if times[n] != -1 and arrival >= times[n]:
+                    continue
+                times[n] = arrival
+                parents[n] = current
+                ny, nx = divmod(n, width)
+                h = (abs(nx - goal_x) + abs(ny - goal_y)) * min_cost
+                push(heap, (arrival + h, h, n))
+
+        self.expanded = expanded
+        return None
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Classe TrafficSimulation - Tráfego que muda com o tempo
+
+A simulação avança em passos (ticks). A cada passo:
+
+- os engarrafamentos que chegaram ao fim da vida voltam a ser rua;
+- alguns engarrafamentos se espalham para uma rua vizinha;
+- novos engarrafamentos surgem em ruas sorteadas.
+
+Cada engarrafamento criado pela simulação recebe uma duração sorteada
+e entra numa agenda por tick, então um passo só mexe nas células que
+mudam. Os sorteios usam um random.Random próprio: a mesma semente e o
+mesmo mapa geram a mesma sequência de passos.
+
+As alterações vão para a cidade com city.set_cells, que as registra no
+histórico (city.changes_since), e tick() também as retorna. Quem desenha
+ou calcula rotas consome só as células alteradas. Engarrafamentos criados
+fora da simulação (editor, generate_random_traffic) se espalham, mas não
+se desfazem sozinhos.
+"""
+
+import random
+from array import array
+
+from city import City
+
+# Engarrafamentos novos por tick
+SPAWN_PER_TICK = 20
+# Chance de cada engarrafamento se espalhar para uma rua vizinha num tick.
+# Com a duração média, dá cerca de meio engarrafamento novo por
+# engarrafamento: acima de 1 o tráfego cresceria até tomar as ruas
+SPREAD_PROBABILITY = 0.02
+# Duração de um engarrafamento (ticks, mínimo e máximo)
+LIFETIME = (10, 40)
+
+
+class TrafficSimulation:
+
+    def __init__(self, city, seed=None, spawn_per_tick=SPAWN_PER_TICK,
+                 spread_probability=SPREAD_PROBABILITY, lifetime=LIFETIME):
+        if not 0 <= spread_probability <= 1:
+            raise ValueError("Probabilidade de espalhar deve estar entre 0 e 1")
+        if not 1 <= lifetime[0] <= lifetime[1]:
+            raise ValueError("Duração inválida para os engarrafamentos")
+
+        self.city = city
+        self.rng = random.Random(seed)
+        self.spawn_per_tick = spawn_per_tick
+        self.spread_probability = spread_probability
+        self.lifetime = lifetime
+
+        self.tick_count = 0
+        # Tick em que cada engarrafamento da simulação se desfaz e, para
+        # cada tick, as células que vencem nele
+        self.expiry = {}
+        self.schedule = {}
+
+    def tick(self):
+        """
+        Avança um passo. Retorna (adicionados, removidos): arrays com os
+        índices (y * width + x) das células que viraram engarrafamento e
+        das que voltaram a ser rua.
+        """
+        self.tick_count += 1
+        city = self.city
+        cells = city.cells
+
+        removed = self._expire(cells)
+        if removed:
+            city.set_cells(removed, City.STREET)
+
+        # Uma célula não entra nas duas listas no mesmo passo
+        blocked = set(removed)
+        added = array('l')
+        self._spread(cells, blocked, added)
+        self._spawn(cells, blocked, added)
+        if added:
+            city.set_cells(added, City.TRAFFIC)
+            self._schedule(added)
+
+        return added, removed
+
+    def run(self, ticks):
+        """Avança vários passos. Retorna o total de células alteradas"""
+        changed = 0
+        for _ in range(ticks):
+            added, removed = self.tick()
+            changed += len(added) + len(removed)
+        return changed
+
+    def copy(self, city):
+        """
+        Cópia da simulação rodando sobre outra cidade (por exemplo
+        city.copy()), no mesmo ponto da sequência de sorteios
+        """
+        simulation = TrafficSimulation(city, spawn_per_tick=self.spawn_per_tick,
+                                       spread_probability=self.spread_probability,
+                                       lifetime=self.lifetime)
+        simulation.rng.setstate(self.rng.getstate())
+        simulation.tick_count = self.tick_count
+        simulation.expiry = dict(self.expiry)
+        simulation.schedule = {tick: list(bucket) for tick, bucket in self.schedule.items()}
+        return simulation
+
+    def _expire(self, cells):
+        """Engarrafamentos que vencem neste tick e ainda estão no mapa"""
+        tick = self.tick_count
+        expiry = self.expiry
+        traffic = City.TRAFFIC
+        removed = array('l')
+        for index in self.schedule.pop(tick, ()):
+            # Entradas antigas de células que ganharam outra duração
+            if expiry.get(index) != tick:
+                continue
+            del expiry[index]
+            if cells[index] == traffic:
+                removed.append(index)
+        return removed
+
+    def _spread(self, cells, blocked, added):
+        """Cada engarrafamento pode ocupar uma rua vizinha"""
+        sources = self.city.cell_index(City.TRAFFIC).items
+        if not sources:
+            return
+        rng = self.rng
+        # Quantidade esperada de engarrafamentos que se espalham
+        expected = len(sources) * self.spread_probability
+        count = int(expected)
+        if rng.random() < expected - count:
+            count += 1
+
+        width = self.city.width
+        size = len(cells)
+        street = City.STREET
+        for _ in range(count):
+            source = sources[rng.randrange(len(sources))]
+            direction = rng.randrange(4)
+            if direction == 0:
+                target = source - width
+            elif direction == 1:
+                target = source + width
+            elif direction == 2:
+                target = source + 1 if (source + 1) % width else -1
+            else:
+                target = source - 1 if source % width else -1
+            if 0 <= target < size and cells[target] == street and target not in blocked:
+                blocked.add(target)
+                added.append(target)
+
+    def _spawn(self, cells, blocked, added):
+        """Engarrafamentos novos em ruas sorteadas"""
+        streets = self.city.cell_index(City.STREET).items
+        if not streets:
+            return
+        rng = self.rng
+        street = City.STREET
+        for _ in range(self.spawn_per_tick):
+            target = streets[rng.randrange(len(streets))]
+            if cells[target] == street and target not in blocked:
+                blocked.add(target)
+                added.append(target)
+
+    def _schedule(self, added):
+        """Sorteia a duração de cada engarrafamento novo"""
+        rng = self.rng
+        shortest, longest = self.lifetime
+        expiry = self.expiry
+        schedule = self.schedule
+        for index in added:
+            tick = self.tick_count + rng.randint(shortest, longest)
+            expiry[index] = tick
+            bucket = schedule.get(tick)
+            if bucket is None:
+                schedule[tick] = [index]
+            else:
+                bucket.append(index)